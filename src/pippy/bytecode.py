@@ -0,0 +1,135 @@
+import csv
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import dists, helpers
+from .config import log, EXCLUDE_DIRS
+
+# --- Bytecode Precompilation ---
+# Post-install stage: compiles .pyc files for newly installed or changed
+# distributions and the project's own sources, so the first 'pippy run'
+# after provisioning doesn't pay for compiling every imported module. pip
+# compiles serially during install; pippy installs with '--no-compile' and
+# compiles here instead, in a process pool inside the venv's interpreter
+# (its magic number and hash key are what the .pyc files must match).
+# Files whose .pyc is already valid for the requested optimization levels
+# and invalidation mode are skipped.
+
+INVALIDATION_MODES = ("timestamp", "checked-hash", "unchecked-hash")
+
+# Runs inside the venv's interpreter: argv[1] is a JSON file with 'files',
+# 'optimize', 'mode' and 'workers'. Prints compiled/skipped/failed counts.
+# Only library functions go to the pool, so it works with any start method.
+_COMPILE_SCRIPT = """\
+import importlib.util, json, os, py_compile, sys
+from concurrent.futures import ProcessPoolExecutor
+with open(sys.argv[1]) as f:
+    job = json.load(f)
+mode = py_compile.PycInvalidationMode[job["mode"].upper().replace("-", "_")]
+flags = {"timestamp": 0, "checked-hash": 3, "unchecked-hash": 1}[job["mode"]]
+def valid(source, cfile):
+    try:
+        with open(cfile, "rb") as f:
+            header = f.read(16)
+        if header[:4] != importlib.util.MAGIC_NUMBER or int.from_bytes(header[4:8], "little") != flags:
+            return False
+        if not flags:
+            st = os.stat(source)
+            return header[8:12] == (int(st.st_mtime) & 0xFFFFFFFF).to_bytes(4, "little") and \\
+                header[12:16] == (st.st_size & 0xFFFFFFFF).to_bytes(4, "little")
+        with open(source, "rb") as f:
+            return header[8:16] == importlib.util.source_hash(f.read())
+    except OSError:
+        return False
+todo = []
+for source in job["files"]:
+    for level in job["optimize"]:
+        cfile = importlib.util.cache_from_source(source, optimization=level or "")
+        if not valid(source, cfile):
+            todo.append((source, cfile, level))
+args = [[t[0] for t in todo], [t[1] for t in todo], [None] * len(todo), [False] * len(todo),
+        [t[2] for t in todo], [mode] * len(todo), [2] * len(todo)]
+workers = min(job["workers"], len(todo))
+if workers > 1:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(py_compile.compile, *args, chunksize=max(1, len(todo) // (workers * 4))))
+else:
+    results = list(map(py_compile.compile, *args))
+failed = sum(1 for r in results if r is None)
+print(json.dumps({"compiled": len(results) - failed, "skipped": len(job["files"]) * len(job["optimize"]) - len(todo), "failed": failed}))
+"""
+
+
+def snapshot(site_packages: Path) -> Dict[str, str]:
+    """Maps installed distributions to their metadata directory name (which includes the version)."""
+    return {key: dist["path"].name for key, dist in dists.installed_distributions(site_packages).items()}
+
+
+def changed_sources(site_packages: Path, before: Dict[str, str]) -> List[str]:
+    """The .py files of distributions installed or changed since the snapshot before."""
+    sources = []
+    for key, dist in dists.installed_distributions(site_packages).items():
+        if before.get(key) == dist["path"].name:
+            continue
+        try:
+            with open(dist["path"] / "RECORD", "r", encoding="utf-8", newline="") as f:
+                rows = [row for row in csv.reader(f) if row]
+        except OSError:
+            continue # No RECORD (legacy egg-info): leave it to the import system
+        for row in rows:
+            rel = os.path.normpath(row[0])
+            if rel.endswith(".py") and not rel.startswith(os.pardir) and not os.path.isabs(rel):
+                sources.append(str(site_packages / rel))
+    return sources
+
+
+def project_sources(project_dir: Path) -> List[str]:
+    """The project's own .py files (the venv and other excluded directories are skipped)."""
+    return [
+        entry.path
+        for _, _, files in helpers.walk_project(project_dir, EXCLUDE_DIRS)
+        for entry in files
+        if entry.name.endswith(".py")
+    ]
+
+
+def compile_sources(
+    venv_path: Path,
+    project_dir: Path,
+    sources: List[str],
+    optimize: Optional[List[int]] = None,
+    invalidation_mode: str = "timestamp",
+    workers: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Compiles sources with the venv's interpreter at each optimization level
+    (default [0]), using workers processes (default os.cpu_count()). Returns
+    the 'compiled', 'skipped' and 'failed' counts, or None if the compile
+    step could not run. Compilation problems never fail the install.
+    """
+    if not sources:
+        return {"compiled": 0, "skipped": 0, "failed": 0}
+    job = {
+        "files": sources,
+        "optimize": sorted(set(optimize or [0])),
+        "mode": invalidation_mode,
+        "workers": workers or os.cpu_count() or 1,
+    }
+    fd, job_path = tempfile.mkstemp(prefix="pippy-compile-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(job, f)
+        rc, stdout, _ = helpers.run_python_cmd(["-c", _COMPILE_SCRIPT, job_path], venv_path, project_dir, capture=True, check=False)
+    finally:
+        os.unlink(job_path)
+    if rc != 0:
+        log.warning(f"Bytecode precompilation failed (exit code {rc}); modules will be compiled on first import.")
+        return None
+    try:
+        return json.loads(stdout.splitlines()[-1])
+    except (ValueError, IndexError):
+        log.debug(f"Unreadable compile output: {stdout}")
+        return None
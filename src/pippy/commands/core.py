@@ -1,21 +1,36 @@
+import contextlib
 import re
 import typer
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple
 import sys
 import os
 import shutil
 import platform
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .. import helpers
+# Command-specific modules are imported inside the commands that use them,
+# keeping 'pippy run' startup light.
+from .. import dists, helpers, profiling, resources, timings, vcs, venvs
 from ..config import log, VENV_DIR_NAME, REQ_FILE_NAME, LOCK_FILE_NAME, CONFIG_FILE_NAME, EXCLUDE_DIRS
 
 app = typer.Typer(help="Core project setup and execution commands.")
 
 # --- Venv Management ---
 
-def _ensure_venv(project_dir: Path, create_if_missing: bool = True) -> Optional[Path]:
-    """Internal helper to find or create and return the venv path."""
+def _ensure_venv(
+    project_dir: Path,
+    create_if_missing: bool = True,
+    seed_packages: Optional[List[str]] = None,
+    offline: bool = False,
+) -> Optional[Path]:
+    """
+    Internal helper to find or create and return the venv path. New venvs are
+    cloned from a cached seed venv (see pippy.seeds) when possible.
+    """
+    from .. import seeds, wheelhouse
     venv_path = helpers.find_venv(project_dir)
     if venv_path:
         log.info(f"Found existing virtualenv: {venv_path}")
@@ -29,6 +44,11 @@ def _ensure_venv(project_dir: Path, create_if_missing: bool = True) -> Optional[
     # Create venv
     target_venv_path = project_dir / VENV_DIR_NAME
     log.info(f"Creating new virtual environment in {target_venv_path}...")
+    with timings.phase("create venv: clone seed"):
+        cloned = seeds.clone_seed(target_venv_path, seed_packages, offline)
+    if cloned:
+        log.info("Virtual environment created successfully (cloned from seed).")
+        return target_venv_path
     try:
         # Use sys.executable to ensure venv uses the same Python version pippy runs with
         # unless a different one is explicitly managed (e.g., via pyenv)
@@ -38,6 +58,9 @@ def _ensure_venv(project_dir: Path, create_if_missing: bool = True) -> Optional[
             if err:
                 typer.echo(helpers.style(f"Error Output:\n{err}", fg=helpers.colors.RED), err=True)
             raise typer.Exit(1)
+        if seed_packages:
+            entries = [dists.parse_requirement(p) for p in seed_packages]
+            wheelhouse.install(target_venv_path, project_dir, seed_packages, [e for e in entries if e], offline=offline)
         log.info("Virtual environment created successfully.")
         return target_venv_path
     except Exception as e:
@@ -45,18 +68,67 @@ def _ensure_venv(project_dir: Path, create_if_missing: bool = True) -> Optional[
         raise typer.Exit(1)
 
 
+def _use_store(project_dir: Path, flag: Optional[bool]) -> bool:
+    """Whether installs go through the shared package store: --store/--no-store, else pippy.json."""
+    if flag is not None:
+        return flag
+    return bool(helpers.read_config(project_dir).get("store", False))
+
+
+def _compile_settings(
+    project_dir: Path,
+    flag: Optional[bool],
+    optimize: Optional[List[int]],
+    invalidation_mode: Optional[str],
+) -> Optional[dict]:
+    """
+    Bytecode precompilation settings from --compile/--optimize/--invalidation-mode,
+    else 'compile' in pippy.json (true, false, or e.g. {"optimize": [0, 1],
+    "invalidation_mode": "checked-hash"}). None when precompilation is off.
+    """
+    from .. import bytecode
+    config = helpers.read_config(project_dir).get("compile", True)
+    if not (flag if flag is not None else bool(config)):
+        return None
+    settings = config if isinstance(config, dict) else {}
+    levels = optimize or settings.get("optimize", [0])
+    mode = invalidation_mode or settings.get("invalidation_mode", "timestamp")
+    if mode not in bytecode.INVALIDATION_MODES:
+        log.error(f"Unknown invalidation mode '{mode}'; use one of: {', '.join(bytecode.INVALIDATION_MODES)}.")
+        raise typer.Exit(1)
+    if any(level not in (0, 1, 2) for level in levels):
+        log.error(f"Optimization levels must be 0, 1 or 2 (got {levels}).")
+        raise typer.Exit(1)
+    return {"optimize": levels, "invalidation_mode": mode}
+
+
+def _precompile(venv_path: Path, project_dir: Path, settings: dict, before: Optional[dict] = None):
+    """Compiles distributions changed since the snapshot before (if any) and the project's sources."""
+    from .. import bytecode
+    site_packages = helpers.get_site_packages(venv_path)
+    sources = bytecode.changed_sources(site_packages, before) if site_packages and before is not None else []
+    sources += bytecode.project_sources(project_dir)
+    result = bytecode.compile_sources(venv_path, project_dir, sources, settings["optimize"], settings["invalidation_mode"])
+    if not result:
+        return
+    if result["compiled"]:
+        log.info(f"Precompiled {result['compiled']} modules in parallel ({result['skipped']} already up to date).")
+    if result["failed"]:
+        log.debug(f"{result['failed']} modules could not be compiled (e.g. syntax for another Python version).")
+
 
 @app.command("init")
 def init_project(
-    dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=False, file_okay=False, dir_okay=True, resolve_path=True)
+    dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=False, file_okay=False, dir_okay=True, resolve_path=True),
+    seed_packages: Optional[List[str]] = typer.Option(None, "--seed-packages", "-s", help="Packages to pre-install in the cached seed venv new venvs are cloned from (repeat or comma-separate, e.g. 'build,twine')."),
+    offline: bool = typer.Option(False, "--offline", help="Install seed packages only from the local wheelhouse; never contact the package index."),
 ):
     """Creates and initializes a Python virtual environment (.venv)."""
     project_dir = helpers.get_project_dir(dir)
     log.info(f"Initializing project in: {project_dir}")
 
-    venv_path = _ensure_venv(project_dir, create_if_missing=True)
-    helpers.ensure_tool_installed("pipreqs", "pipreqs", venv_path, project_dir)
-    # Check if pipreqs is installed in the venv
+    packages = [p.strip() for value in seed_packages or [] for p in value.split(",") if p.strip()]
+    venv_path = _ensure_venv(project_dir, create_if_missing=True, seed_packages=packages, offline=offline)
     if not venv_path: return # Error handled in _ensure_venv
 
     # Optionally, install base packages or perform other setup here
@@ -82,88 +154,86 @@ from ..config import log, VENV_DIR_NAME, REQ_FILE_NAME, CONFIG_FILE_NAME, EXCLUD
 @app.command("install")
 def install_deps(
     dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
-    force_req_gen: bool = typer.Option(False, "--force-req", "-f", help=f"Force regeneration of {REQ_FILE_NAME} using pipreqs."),
+    force_req_gen: bool = typer.Option(False, "--force-req", "-f", help=f"Force regeneration of {REQ_FILE_NAME} from the project's imports."),
     skip_main_config: bool = typer.Option(False, "--skip-main", help="Skip configuring the main script."),
+    force: bool = typer.Option(False, "--force", help="Reinstall even if requirements and the venv are unchanged since the last install."),
+    use_store: Optional[bool] = typer.Option(None, "--store/--no-store", help="Share installed packages across projects via the global package store (default: 'store' in pippy.json)."),
+    offline: bool = typer.Option(False, "--offline", help="Install only from the local wheelhouse; never contact the package index."),
+    precompile: Optional[bool] = typer.Option(None, "--compile/--no-compile", help="Precompile bytecode for changed packages and project sources in parallel (default: 'compile' in pippy.json, on)."),
+    optimize: Optional[List[int]] = typer.Option(None, "--optimize", "-O", help="Optimization level to precompile for (0, 1 or 2; repeatable; default: 0)."),
+    invalidation_mode: Optional[str] = typer.Option(None, "--invalidation-mode", help="How .pyc files are validated: timestamp (default), checked-hash or unchecked-hash."),
 ):
     """
-    Installs dependencies. Optionally generates requirements.txt (using pipreqs)
-    and configures the main runnable script.
+    Installs dependencies. Optionally generates requirements.txt (from the
+    project's imports) and configures the main runnable script.
     """
+    from .. import bytecode, imports, store, wheelhouse
     project_dir = helpers.get_project_dir(dir)
     log.info(f"Setting up project in: {project_dir}")
-    venv_path = _ensure_venv(project_dir, create_if_missing=True)
+    venv_path = _ensure_venv(project_dir, create_if_missing=True, offline=offline)
     if not venv_path: return
 
     # Verify VENV_DIR_NAME is in EXCLUDE_DIRS (from config.py)
     # This is just a sanity check during development; EXCLUDE_DIRS should be correct
     if VENV_DIR_NAME not in EXCLUDE_DIRS:
-        log.warning(f"Configuration issue: '{VENV_DIR_NAME}' not found in EXCLUDE_DIRS set in config.py. Pipreqs might scan the virtual environment.")
+        log.warning(f"Configuration issue: '{VENV_DIR_NAME}' not found in EXCLUDE_DIRS set in config.py. Requirement detection might scan the virtual environment.")
         # Consider adding it dynamically if needed, though fixing config.py is better:
         # EXCLUDE_DIRS.add(VENV_DIR_NAME)
 
     req_file = project_dir / REQ_FILE_NAME
+    compile_settings = _compile_settings(project_dir, precompile, optimize, invalidation_mode)
+    before = None
 
     # --- Section 1: Generate requirements.txt if needed or forced ---
     if force_req_gen or not req_file.exists():
-        log.info(f"Ensuring 'pipreqs' is installed in the virtual environment '{venv_path.name}'...")
-        try:
-            helpers.ensure_tool_installed("pipreqs", "pipreqs", venv_path, project_dir)
-        except typer.Exit:
-             log.error("Cannot proceed with generating requirements without 'pipreqs'.")
-             raise
-
-        log.info(f"Generating {REQ_FILE_NAME} using 'pipreqs'...")
-        python_exe = helpers.get_venv_python(venv_path)
-        if not python_exe:
-             log.error(f"Critical error: Could not find python executable in the verified venv: {venv_path}")
-             raise typer.Exit(1)
-
-        pipreqs_base_cmd = [
-            "pipreqs",
-            ".",
-            "--ignore",
-            ','.join(EXCLUDE_DIRS)
-        ]
-
-        # --- Add Debug Logging for the Full Command ---
-        # Use shlex.join for better quoting representation if needed, but simple join is ok for debug
-        log.info(f"Running pipreqs command: {' '.join(pipreqs_base_cmd)}")
-        # ---------------------------------------------
-
-        rc, out, err = helpers.run_cmd(pipreqs_base_cmd, cwd=project_dir, capture=True, check=False)
-
-        if rc != 0:
-            log.error(f"'python -m pipreqs' failed (exit code {rc}).")
-            if err:
-                typer.echo(helpers.style(f"pipreqs Error Output:\n{err}", fg=helpers.colors.RED), err=True)
-            if force_req_gen or not req_file.exists():
-                 log.error(f"Failed to generate required {REQ_FILE_NAME}. Halting installation.")
-                 raise typer.Exit(1)
-            else:
-                 log.error(f"pipreqs failed. Cannot guarantee dependencies are up-to-date. Halting installation.")
-                 raise typer.Exit(1)
-        else:
-             try:
-                 count = len(req_file.read_text().splitlines())
-                 log.info(f"{REQ_FILE_NAME} generated/updated successfully with {count} packages.")
-             except FileNotFoundError:
-                 log.error(f"{REQ_FILE_NAME} not found after pipreqs reported success. Check pipreqs output.")
-                 raise typer.Exit(1)
-             except Exception as e:
-                 log.warning(f"Could not count packages in generated {req_file}: {e}")
+        with timings.phase("install_deps: generate requirements"):
+            log.info(f"Generating {REQ_FILE_NAME} from the project's imports...")
+            try:
+                requirements = imports.detect_requirements(project_dir, venv_path)
+                lines = imports.format_requirements(requirements)
+                req_file.write_text("".join(f"{line}\n" for line in lines))
+            except OSError as e:
+                log.error(f"Failed to generate required {REQ_FILE_NAME}: {e}. Halting installation.")
+                raise typer.Exit(1)
+            unpinned = [req["name"] for req in requirements if not req["version"]]
+            log.info(f"{REQ_FILE_NAME} generated/updated successfully with {len(lines)} packages.")
+            if unpinned:
+                log.info(f"Not installed yet, left unpinned: {', '.join(unpinned)}")
 
 
     # --- Section 2: Install dependencies from requirements.txt ---
     if req_file.exists():
-        log.info(f"Installing dependencies from {req_file}...")
-        try:
-            # Use run_pip_cmd to ensure installation into the venv
-            helpers.run_pip_cmd(["install", "--upgrade", "-r", str(req_file)], venv_path, project_dir, check=True)
-            log.info("Dependencies installed successfully.")
-        except typer.Exit:
-            log.error(f"Failed to install dependencies from {req_file}.")
-            # Optionally trigger 'pippy ask' here or provide more specific guidance
-            raise # Re-raise the Exit exception from run_pip_cmd
+        with timings.phase("install_deps: install requirements"):
+            # Skip pip entirely when neither the requirements nor the venv changed
+            # since the last successful install (see helpers.install_fingerprint).
+            if not force and helpers.read_install_stamp(venv_path) == helpers.install_fingerprint(venv_path, req_file):
+                log.info(f"Dependencies are up to date with {req_file.name}; skipping install (use --force to reinstall).")
+            else:
+                log.info(f"Installing dependencies from {req_file}...")
+                site_packages = helpers.get_site_packages(venv_path)
+                before = bytecode.snapshot(site_packages) if site_packages else None
+                shared = _use_store(project_dir, use_store)
+                if shared:
+                    # Pins already in the store are linked; pip then only sees what is left
+                    linked = store.link_requirements(venv_path, dists.parse_lock_file(req_file))
+                    if linked:
+                        log.info(f"Linked {len(linked)} packages from the package store.")
+                try:
+                    # Goes through the shared wheelhouse; no network when it already has every pin
+                    wheelhouse.install(venv_path, project_dir, ["-r", str(req_file)], dists.parse_lock_file(req_file),
+                                       options=["--upgrade"] + (["--no-compile"] if compile_settings else []), offline=offline)
+                    log.info("Dependencies installed successfully.")
+                except typer.Exit:
+                    log.error(f"Failed to install dependencies from {req_file}.")
+                    # Optionally trigger 'pippy ask' here or provide more specific guidance
+                    raise # Re-raise the Exit exception from the pip run
+                if shared:
+                    with timings.phase("install_deps: share via store"):
+                        store.add_venv(venv_path)
+                helpers.write_install_stamp(venv_path, helpers.install_fingerprint(venv_path, req_file))
+                if compile_settings:
+                    with timings.phase("install_deps: precompile bytecode"):
+                        _precompile(venv_path, project_dir, compile_settings, before)
     else:
         # This case should only be reached if generation wasn't forced and the file didn't exist initially
         log.warning(f"{req_file} not found and generation was not requested/forced.")
@@ -173,23 +243,26 @@ def install_deps(
 
     # --- Section 3: Configure main script (if not skipped) ---
     if not skip_main_config:
-        try:
-            # Assuming configure_main exists and works correctly
-            configure_main(project_dir)
-        except Exception as e:
-            log.warning(f"Could not configure main script: {e}")
+        with timings.phase("install_deps: configure main"):
+            try:
+                # Assuming configure_main exists and works correctly
+                configure_main(project_dir)
+            except Exception as e:
+                log.warning(f"Could not configure main script: {e}")
 
 
 def configure_main(project_dir: Path):
     """Prompts user to select a main Python script if not already configured."""
+    from .. import index
     config = helpers.read_config(project_dir)
     if config.get("main"):
         log.info(f"Main script already configured: {config['main']}")
         return
 
     log.info("Searching for potential main scripts...")
-    py_files = helpers.find_python_files(project_dir)
-    main_candidates = [f for f in py_files if helpers.check_for_main_block(f)]
+    with timings.phase("configure_main: scan for main blocks"):
+        entries = index.refresh_index(project_dir)
+        main_candidates = [project_dir / rel_path for rel_path, entry in sorted(entries.items()) if entry["has_main"]]
 
     selected_main: Optional[Path] = None
 
@@ -242,8 +315,24 @@ def configure_main(project_dir: Path):
 def run_script(
     target: Path = typer.Argument(..., help="Python file to run, or a directory containing pippy.json.", exists=True, resolve_path=True),
     args: Optional[List[str]] = typer.Argument(None, help="Arguments to pass to the script."),
+    supervise: bool = typer.Option(False, "--supervise", help="Keep pippy running as the script's parent process instead of replacing itself with the interpreter."),
+    profile: Optional[str] = typer.Option(None, "--profile", is_flag=False, flag_value="cprofile", metavar="[cprofile|sample]", help="Profile the script (--profile=sample for the low-overhead sampler); writes .pstats and collapsed stacks to .pippy/profiles/."),
+    profile_top: int = typer.Option(profiling.DEFAULT_TOP, "--profile-top", min=0, help="Number of hottest functions (or allocation sites, with --memory) to print after the run."),
+    profile_interval: float = typer.Option(profiling.DEFAULT_INTERVAL * 1000, "--profile-interval", min=0.1, help="Sampling interval in milliseconds of CPU time (--profile=sample)."),
+    track_resources: bool = typer.Option(False, "--resources", help="Report peak RSS, CPU time, context switches, I/O and wall time of the script and its child processes (implies --supervise)."),
+    resources_out: Optional[Path] = typer.Option(None, "--resources-out", help="With --resources, also write the sampled time series to FILE (JSON for .json, else CSV).", dir_okay=False, resolve_path=True),
+    resources_interval: float = typer.Option(resources.SAMPLE_INTERVAL, "--resources-interval", min=0.01, help="Seconds between --resources samples."),
+    memory: bool = typer.Option(False, "--memory", help="Trace allocations with tracemalloc: report the peak, growth over time and the top allocation sites."),
+    memory_interval: float = typer.Option(profiling.DEFAULT_MEMORY_INTERVAL, "--memory-interval", min=0.01, help="Seconds between --memory heap snapshots (one is also taken at exit)."),
+    memory_frames: int = typer.Option(1, "--memory-frames", min=1, help="Stack frames to record per allocation (more helps offline analysis of dumps, but is slower)."),
+    memory_dump: bool = typer.Option(False, "--memory-dump", help="Write every --memory snapshot to .pippy/profiles/ for offline comparison."),
+    memory_baseline: Optional[Path] = typer.Option(None, "--memory-baseline", help="Compare the --memory snapshot at exit with a snapshot dumped by an earlier run.", exists=True, dir_okay=False, resolve_path=True),
 ):
-    """Runs a Python script or the configured main script in a project directory."""
+    """
+    Runs a Python script or the configured main script in a project directory.
+    By default pippy execs the interpreter, so the script gets pippy's PID,
+    signals and exit code directly; --supervise runs it as a child instead.
+    """
     target = target.resolve()
     run_args = args if args else []
 
@@ -280,13 +369,34 @@ def run_script(
         log.warning(f"No virtual environment found in {project_dir}. Running with system Python.")
         # Or require venv?
 
+    python_args = [str(script_to_run)] + run_args
+    if profile and memory:
+        log.error("--profile and --memory cannot be combined; run them separately.")
+        raise typer.Exit(1)
+    if memory:
+        prefix = profiling.output_prefix(project_dir, script_to_run)
+        python_args = profiling.memory_args(script_to_run, run_args, prefix, profile_top, memory_interval,
+                                            memory_frames, memory_dump, memory_baseline)
+        log.info(f"Tracing memory allocations (snapshot every {memory_interval:g}s)")
+    elif profile:
+        # The profiler bootstrap writes its reports itself, so exec still applies
+        prefix = profiling.output_prefix(project_dir, script_to_run)
+        python_args = profiling.profile_args(profile, script_to_run, run_args, prefix, profile_top, profile_interval / 1000)
+        log.info(f"Profiling with {profile}; reports go to {prefix.parent}")
+
+    if track_resources and not resources.is_supported():
+        log.error("--resources needs a POSIX system (getrusage).")
+        raise typer.Exit(1)
+
+    if not supervise and not track_resources and helpers.can_exec():
+        # Fast path: nothing left for pippy to do once the script starts
+        helpers.exec_python(python_args, venv_path, cwd=project_dir)
+
+    usage = None
     try:
-        # Use run_python_cmd to ensure correct interpreter is used
-        rc, _, _ = helpers.run_python_cmd([str(script_to_run)] + run_args, venv_path, cwd=project_dir, check=False)
-        if rc != 0:
-             log.warning(f"Script exited with non-zero status: {rc}")
-             # Don't Exit pippy itself unless the script execution fundamentally failed
-             # sys.exit(rc) # Forward the script's exit code
+        with resources.monitor(resources_interval) if track_resources else contextlib.nullcontext() as usage:
+            # Use run_python_cmd to ensure correct interpreter is used
+            rc, _, _ = helpers.run_python_cmd(python_args, venv_path, cwd=project_dir, check=False)
     except typer.Exit as e:
         # Catch Exit from run_python_cmd if python itself couldn't be found etc.
         log.error("Failed to execute the script.")
@@ -294,21 +404,41 @@ def run_script(
     except Exception as e:
         log.error(f"An error occurred while trying to run the script: {e}")
         raise typer.Exit(1)
+    finally:
+        if usage is not None:
+            typer.echo(resources.format_summary(usage), err=True)
+            if resources_out:
+                resources.write_series(usage, resources_out)
+                typer.echo(f"Resource samples written to {resources_out}", err=True)
+    if rc != 0:
+        log.warning(f"Script exited with non-zero status: {rc}")
+        raise typer.Exit(rc if rc > 0 else 128 - rc) # Killed by signal N: shell convention 128+N
 
 
 @app.command("start")
 def start_project(
     args: Optional[List[str]] = typer.Argument(None, help="Arguments to pass to the main script."),
+    supervise: bool = typer.Option(False, "--supervise", help="Keep pippy running as the script's parent process instead of replacing itself with the interpreter."),
+    profile: Optional[str] = typer.Option(None, "--profile", is_flag=False, flag_value="cprofile", metavar="[cprofile|sample]", help="Profile the main script (see 'pippy run --help')."),
+    track_resources: bool = typer.Option(False, "--resources", help="Report the resource usage of the main script (see 'pippy run --help')."),
+    resources_out: Optional[Path] = typer.Option(None, "--resources-out", help="With --resources, also write the sampled time series to FILE.", dir_okay=False, resolve_path=True),
+    memory: bool = typer.Option(False, "--memory", help="Trace the main script's allocations (see 'pippy run --help')."),
+    memory_dump: bool = typer.Option(False, "--memory-dump", help="Write the --memory snapshots to .pippy/profiles/."),
 ):
     """Shortcut for 'pippy run .'"""
     log.debug("Running start command (equivalent to 'run .')")
-    run_script(target=Path("."), args=args)
+    run_script(target=Path("."), args=args, supervise=supervise, profile=profile,
+               profile_top=profiling.DEFAULT_TOP, profile_interval=profiling.DEFAULT_INTERVAL * 1000,
+               track_resources=track_resources, resources_out=resources_out, resources_interval=resources.SAMPLE_INTERVAL,
+               memory=memory, memory_interval=profiling.DEFAULT_MEMORY_INTERVAL, memory_frames=1,
+               memory_dump=memory_dump, memory_baseline=None)
 
 
 @app.command("lock")
 def lock_deps(
     dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
     output_file: Optional[Path] = typer.Option(None, "--output", "-o", help=f"Output file name (default: {LOCK_FILE_NAME}).", resolve_path=False), # Resolve relative to project_dir later
+    hashes: bool = typer.Option(False, "--hashes", help="Annotate each pin with the sha256 of its installed RECORD."),
 ):
     """Freezes current environment dependencies into a lock file."""
     project_dir = helpers.get_project_dir(dir)
@@ -318,18 +448,34 @@ def lock_deps(
     lock_file_name = output_file if output_file else LOCK_FILE_NAME
     output_path = project_dir / lock_file_name
 
+    # Read dist-info metadata directly instead of running 'pip freeze': no
+    # interpreter start or pip import, and it works when pip itself is broken.
+    site_packages = helpers.get_site_packages(venv_path)
+    if not site_packages:
+        log.error(f"Could not find site-packages in {venv_path}.")
+        raise typer.Exit(1)
+
     log.info(f"Freezing dependencies to {output_path}...")
     try:
-        rc, output, err = helpers.run_pip_cmd(["freeze"], venv_path, project_dir, capture=True, check=False)
-        if rc != 0:
-            log.error("pip freeze failed.")
-            if err: typer.echo(helpers.style(f"Error Output:\n{err}", fg=helpers.colors.RED), err=True)
-            raise typer.Exit(1)
+        with timings.phase("lock: freeze"):
+            installed = dists.installed_distributions(site_packages)
+            if any(dists.is_editable(dist) for dist in installed.values()):
+                # pip renders editable installs from their VCS checkout ('-e git+URL@REV#egg=NAME')
+                log.info("Editable installs present; freezing with pip.")
+                _, stdout, _ = helpers.run_pip_cmd(["freeze"], venv_path, project_dir, capture=True, check=True)
+                lines = stdout.splitlines()
+                if hashes:
+                    entries = [None if line.startswith("#") else dists.parse_requirement(line) for line in lines]
+                    lines = [dists.add_record_hash(line, installed[entry["key"]])
+                             if entry and entry["version"] and entry["key"] in installed else line
+                             for line, entry in zip(lines, entries)]
+            else:
+                lines = dists.freeze(site_packages, venvs.python_version(venv_path) or sys.version_info[:2], hashes=hashes)
 
         with open(output_path, 'w') as f:
-            f.write(output)
+            f.write("".join(f"{line}\n" for line in lines))
 
-        count = len(output.splitlines())
+        count = sum(1 for line in lines if not line.startswith("#"))
         log.info(f"Wrote {count} package pins to {output_path}")
 
     except Exception as e:
@@ -337,48 +483,246 @@ def lock_deps(
         raise typer.Exit(1)
 
 
+@app.command("sync")
+def sync_deps(
+    dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    lock_file: Optional[Path] = typer.Option(None, "--lock", "-l", help=f"Lock file to sync against (default: {LOCK_FILE_NAME}).", resolve_path=False),
+    dry_run: bool = typer.Option(False, "--dry-run", "-n", help="Show the changes without applying them."),
+    use_store: Optional[bool] = typer.Option(None, "--store/--no-store", help="Share installed packages across projects via the global package store (default: 'store' in pippy.json)."),
+    offline: bool = typer.Option(False, "--offline", help="Install only from the local wheelhouse; never contact the package index."),
+    precompile: Optional[bool] = typer.Option(None, "--compile/--no-compile", help="Precompile bytecode for changed packages and project sources in parallel (default: 'compile' in pippy.json, on)."),
+    optimize: Optional[List[int]] = typer.Option(None, "--optimize", "-O", help="Optimization level to precompile for (0, 1 or 2; repeatable; default: 0)."),
+    invalidation_mode: Optional[str] = typer.Option(None, "--invalidation-mode", help="How .pyc files are validated: timestamp (default), checked-hash or unchecked-hash."),
+    engine: str = typer.Option("pippy", "--engine", help="Installer for pinned packages: 'pippy' (parallel download and unpack) or 'pip'."),
+    jobs: int = typer.Option(8, "--jobs", "-j", min=1, help="Parallel downloads for the pippy engine."),
+    index_url: Optional[str] = typer.Option(None, "--index-url", "-i", help="Package index for the pippy engine (default: the lock file's --index-url, else pip's configuration, else PyPI)."),
+):
+    """Makes the venv match the lock file exactly, installing/uninstalling only the difference."""
+    from .. import bytecode, installer, store, wheelhouse
+    project_dir = helpers.get_project_dir(dir)
+    venv_path = _ensure_venv(project_dir, create_if_missing=False) # Require venv
+    if not venv_path: return
+
+    lock_path = project_dir / (lock_file if lock_file else LOCK_FILE_NAME)
+    if not lock_path.is_file():
+        log.error(f"Lock file not found: {lock_path}")
+        log.info("Run 'pippy lock' to create one.")
+        raise typer.Exit(1)
+    site_packages = helpers.get_site_packages(venv_path)
+    if not site_packages:
+        log.error(f"Could not find site-packages in {venv_path}.")
+        raise typer.Exit(1)
+
+    with timings.phase("sync: diff"):
+        locked = dists.parse_lock_file(lock_path)
+        installed = dists.installed_distributions(site_packages)
+        delta = dists.diff_lock(locked, installed)
+
+    for entry in delta["unknown"]:
+        log.warning(f"Cannot determine the project name for '{entry['line']}'; skipping it.")
+    to_install = delta["missing"] + delta["wrong_version"]
+    to_remove = delta["extraneous"]
+    if not to_install and not to_remove:
+        log.info(f"Virtual environment already matches {lock_path.name} ({len(locked)} packages).")
+        return
+
+    for entry in delta["missing"]:
+        typer.echo(f"  + {entry['line']}")
+    for entry in delta["wrong_version"]:
+        typer.echo(f"  ~ {entry['line']} (installed: {installed[entry['key']]['version']})")
+    for dist in to_remove:
+        typer.echo(f"  - {dist['name']}=={dist['version']}")
+    log.info(f"{len(delta['missing'])} missing, {len(delta['wrong_version'])} wrong version, {len(to_remove)} extraneous.")
+    if dry_run:
+        return
+    if engine not in ("pippy", "pip"):
+        log.error(f"Unknown install engine '{engine}'; use 'pippy' or 'pip'.")
+        raise typer.Exit(1)
+    if engine == "pippy" and not index_url:
+        index_url = installer.resolve_index_url(venv_path, dists.lock_file_options(lock_path))
+        if index_url is None:
+            log.info("Extra indexes, find-links or --no-index are configured for pip; installing with pip.")
+            engine = "pip"
+    compile_settings = _compile_settings(project_dir, precompile, optimize, invalidation_mode)
+    before = bytecode.snapshot(site_packages)
+
+    def uninstall(dists_to_remove):
+        with timings.phase("sync: uninstall"):
+            helpers.run_pip_cmd(["uninstall", "-y"] + [dist["name"] for dist in dists_to_remove], venv_path, project_dir, check=True)
+
+    def replace_old_versions(entries):
+        # The engine only adds files, so old versions go first; pip replaces them itself
+        old = [installed[entry["key"]] for entry in entries if entry["key"] in installed]
+        if old:
+            uninstall(old)
+
+    if to_remove:
+        uninstall(to_remove)
+    shared = _use_store(project_dir, use_store)
+    if to_install and shared:
+        with timings.phase("sync: link from store"):
+            linked = store.link_requirements(venv_path, to_install)
+        if linked:
+            log.info(f"Linked {len(linked)} packages from the package store.")
+            to_install = [entry for entry in to_install if entry not in linked]
+    unpacked = bool(to_install)
+    if to_install and engine == "pippy":
+        with timings.phase("sync: parallel install"):
+            to_install = installer.install_pinned(venv_path, to_install, index_url, jobs=jobs, offline=offline,
+                                                  before_unpack=replace_old_versions)
+    if to_install:
+        # Pass the original lines (and the lock file's index options) through a
+        # requirements file so hashes, URLs and editables keep their exact
+        # lock-file semantics.
+        with timings.phase("sync: install"):
+            with tempfile.TemporaryDirectory(prefix="pippy-sync-") as tmp_dir:
+                delta_file = Path(tmp_dir) / "requirements.txt"
+                lines = dists.lock_file_options(lock_path) + [entry["line"] for entry in to_install]
+                delta_file.write_text("".join(f"{line}\n" for line in lines))
+                wheelhouse.install(venv_path, project_dir, ["-r", str(delta_file)], to_install,
+                                   options=["--no-deps"] + (["--no-compile"] if compile_settings else []), offline=offline)
+    if shared and unpacked:
+        with timings.phase("sync: share via store"):
+            store.add_venv(venv_path)
+    if compile_settings:
+        with timings.phase("sync: precompile bytecode"):
+            _precompile(venv_path, project_dir, compile_settings, before)
+    log.info(f"Virtual environment synced with {lock_path.name}.")
+
+
+def _tree_size(path: str) -> int:
+    """Total size in bytes of the files below a directory (symlinks not followed)."""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+def _remove_cache_path(path: str, is_dir: bool, dry_run: bool, measure: bool) -> Optional[int]:
+    """Removes one cache directory or file. Returns bytes freed (0 unless measured), or None on failure."""
+    try:
+        size = 0
+        if measure:
+            size = _tree_size(path) if is_dir else os.lstat(path).st_size
+        if not dry_run:
+            log.debug(f"Removing {'directory' if is_dir else 'file'}: {path}")
+            if is_dir:
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        return size
+    except Exception as e:
+        log.warning(f"Could not remove {'directory' if is_dir else 'file'} {path}: {e}")
+        return None
+
+
+def _walk_cache_targets(project_dir: Path) -> List[Tuple[str, bool]]:
+    """
+    Finds (path, is_dir) cache targets by walking with the usual exclusions
+    (e.g. .venv) except __pycache__ itself, which is collected and not
+    descended into.
+    """
+    targets = []
+    for _, dirs, files in helpers.walk_project(project_dir, EXCLUDE_DIRS - {"__pycache__"}):
+        for entry in [d for d in dirs if d.name == "__pycache__"]:
+            dirs.remove(entry)
+            targets.append((entry.path, True))
+        targets.extend((entry.path, False) for entry in files if entry.name.endswith((".pyc", ".pyo")))
+    return targets
+
+
+def _git_cache_targets(project_dir: Path, git_files: List[str]) -> List[Tuple[str, bool]]:
+    """
+    Finds (path, is_dir) cache targets from a git file listing: every directory
+    holding a tracked or untracked file is probed for a __pycache__ child, so
+    ignored trees such as .venv are never entered.
+    """
+    excludes = helpers.compile_excludes(EXCLUDE_DIRS - {"__pycache__"})
+    targets = []
+    dirs = {""}
+    for rel_path in git_files:
+        if helpers.is_excluded(rel_path, excludes):
+            continue
+        parent = rel_path.rpartition("/")[0]
+        if rel_path.endswith((".pyc", ".pyo")) and "__pycache__" not in parent.split("/"):
+            path = project_dir / rel_path
+            if path.is_file():
+                targets.append((str(path), False))
+        while parent not in dirs:
+            dirs.add(parent)
+            parent = parent.rpartition("/")[0]
+    for rel_dir in dirs:
+        if rel_dir.rpartition("/")[2] == "__pycache__":
+            continue
+        cache_dir = project_dir / rel_dir / "__pycache__"
+        if cache_dir.is_dir() and not cache_dir.is_symlink():
+            targets.append((str(cache_dir), True))
+    return targets
+
+
 @app.command("clean")
 def clean_pycache(
-    dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True)
+    dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    dry_run: bool = typer.Option(False, "--dry-run", "-n", help="List what would be removed without deleting anything."),
+    stats: bool = typer.Option(False, "--stats", help="Report bytes reclaimed and elapsed time."),
+    jobs: int = typer.Option(8, "--jobs", "-j", min=1, help="Maximum number of parallel removals."),
+    gc_store: bool = typer.Option(False, "--store", help="Also remove package store entries no venv links any more."),
 ):
     """Removes __pycache__ directories and *.pyc/pyo files."""
+    from .. import store
     project_dir = helpers.get_project_dir(dir)
     log.info(f"Cleaning Python cache files in {project_dir}...")
-    count_dirs = 0
-    count_files = 0
-
-    for item in project_dir.rglob("*"):
-        # Check if the item is within an excluded directory (like .venv)
-        is_excluded = False
-        try:
-            relative_path = item.relative_to(project_dir)
-            if relative_path.parts and relative_path.parts[0] in EXCLUDE_DIRS:
-                is_excluded = True
-        except (ValueError, IndexError):
-            pass # Should not happen with rglob from project_dir but handle robustly
+    started = time.perf_counter()
 
-        if is_excluded:
-            continue
+    with timings.phase("clean: discover"):
+        git_files = vcs.git_ls_files(project_dir)
+        if git_files is not None:
+            targets = _git_cache_targets(project_dir, git_files)
+        else:
+            targets = _walk_cache_targets(project_dir)
 
-        # Remove __pycache__ directories
-        if item.is_dir() and item.name == "__pycache__":
-            log.debug(f"Removing directory: {item}")
-            try:
-                shutil.rmtree(item)
-                count_dirs += 1
-            except Exception as e:
-                log.warning(f"Could not remove directory {item}: {e}")
+    count_dirs = 0
+    count_files = 0
+    bytes_freed = 0
+    with timings.phase("clean: remove"):
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(_remove_cache_path, path, is_dir, dry_run, stats): (path, is_dir) for path, is_dir in targets}
+            for future in as_completed(futures):
+                path, is_dir = futures[future]
+                size = future.result()
+                if size is None:
+                    continue
+                if dry_run:
+                    typer.echo(f"Would remove: {Path(path).relative_to(project_dir)}{os.sep if is_dir else ''}")
+                bytes_freed += size
+                if is_dir:
+                    count_dirs += 1
+                else:
+                    count_files += 1
 
-        # Remove .pyc/.pyo files
-        elif item.is_file() and item.suffix in [".pyc", ".pyo"]:
-            log.debug(f"Removing file: {item}")
-            try:
-                item.unlink()
-                count_files += 1
-            except Exception as e:
-                log.warning(f"Could not remove file {item}: {e}")
+    if dry_run:
+        log.info(f"Dry run complete. Would remove {count_dirs} directories and {count_files} files.")
+    else:
+        log.info(f"Cleaning complete. Removed {count_dirs} directories and {count_files} files.")
+    if gc_store:
+        with timings.phase("clean: store"):
+            collected = store.collect_garbage(dry_run=dry_run)
+        verb = "would remove" if dry_run else "removed"
+        log.info(f"Package store: {verb} {collected['files']} unreferenced files ({helpers.format_bytes(collected['bytes'])}) and {collected['manifests']} manifests.")
+        bytes_freed += collected["bytes"]
 
-    log.info(f"Cleaning complete. Removed {count_dirs} directories and {count_files} files.")
+    if stats:
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        log.info(f"{verb} {helpers.format_bytes(bytes_freed)} in {time.perf_counter() - started:.2f}s.")
 
 
 @app.command("shell")
@@ -442,44 +786,82 @@ def project_shell(
     log.info("Exited project shell.")
 
 
+@app.command("task")
+def run_tasks(
+    names: Optional[List[str]] = typer.Argument(None, help="Tasks to run, with their dependencies. Lists the tasks when omitted."),
+    dir: Optional[Path] = typer.Option(None, "--dir", "-d", help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", min=1, help="Tasks to run at once (default: CPU count)."),
+    force: bool = typer.Option(False, "--force", help="Run every task, even when its inputs are unchanged."),
+    keep_going: bool = typer.Option(False, "--keep-going", "-k", help="Keep running independent tasks after a failure."),
+):
+    """Runs tasks from pippy.json's 'tasks', in parallel, skipping those whose inputs are unchanged."""
+    from .. import tasks
+    project_dir = helpers.get_project_dir(dir)
+    defined = tasks.load_tasks(project_dir)
+    if not names:
+        if not defined:
+            log.info(f"No tasks defined. Add a 'tasks' section to {CONFIG_FILE_NAME}, e.g.")
+            typer.echo('  "tasks": {"test": {"cmd": "pytest -q", "inputs": ["src/**/*.py", "tests/**/*.py"]}}')
+            return
+        for name, task in defined.items():
+            deps = f"  (after {', '.join(task['deps'])})" if task["deps"] else ""
+            cmd = task["cmd"] if isinstance(task["cmd"], str) else " ".join(task["cmd"])
+            typer.echo(f"  {name:<20} {cmd}{deps}")
+        return
+
+    with timings.phase("task: " + " ".join(names)):
+        results = tasks.run(project_dir, names, jobs=jobs, force=force, keep_going=keep_going, timeout=helpers.command_timeout())
+    colors_by_status = {"ran": helpers.colors.GREEN, "up to date": helpers.colors.CYAN, "restored": helpers.colors.CYAN,
+                        "failed": helpers.colors.RED}
+    for name, result in results.items():
+        status = result["status"] + (f" ({result['reason']})" if result.get("reason") else "")
+        typer.echo(f"  {name:<20} {helpers.style(status, fg=colors_by_status.get(result['status'], helpers.colors.YELLOW))}"
+                   f"  {result['wall']:.2f}s")
+    failed = [result for result in results.values() if result["status"] == "failed"]
+    if failed:
+        raise typer.Exit(failed[0].get("returncode") or 1)
+    if any(result["status"] not in tasks.SUCCESS for result in results.values()):
+        raise typer.Exit(1)
+
+
 @app.command("info")
 def project_info(
      dir: Optional[Path] = typer.Argument(None, help="Project directory (default: current directory).", exists=True, file_okay=False, dir_okay=True, resolve_path=True)
 ):
-    """Shows detected requirements (via pipreqs) and project file tree."""
+    """Shows detected requirements (from imports) and project file tree."""
+    from .. import imports, index
     project_dir = helpers.get_project_dir(dir)
-    venv_path = _ensure_venv(project_dir, create_if_missing=False) # Require venv for pipreqs
+    venv_path = _ensure_venv(project_dir, create_if_missing=False) # Require venv to map imports to installed packages
     if not venv_path: return
 
-    typer.echo("\n" + helpers.style("=== Requirements (Detected by pipreqs) ===", bold=True))
-    try:
-        helpers.ensure_tool_installed("pipreqs", "pipreqs", venv_path, project_dir, check_command=["pipreqs"])
-        pipreqs_cmd = helpers.get_executable(venv_path, "pipreqs")
-        cmd = [pipreqs_cmd, str(project_dir), "--print"] # Removed --force, just print detected
-        for ignore_dir in EXCLUDE_DIRS:
-             cmd.extend(["--ignore", ignore_dir])
-
-        if " -m " in pipreqs_cmd:
-             python_exe, *module_args = pipreqs_cmd.split(" ", 2)
-             cmd = [python_exe.strip('"')] + module_args + cmd[1:]
+    typer.echo("\n" + helpers.style("=== Environment ===", bold=True))
+    with timings.phase("project_info: venv profile"):
+        profile = venvs.get_profile(venv_path)
+    if profile:
+        interpreter = profile["interpreter"]
+        typer.echo(f"Python:    {interpreter['implementation']} {interpreter['version']} ({'-'.join(interpreter['tag'])})")
+        typer.echo(f"Venv:      {venv_path}")
+        typer.echo(f"Packages:  {len(profile['distributions'])} installed, {len(profile['console_scripts'])} console scripts")
+    else:
+        typer.echo("(Could not inspect the virtual environment's interpreter)")
 
-        rc, out, err = helpers.run_cmd(cmd, cwd=project_dir, capture=True, check=False)
-        if rc != 0:
-             log.error("pipreqs --print failed.")
-             if err: typer.echo(helpers.style(f"Error Output:\n{err}", fg=helpers.colors.RED), err=True)
-             typer.echo("Could not retrieve requirements.")
+    typer.echo("\n" + helpers.style("=== Requirements (Detected from imports) ===", bold=True))
+    try:
+        with timings.phase("project_info: detect requirements"):
+            requirements = imports.detect_requirements(project_dir, venv_path)
+        if requirements:
+            for req, line in zip(requirements, imports.format_requirements(requirements)):
+                typer.echo(f"{line}  # imports: {', '.join(req['imports'])}")
         else:
-             if out:
-                 typer.echo(out)
-             else:
-                 typer.echo("(No requirements detected by pipreqs)")
+            typer.echo("(No third-party imports detected)")
     except Exception as e:
-        log.error(f"Failed to run pipreqs: {e}")
+        log.error(f"Failed to detect requirements: {e}")
         typer.echo("Could not retrieve requirements.")
 
 
     typer.echo("\n" + helpers.style("=== Python File Tree ===", bold=True))
-    py_files = helpers.find_python_files(project_dir)
+    with timings.phase("project_info: find python files"):
+        py_files = index.python_files(project_dir)
 
     if not py_files:
         typer.echo("(No Python files found outside excluded directories)")
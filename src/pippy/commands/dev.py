@@ -2,8 +2,9 @@ import typer
 from pathlib import Path
 from typing import Optional
 
-from .. import helpers
+from .. import helpers, procs
 from ..config import log
+from .core import _ensure_venv
 
 app = typer.Typer(help="Development workflow commands (build, publish, etc.).")
 
@@ -13,7 +14,7 @@ def develop(
 ):
     """Installs the project in editable mode (`pip install -e .`)."""
     project_dir = helpers.get_project_dir(dir)
-    venv_path = helpers._ensure_venv(project_dir, create_if_missing=False)
+    venv_path = _ensure_venv(project_dir, create_if_missing=False)
     if not venv_path: return
     log.info("Installing project in editable mode...")
     try:
@@ -25,23 +26,50 @@ def develop(
 
 @app.command("pkg")
 def build_package(
-    dir: Optional[Path] = typer.Argument(None, help="Project directory.", exists=True, file_okay=False, dir_okay=True, resolve_path=True)
+    dir: Optional[Path] = typer.Argument(None, help="Project directory.", exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    parallel: bool = typer.Option(False, "--parallel/--serial", help="Build the sdist and the wheel side by side (default --serial: wheel built from the sdist, as 'python -m build' does). Both builds share the source tree, so only use --parallel for backends that keep no build state there."),
+    timeout: Optional[float] = typer.Option(None, "--timeout", min=0.001, help="Terminate a build still running after SECONDS (default: the global --timeout)."),
 ):
     """Builds source and wheel distributions using 'python -m build'."""
     project_dir = helpers.get_project_dir(dir)
-    venv_path = helpers._ensure_venv(project_dir, create_if_missing=False)
+    venv_path = _ensure_venv(project_dir, create_if_missing=False)
     if not venv_path: return
 
     log.info("Building distributions...")
     helpers.ensure_tool_installed("build", "build", venv_path, project_dir, check_import="build")
+    timeout = timeout or helpers.command_timeout()
 
-    try:
-        # Use run_python_cmd to ensure it uses the venv's python
-        helpers.run_python_cmd(["-m", "build"], venv_path, project_dir, check=True)
-        log.info("Build successful. Distributions should be in 'dist/'.")
-    except typer.Exit:
+    if not parallel:
+        try:
+            # Use run_python_cmd to ensure it uses the venv's python
+            helpers.run_python_cmd(["-m", "build"], venv_path, project_dir, check=True, timeout=timeout)
+            log.info("Build successful. Distributions should be in 'dist/'.")
+        except typer.Exit:
+            log.error("Build failed.")
+            raise
+        return
+
+    # Independent builds, each in its own isolated environment; the first
+    # failure (or timeout) terminates the other build and its children.
+    python = str(helpers.get_venv_python(venv_path))
+    results = procs.run_commands(
+        [{"name": kind, "cmd": [python, "-m", "build", f"--{kind}"], "cwd": project_dir, "timeout": timeout}
+         for kind in ("sdist", "wheel")],
+        log_file=helpers.output_log(),
+    )
+    for result in results:
+        if result["cancelled"]:
+            log.info(f"{result['name']}: cancelled.")
+        elif result["returncode"] != 0:
+            log.error(f"{result['name']} build failed with exit code {result['returncode']}.")
+        else:
+            log.info(f"{result['name']} built in {result['wall']:.1f}s.")
+    # Cancelled builds were stopped because another one failed first
+    failed = [r for r in results if not r["cancelled"] and r["returncode"] != 0]
+    if failed:
         log.error("Build failed.")
-        raise
+        raise typer.Exit(procs.TIMEOUT_EXIT_CODE if failed[0]["timed_out"] else failed[0]["returncode"] or 1)
+    log.info("Build successful. Distributions should be in 'dist/'.")
 
 @app.command()
 def publish(
@@ -50,7 +78,7 @@ def publish(
 ):
     """Uploads distributions from 'dist/' to PyPI using twine."""
     project_dir = helpers.get_project_dir(dir)
-    venv_path = helpers._ensure_venv(project_dir, create_if_missing=False)
+    venv_path = _ensure_venv(project_dir, create_if_missing=False)
     if not venv_path: return
 
     dist_dir = project_dir / "dist"
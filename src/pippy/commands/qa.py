@@ -5,22 +5,24 @@ import sys
 import os
 import textwrap
 
-# Ensure openai is installed or prompt user
-try:
-    import openai
-except ImportError:
-    # This check runs at import time. Better to check inside the command.
-    openai = None
+# openai is imported on first use in _ensure_openai_client; importing the SDK
+# (and pydantic with it) at module load is a large share of CLI startup time.
+openai = None
 
-
-from .. import helpers
-from ..config import log, OPENAI_API_KEY_ENV_VAR, EXCLUDE_DIRS, CONFIG_FILE_NAME
+from .. import helpers, index, timings
+from ..config import log, OPENAI_API_KEY_ENV_VAR, CONFIG_FILE_NAME
 
 app = typer.Typer(help="AI-powered assistance for your project.")
 
 
 def _ensure_openai_client(project_dir: Path, venv_path: Optional[Path]):
     """Checks for and installs openai if necessary, returns client."""
+    global openai
+    if openai is None:
+        try:
+            import openai
+        except ImportError:
+            openai = None
     if openai is None:
         helpers.ensure_tool_installed(
             tool_name="OpenAI Client",
@@ -31,7 +33,7 @@ def _ensure_openai_client(project_dir: Path, venv_path: Optional[Path]):
         )
         # Re-import after potential installation
         import importlib
-        globals()['openai'] = importlib.import_module("openai")
+        openai = importlib.import_module("openai")
         if openai is None: # Should not happen if installation succeeded
              log.error("Failed to import OpenAI library even after attempting install.")
              raise typer.Exit(1)
@@ -123,7 +125,8 @@ def ask_gpt(
     max_size = max_code_kb * 1024
     files_included = 0
 
-    py_files = helpers.find_python_files(project_dir)
+    with timings.phase("ask_gpt: find python files"):
+        py_files = index.python_files(project_dir)
 
     for file_path in sorted(py_files):
         try:
@@ -148,15 +151,16 @@ def ask_gpt(
     # 3. Call OpenAI API
     log.info(f"Sending request to OpenAI ({model})...")
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful Python project assistant. Analyze the provided code context to answer the user's question."},
-                # Using user role for the main prompt is often better
-                {"role": "user", "content": f"Project Code Context:\n\n{code_context}\n\n---\n\nQuestion: {question}"}
-            ],
-            temperature=0.5, # Adjust as needed
-        )
+        with timings.phase("ask_gpt: openai request"):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a helpful Python project assistant. Analyze the provided code context to answer the user's question."},
+                    # Using user role for the main prompt is often better
+                    {"role": "user", "content": f"Project Code Context:\n\n{code_context}\n\n---\n\nQuestion: {question}"}
+                ],
+                temperature=0.5, # Adjust as needed
+            )
 
         assistant_reply = response.choices[0].message.content.strip()
 
@@ -9,6 +9,10 @@ CONFIG_FILE_NAME = "pippy.json"
 LOCK_FILE_NAME = "requirements.lock"
 REQ_FILE_NAME = "requirements.txt"
 VENV_DIR_NAME = ".venv"
+STATE_DIR_NAME = ".pippy" # Per-project caches (file index, etc.)
+INDEX_FILE_NAME = "index.json"
+INSTALL_STAMP_NAME = "pippy-install.json" # Written inside the venv after a successful install
+VENV_PROFILE_NAME = "pippy-venv.json" # Cached interpreter/installed-package facts, inside the venv
 LOG_FILE_NAME = f"{APP_NAME}.log"
 
 # --- Basic Logging Setup ---
@@ -27,6 +31,15 @@ log = logging.getLogger(APP_NAME)
 # Respect existing VIRTUAL_ENV if pippy is run from within one
 ACTIVE_VIRTUAL_ENV = os.environ.get("VIRTUAL_ENV")
 
+# --- User Cache ---
+# Shared across projects: seed venvs for fast 'pippy init', etc.
+def _default_cache_dir() -> Path:
+    if os.name == "nt":
+        return Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / APP_NAME / "Cache"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / APP_NAME
+
+USER_CACHE_DIR = Path(os.environ.get("PIPPY_CACHE_DIR") or _default_cache_dir())
+
 # --- Project Root Detection (heuristic) ---
 # Assume the project root is the directory where pippy is invoked,
 # unless overridden by a command argument.
@@ -36,5 +49,5 @@ DEFAULT_PROJECT_DIR = Path.cwd()
 OPENAI_API_KEY_ENV_VAR = "OPENAI_API_KEY"
 
 # --- Excluded Dirs for Searches/Scans ---
-EXCLUDE_DIRS = {VENV_DIR_NAME, "venv", "__pycache__", ".git", ".hg", "dist", "build", "docs/_build"}
+EXCLUDE_DIRS = {VENV_DIR_NAME, "venv", STATE_DIR_NAME, "__pycache__", ".git", ".hg", "dist", "build", "docs/_build"}
 EXCLUDE_PATHS_GLOB = [f"**/{d}/**" for d in EXCLUDE_DIRS]
\ No newline at end of file
@@ -0,0 +1,387 @@
+import base64
+import csv
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .config import log
+
+# --- Installed Distributions ---
+# Reads what is installed in a venv straight from site-packages metadata,
+# without starting the venv's interpreter or importing pip.
+
+# Never reported as extraneous unless locked
+BOOTSTRAP_PACKAGES = {"pip", "setuptools", "wheel", "distribute"}
+
+
+def canonical_name(name: str) -> str:
+    """Normalizes a project name per PEP 503 (e.g. 'Foo_Bar' -> 'foo-bar')."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def read_metadata(path: Path) -> Dict[str, str]:
+    """
+    Reads the header block of a .dist-info/METADATA, .egg-info/PKG-INFO or a
+    single-file .egg-info. Keys are lower-cased; the first value of repeated
+    headers wins.
+    """
+    if path.is_dir():
+        path = path / ("METADATA" if path.suffix == ".dist-info" else "PKG-INFO")
+    headers: Dict[str, str] = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    break # Headers end at the first blank line; the rest is the description
+                if line[0] in " \t":
+                    continue # Folded continuation of a previous header
+                key, sep, value = line.partition(":")
+                if sep:
+                    headers.setdefault(key.strip().lower(), value.strip())
+    except OSError as e:
+        log.debug(f"Could not read metadata {path}: {e}")
+    return headers
+
+
+def _name_version_from_filename(filename: str) -> Tuple[str, Optional[str]]:
+    stem = filename.rsplit(".", 1)[0]
+    name, _, rest = stem.partition("-")
+    return name, (rest.split("-")[0] or None)
+
+
+def installed_distributions(site_packages: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Lists distributions installed in site_packages, keyed by canonical name.
+    Each value holds 'name', 'version' and 'path' (the .dist-info/.egg-info).
+    """
+    dists: Dict[str, Dict[str, Any]] = {}
+    try:
+        with os.scandir(site_packages) as entries:
+            names = sorted(e.name for e in entries if e.name.endswith((".dist-info", ".egg-info")))
+    except OSError as e:
+        log.debug(f"Could not list {site_packages}: {e}")
+        return dists
+    for filename in names:
+        path = site_packages / filename
+        headers = read_metadata(path)
+        fallback_name, fallback_version = _name_version_from_filename(filename)
+        name = headers.get("name") or fallback_name
+        key = canonical_name(name)
+        if key in dists:
+            log.debug(f"Duplicate metadata for '{name}' in {site_packages}; using {dists[key]['path'].name}")
+            continue
+        dists[key] = {"name": name, "version": headers.get("version") or fallback_version, "path": path}
+    return dists
+
+
+def top_level_names(dist_path: Path) -> List[str]:
+    """
+    Import names a distribution provides: top_level.txt when present,
+    otherwise the top-level entries of RECORD (as importlib.metadata's
+    packages_distributions() does).
+    """
+    try:
+        text = (dist_path / "top_level.txt").read_text(encoding="utf-8")
+        return sorted({line.strip() for line in text.splitlines() if line.strip()})
+    except OSError:
+        pass
+    names = set()
+    try:
+        with open(dist_path / "RECORD", "r", encoding="utf-8") as f:
+            for line in f:
+                top = line.split(",", 1)[0].split("/", 1)[0]
+                if top.endswith(".py"):
+                    top = top[:-3]
+                if top and top.isidentifier():
+                    names.add(top)
+    except OSError:
+        pass
+    return sorted(names)
+
+
+def packages_distributions(site_packages: Path) -> Dict[str, List[str]]:
+    """Maps top-level import names to the distributions in site_packages that provide them."""
+    mapping: Dict[str, List[str]] = {}
+    for dist in installed_distributions(site_packages).values():
+        if dist["path"].is_dir():
+            for name in top_level_names(dist["path"]):
+                mapping.setdefault(name, []).append(dist["name"])
+    return mapping
+
+
+def read_entry_points(dist_path: Path) -> Dict[str, Dict[str, str]]:
+    """Parses a distribution's entry_points.txt into {group: {name: 'module:attr'}}."""
+    groups: Dict[str, Dict[str, str]] = {}
+    try:
+        with open(dist_path / "entry_points.txt", "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return groups
+    group = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]"):
+            group = groups.setdefault(line[1:-1].strip(), {})
+        elif group is not None and "=" in line and not line.startswith(("#", ";")):
+            name, _, target = line.partition("=")
+            group.setdefault(name.strip(), target.strip())
+    return groups
+
+
+# --- Freeze ---
+
+def read_direct_url(dist_path: Path) -> Optional[Dict[str, Any]]:
+    """Reads PEP 610 direct_url.json from a .dist-info, if present."""
+    try:
+        with open(dist_path / "direct_url.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record_digest(dist_path: Path) -> Optional[str]:
+    """sha256 of a .dist-info/RECORD, i.e. of the installed file list and per-file hashes."""
+    try:
+        with open(dist_path / "RECORD", "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def freeze_requirement(dist: Dict[str, Any]) -> List[str]:
+    """
+    Renders one installed distribution the way 'pip freeze' does: 'name==version',
+    'name @ url' for PEP 610 VCS/archive/directory installs, and a commented
+    '-e <path>' for editable installs.
+    """
+    name, version = dist["name"], dist["version"]
+    direct_url = read_direct_url(dist["path"]) if dist["path"].suffix == ".dist-info" else None
+    if not direct_url or "url" not in direct_url:
+        return [f"{name}=={version}"]
+
+    url = direct_url["url"]
+    fragments = []
+    if "vcs_info" in direct_url:
+        vcs_info = direct_url["vcs_info"]
+        url = f"{vcs_info['vcs']}+{url}@{vcs_info['commit_id']}"
+    elif "archive_info" in direct_url:
+        archive_info = direct_url["archive_info"]
+        hashes = archive_info.get("hashes")
+        if hashes:
+            algo = "sha256" if "sha256" in hashes else sorted(hashes)[0]
+            fragments.append(f"{algo}={hashes[algo]}")
+        elif archive_info.get("hash"):
+            fragments.append(archive_info["hash"])
+    elif direct_url.get("dir_info", {}).get("editable"):
+        location = url[len("file://"):] if url.startswith("file://") else url
+        return [f"# Editable install with no version control ({name}=={version})", f"-e {location}"]
+    if direct_url.get("subdirectory"):
+        fragments.append(f"subdirectory={direct_url['subdirectory']}")
+    if fragments:
+        url += "#" + "&".join(fragments)
+    return [f"{name} @ {url}"]
+
+
+def is_editable(dist: Dict[str, Any]) -> bool:
+    """Whether a distribution is a PEP 610 editable install."""
+    direct_url = read_direct_url(dist["path"]) if dist["path"].suffix == ".dist-info" else None
+    return bool(direct_url and direct_url.get("dir_info", {}).get("editable"))
+
+
+def freeze_hidden(python_version: Tuple[int, int]) -> Set[str]:
+    """
+    Distributions 'pip freeze' leaves out: pip itself and, below Python 3.12
+    (where venvs still come with them), setuptools, wheel and distribute.
+    """
+    return {"pip"} | ({"setuptools", "wheel", "distribute"} if python_version < (3, 12) else set())
+
+
+def add_record_hash(line: str, dist: Dict[str, Any]) -> str:
+    """Appends a '# record-sha256=' comment identifying dist's installed file set (RECORD)."""
+    digest = record_digest(dist["path"])
+    return f"{line}  # record-sha256={digest}" if digest else line
+
+
+def freeze(site_packages: Path, python_version: Tuple[int, int], hashes: bool = False) -> List[str]:
+    """
+    Produces 'pip freeze' output for site_packages from metadata alone: one
+    entry per distribution, sorted case-insensitively by name, leaving out
+    what pip would for python_version (see freeze_hidden). With hashes=True,
+    each pin is followed by a '# record-sha256=' comment (add_record_hash);
+    pip's --hash needs archive hashes, which an installed environment does
+    not keep. Editable installs are rendered as if not under version control
+    (pip looks for a VCS checkout).
+    """
+    lines = []
+    hidden = freeze_hidden(python_version)
+    installed = installed_distributions(site_packages)
+    for key, dist in sorted(installed.items(), key=lambda item: item[1]["name"].lower()):
+        if key in hidden:
+            continue
+        requirement = freeze_requirement(dist)
+        if hashes:
+            requirement[-1] = add_record_hash(requirement[-1], dist)
+        lines.extend(requirement)
+    return lines
+
+
+def format_record_hash(digest: bytes) -> str:
+    """Formats a raw sha256 digest the way RECORD files store it ('sha256=<urlsafe base64>')."""
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def record_hash(content: bytes) -> str:
+    """The RECORD hash of a file's content."""
+    return format_record_hash(hashlib.sha256(content).digest())
+
+
+def refresh_record(dist_path: Path, changed: Set[str]) -> bool:
+    """
+    Recomputes the RECORD hash and size of entries whose absolute path is in
+    changed (files rewritten after install, e.g. relocated script shebangs).
+    Returns True if RECORD was updated.
+    """
+    record = dist_path / "RECORD"
+    try:
+        with open(record, "r", encoding="utf-8", newline="") as f:
+            rows = [row for row in csv.reader(f) if row]
+    except OSError:
+        return False
+    updated = False
+    for row in rows:
+        path = os.path.normpath(os.path.join(dist_path.parent, row[0]))
+        if path in changed and len(row) >= 3:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+            except OSError:
+                continue
+            row[1], row[2] = record_hash(content), str(len(content))
+            updated = True
+    if updated:
+        tmp_path = record.with_name(f".RECORD.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(rows)
+        os.replace(tmp_path, record)
+    return updated
+
+
+# --- Requirement/Lock Files ---
+
+_PINNED_RE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*([^\s;,]+)")
+_NAME_RE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?=$|[\[;@<>=!~,\s])")
+_ARCHIVE_SUFFIXES = (".whl", ".zip", ".tar.gz", ".tgz", ".tar.bz2")
+_EGG_RE = re.compile(r"[#&]egg=([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def _logical_lines(path: Path) -> List[str]:
+    """Reads a requirements file, joining '\\' continuations and dropping comments."""
+    lines, current = [], ""
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            raw = raw.rstrip("\n")
+            if raw.endswith("\\"):
+                current += raw[:-1] + " "
+                continue
+            current += raw
+            line = re.sub(r"(^|\s)#.*$", "", current).strip()
+            current = ""
+            if line:
+                lines.append(line)
+    if current.strip():
+        lines.append(current.strip())
+    return lines
+
+
+def parse_requirement(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses one requirement line into 'name' (as written), 'key' (canonical
+    name, or None if it cannot be determined), 'version' (None unless
+    pinned with == or ===) and the original 'line'. Returns None for global
+    options such as --index-url.
+    """
+    editable = line.startswith(("-e ", "--editable ", "--editable="))
+    if line.startswith("-") and not editable:
+        return None
+    name, version = None, None
+    pinned = _PINNED_RE.match(line)
+    if pinned and not editable:
+        name, version = pinned.group(1), pinned.group(2)
+    else:
+        egg = _EGG_RE.search(line)
+        if egg:
+            name = egg.group(1)
+        elif not editable:
+            match = _NAME_RE.match(line) # 'name', 'name[extra]>=1.0; marker', 'name @ url'
+            if match and not match.group(1).endswith(_ARCHIVE_SUFFIXES):
+                name = match.group(1)
+    return {
+        "name": name,
+        "key": canonical_name(name) if name else None,
+        "version": version,
+        "line": line,
+    }
+
+
+def parse_lock_file(path: Path) -> List[Dict[str, Any]]:
+    """
+    Parses a pip-freeze style lock file (or requirements file) into entries
+    as from parse_requirement. Global options such as --index-url are ignored.
+    """
+    entries = []
+    for line in _logical_lines(path):
+        entry = parse_requirement(line)
+        if entry is not None:
+            entries.append(entry)
+    return entries
+
+
+def lock_file_options(path: Path) -> List[str]:
+    """The global option lines of a requirements file (e.g. '--index-url URL'), as written."""
+    return [line for line in _logical_lines(path) if parse_requirement(line) is None]
+
+
+def versions_match(locked: str, installed: Optional[str]) -> bool:
+    """Compares versions per PEP 440 when packaging is available, else as strings."""
+    if installed is None:
+        return False
+    try:
+        from packaging.version import Version, InvalidVersion
+    except ImportError: # packaging is optional; fall back to exact comparison
+        return locked == installed
+    try:
+        return Version(locked) == Version(installed)
+    except InvalidVersion:
+        return locked == installed
+
+
+def diff_lock(
+    locked: List[Dict[str, Any]],
+    installed: Dict[str, Dict[str, Any]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Compares lock entries with installed distributions. Returns lists of lock
+    entries that are 'missing' or have the 'wrong_version', installed
+    distributions that are 'extraneous', and lock entries whose name could
+    not be determined ('unknown'). URL/editable entries count as satisfied
+    when a distribution of that name is installed.
+    """
+    result: Dict[str, List[Dict[str, Any]]] = {"missing": [], "wrong_version": [], "extraneous": [], "unknown": []}
+    locked_keys = set()
+    for entry in locked:
+        if entry["key"] is None:
+            result["unknown"].append(entry)
+            continue
+        locked_keys.add(entry["key"])
+        dist = installed.get(entry["key"])
+        if dist is None:
+            result["missing"].append(entry)
+        elif entry["version"] is not None and not versions_match(entry["version"], dist["version"]):
+            result["wrong_version"].append(entry)
+    for key, dist in sorted(installed.items()):
+        if key not in locked_keys and key not in BOOTSTRAP_PACKAGES:
+            result["extraneous"].append(dist)
+    return result
@@ -1,17 +1,23 @@
 import subprocess
 import sys
 import os
+import re
+import mmap
 import json
 import shutil
+import hashlib
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterable, Iterator, Set, Union
 import shlex
+import threading
+from collections import deque
 
 from typer import echo, style, colors, Exit
 
+from . import timings, venvs
 from .config import (
     log, ACTIVE_VIRTUAL_ENV, VENV_DIR_NAME, CONFIG_FILE_NAME,
-    REQ_FILE_NAME, EXCLUDE_DIRS, OPENAI_API_KEY_ENV_VAR
+    REQ_FILE_NAME, EXCLUDE_DIRS, OPENAI_API_KEY_ENV_VAR, INSTALL_STAMP_NAME
 )
 
 # --- Environment & Path Helpers ---
@@ -36,14 +42,39 @@ def find_venv(project_dir: Path) -> Optional[Path]:
 
 def get_venv_python(venv_path: Path) -> Optional[Path]:
     """Gets the path to the python executable within the venv."""
-    if sys.platform == "win32":
-        python_exe = venv_path / "Scripts" / "python.exe"
-    else:
-        python_exe = venv_path / "bin" / "python"
+    profile = venvs.get_profile(venv_path, probe=False)
+    if profile:
+        return Path(profile["python"])
+    python_exe = venvs.python_path(venv_path)
     return python_exe if python_exe.exists() else None
 
+def get_site_packages(venv_path: Path) -> Optional[Path]:
+    """Gets the venv's site-packages directory without starting its interpreter."""
+    profile = venvs.get_profile(venv_path, probe=False)
+    if profile:
+        return Path(profile["site_packages"]) if profile["site_packages"] else None
+    return venvs.site_packages_dir(venv_path)
+
+def read_pyvenv_cfg(venv_path: Path) -> Dict[str, str]:
+    """Parses the venv's pyvenv.cfg into a dict (keys lower-cased)."""
+    values = {}
+    try:
+        with open(venv_path / "pyvenv.cfg", "r", encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    values[key.strip().lower()] = value.strip()
+    except OSError as e:
+        log.debug(f"Could not read pyvenv.cfg in {venv_path}: {e}")
+    return values
+
 def get_executable(venv_path: Optional[Path], command: str) -> str:
     """Gets the command path, preferring the venv's bin/Scripts."""
+    profile = venvs.get_profile(venv_path, probe=False) if venv_path else None
+    if profile:
+        if command in profile["executables"]:
+            return profile["executables"][command]
+        return f'"{profile["python"]}" -m {command}'
     if venv_path:
         if sys.platform == "win32":
             exe_path = venv_path / "Scripts" / f"{command}.exe"
@@ -78,6 +109,156 @@ def get_executable(venv_path: Optional[Path], command: str) -> str:
 
 # --- Subprocess Execution ---
 
+STREAM_TAIL_BYTES = 64 * 1024 # Per pipe, kept for error reports in streaming mode
+
+# Set by the global --log-file option: every non-captured command is then
+# streamed, and its output appended to this file as well as shown.
+_output_log: Optional[Path] = None
+_output_log_lock = threading.Lock()
+# Set by the global --timeout option: default time limit for every command
+_command_timeout: Optional[float] = None
+
+
+def set_output_log(path: Optional[Path]):
+    """Tees the output of subsequent commands into path (None to stop)."""
+    global _output_log
+    _output_log = path
+
+
+def output_log() -> Optional[Path]:
+    """The file command output is teed into (global --log-file), if any."""
+    return _output_log
+
+
+def set_command_timeout(seconds: Optional[float]):
+    """Sets the default time limit for subsequent commands (None for no limit)."""
+    global _command_timeout
+    _command_timeout = seconds
+
+
+def command_timeout() -> Optional[float]:
+    """The default time limit for commands (global --timeout), if any."""
+    return _command_timeout
+
+
+def _group_options(timeout: Optional[float]) -> Dict[str, Any]:
+    """Popen options for a child that may need terminating with its process group on timeout."""
+    if timeout is None:
+        return {}
+    from . import procs # asyncio-based; kept off the startup path
+    return procs.group_options()
+
+
+def _wait(process: subprocess.Popen, timeout: Optional[float], cmd_list, communicate: bool = True) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Waits for a child started with procs.group_options() when timeout is set,
+    collecting any piped output (unless communicate is False: the caller
+    reads the pipes). On timeout or Ctrl-C, its process group is terminated;
+    a timeout raises Exit(124).
+    """
+    try:
+        if not communicate:
+            process.wait(timeout)
+            return None, None
+        return process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        log.error(f"Command timed out after {timeout:g}s; terminating its process group: {cmd_list}")
+        from . import procs
+        procs.terminate_group(process)
+        raise Exit(procs.TIMEOUT_EXIT_CODE)
+    except KeyboardInterrupt:
+        if timeout is not None: # In its own session, so the terminal's Ctrl-C did not reach it
+            from . import procs
+            procs.terminate_group(process)
+        raise
+
+
+def _pump_pipe(pipe, sinks: List[Any], lock: threading.Lock, tail: deque, tail_bytes: int, full: Optional[List[bytes]]) -> int:
+    """
+    Copies a child's pipe to sinks as data arrives, keeping the last
+    tail_bytes in tail (and everything in full, if given). Returns the bytes read.
+    """
+    total = size = 0
+    read = getattr(pipe, "read1", pipe.read)
+    for chunk in iter(lambda: read(1 << 16), b""):
+        total += len(chunk)
+        if sinks:
+            with lock:
+                for sink in sinks:
+                    sink.write(chunk)
+                    sink.flush()
+        if full is not None:
+            full.append(chunk)
+        tail.append(chunk)
+        size += len(chunk)
+        while size - len(tail[0]) >= tail_bytes:
+            size -= len(tail.popleft())
+    return total
+
+
+def _run_streaming(
+    cmd_list: List[str] | str,
+    cwd: Optional[Path],
+    env: Dict[str, str],
+    shell: bool,
+    tee: bool,
+    log_file: Optional[Path],
+    tail_bytes: int,
+    keep_output: bool,
+    timeout: Optional[float] = None,
+) -> Tuple[int, str, str, int]:
+    """
+    Runs a command reading stdout and stderr incrementally on two threads, so
+    memory stays bounded however much it prints. Returns the exit code, the
+    stdout and stderr text (the last tail_bytes of each, or everything with
+    keep_output) and the total number of output bytes.
+    """
+    log_handle = None
+    if log_file:
+        log_handle = open(log_file, "ab")
+        label = cmd_list if isinstance(cmd_list, str) else " ".join(str(c) for c in cmd_list)
+        log_handle.write(f"$ {label}\n".encode())
+    try:
+        group = _group_options(timeout)
+        process = subprocess.Popen(cmd_list, cwd=cwd, env=env, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **group)
+        pipes = []
+        for pipe, terminal in ((process.stdout, sys.stdout), (process.stderr, sys.stderr)):
+            sinks = [getattr(terminal, "buffer", None)] if tee else []
+            if log_handle:
+                sinks.append(log_handle)
+            pipes.append((pipe, [sink for sink in sinks if sink is not None], deque(), [] if keep_output else None))
+        totals = [0, 0]
+
+        def pump(index: int):
+            pipe, sinks, tail, full = pipes[index]
+            totals[index] = _pump_pipe(pipe, sinks, _output_log_lock, tail, tail_bytes, full)
+
+        readers = [threading.Thread(target=pump, args=(i,), daemon=True) for i in range(2)]
+        for reader in readers:
+            reader.start()
+        try:
+            _wait(process, timeout, cmd_list, communicate=False)
+            rc = process.returncode
+        except KeyboardInterrupt:
+            if process.returncode is None:
+                process.kill()
+            raise
+        finally:
+            for reader in readers:
+                reader.join()
+            process.stdout.close()
+            process.stderr.close()
+    finally:
+        if log_handle:
+            log_handle.close()
+
+    texts = []
+    for _, _, tail, full in pipes:
+        data = b"".join(full) if full is not None else b"".join(tail)[-tail_bytes:]
+        texts.append(data.decode(errors="replace").strip())
+    return rc, texts[0], texts[1], sum(totals)
+
+
 def run_cmd(
     cmd_list: List[str] | str,
     cwd: Optional[Path] = None,
@@ -85,47 +266,99 @@ def run_cmd(
     check: bool = True,
     env: Optional[Dict[str, str]] = None,
     shell: bool = False, # Use with caution! Only if cmd is a string.
+    stream: Optional[bool] = None,
+    tee: Optional[bool] = None,
+    log_file: Optional[Path] = None,
+    tail_bytes: int = STREAM_TAIL_BYTES,
+    keep_output: bool = False,
+    timeout: Optional[float] = None,
 ) -> Tuple[int, str, str]:
-    """Runs a command using subprocess, returning status, stdout, stderr."""
+    """
+    Runs a command using subprocess, returning status, stdout, stderr.
+
+    With stream=True, output is read incrementally instead of buffered:
+    it is shown as it arrives (tee, default: not capture), appended to
+    log_file (default: the global --log-file), and only the last tail_bytes
+    of each pipe are returned unless keep_output is set. stream defaults to
+    True for non-captured commands when a log file is configured.
+
+    With timeout (default: the global --timeout), the command runs in its
+    own process group, which is terminated if it is still running after
+    timeout seconds; pippy then exits with code 124.
+    """
     effective_env = os.environ.copy()
     if env:
         effective_env.update(env)
+    log_file = log_file or _output_log
+    if stream is None:
+        stream = not capture and log_file is not None
+    if tee is None:
+        tee = not capture
+    if timeout is None:
+        timeout = _command_timeout
 
     log.info(f"Running command: {cmd_list} in {cwd or Path.cwd()}")
 
-    try:
-        process = subprocess.run(
-            cmd_list,
-            cwd=cwd,
-            capture_output=capture,
-            text=True,
-            check=False, # We handle the check manually
-            env=effective_env,
-            shell=shell, # SECURITY RISK if cmd_list comes from untrusted input
-        )
-        stdout = process.stdout.strip() if process.stdout else ""
-        stderr = process.stderr.strip() if process.stderr else ""
-
-        if capture and stdout:
-             log.debug(f"Stdout: {stdout}")
-        if stderr:
-             log.debug(f"Stderr: {stderr}") # Log stderr even if not capturing stdout specifically
-
-        if check and process.returncode != 0:
-            log.error(f"Command failed with exit code {process.returncode}: {cmd_list}")
+    with timings.command(cmd_list) as timing:
+        try:
+            if stream:
+                returncode, stdout, stderr, output_bytes = _run_streaming(
+                    cmd_list, cwd, effective_env, shell, tee, log_file, tail_bytes, keep_output, timeout)
+                timing["output_bytes"] = output_bytes
+            else:
+                pipe = subprocess.PIPE if capture else None
+                process = subprocess.Popen(
+                    cmd_list,
+                    cwd=cwd,
+                    stdout=pipe,
+                    stderr=pipe,
+                    text=True,
+                    env=effective_env,
+                    shell=shell, # SECURITY RISK if cmd_list comes from untrusted input
+                    **_group_options(timeout),
+                )
+                raw_stdout, raw_stderr = _wait(process, timeout, cmd_list)
+                returncode = process.returncode
+                stdout = raw_stdout.strip() if raw_stdout else ""
+                stderr = raw_stderr.strip() if raw_stderr else ""
+                if capture:
+                    timing["output_bytes"] = len((raw_stdout or "").encode()) + len((raw_stderr or "").encode())
+            timing["exit_code"] = returncode
+
+            if capture and stdout:
+                 log.debug(f"Stdout: {stdout}")
             if stderr:
-                echo(style(f"Error Output:\n{stderr}", fg=colors.RED), err=True)
-            # Consider raising an exception instead of Exit for better control flow
-            raise Exit(process.returncode)
+                 log.debug(f"Stderr: {stderr}") # Log stderr even if not capturing stdout specifically
+
+            if check and returncode != 0:
+                log.error(f"Command failed with exit code {returncode}: {cmd_list}")
+                if stderr and not (stream and tee): # Streamed output was already shown
+                    echo(style(f"Error Output:\n{stderr}", fg=colors.RED), err=True)
+                # Consider raising an exception instead of Exit for better control flow
+                raise Exit(returncode)
+
+            return returncode, stdout, stderr
+
+        except FileNotFoundError:
+            log.error(f"Command not found: {cmd_list[0] if isinstance(cmd_list, list) else cmd_list.split()[0]}")
+            raise Exit(127)
+        except Exit:
+            raise
+        except Exception as e:
+            log.error(f"An error occurred while running command: {cmd_list}\n{e}")
+            raise Exit(1)
 
-        return process.returncode, stdout, stderr
 
-    except FileNotFoundError:
-        log.error(f"Command not found: {cmd_list[0] if isinstance(cmd_list, list) else cmd_list.split()[0]}")
-        raise Exit(127)
-    except Exception as e:
-        log.error(f"An error occurred while running command: {cmd_list}\n{e}")
-        raise Exit(1)
+def _python_for(venv_path: Optional[Path]) -> str:
+    """The venv's python, or the current interpreter without a usable venv."""
+    python_exe = sys.executable # Default to current python
+    if venv_path:
+        venv_python = get_venv_python(venv_path)
+        if venv_python:
+            python_exe = str(venv_python)
+        else:
+            log.warning(f"Could not find python executable in venv: {venv_path}")
+    return python_exe
 
 
 def run_python_cmd(
@@ -135,18 +368,38 @@ def run_python_cmd(
     capture: bool = False,
     check: bool = True,
     env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
 ) -> Tuple[int, str, str]:
-    """Runs a python command, preferring the venv's python."""
-    python_exe = sys.executable # Default to current python
-    if venv_path:
-        venv_python = get_venv_python(venv_path)
-        if venv_python:
-            python_exe = str(venv_python)
-        else:
-            log.warning(f"Could not find python executable in venv: {venv_path}")
+    """Runs a python command, preferring the venv's python (timeout as in run_cmd)."""
+    cmd = [_python_for(venv_path)] + args
+    return run_cmd(cmd, cwd=cwd, capture=capture, check=check, env=env, timeout=timeout)
 
-    cmd = [python_exe] + args
-    return run_cmd(cmd, cwd=cwd, capture=capture, check=check, env=env)
+
+def can_exec() -> bool:
+    """
+    Whether pippy may replace itself with a command: POSIX only (Windows
+    emulates exec with a child process and loses its exit code), and not
+    when --timings, --trace, --log-file or --timeout need pippy to stay.
+    """
+    return os.name == "posix" and not timings.is_enabled() and _output_log is None and _command_timeout is None
+
+
+def exec_python(args: List[str], venv_path: Optional[Path], cwd: Optional[Path] = None):
+    """
+    Replaces the pippy process with the venv's python running args (in
+    cwd). Never returns; raises Exit(127) if the interpreter cannot start.
+    """
+    python_exe = _python_for(venv_path)
+    log.debug(f"Executing: {[python_exe] + args} in {cwd or Path.cwd()}")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        os.execv(python_exe, [python_exe] + args)
+    except OSError as e:
+        log.error(f"Could not execute {python_exe}: {e}")
+        raise Exit(127)
 
 def run_pip_cmd(
     args: List[str],
@@ -170,56 +423,113 @@ def ensure_python_module_installed(
     Checks if a Python module can be imported in the venv and installs
     it using 'python -m pip install' if not.
     """
-    # Determine the correct python executable (venv preferred)
-    python_exe = sys.executable # Default to current python
-    if venv_path:
-        venv_python = get_venv_python(venv_path)
-        if venv_python:
-            python_exe = str(venv_python)
-        else:
-            log.warning(f"Could not find python executable in venv: {venv_path}. Using {sys.executable} for check/install.")
-            # Depending on severity, you might want to raise Exit(1) here
+    ensure_tools_installed(
+        [{"tool_name": module_name, "pip_package": pip_package, "check_import": module_name}],
+        venv_path, project_dir,
+    )
 
-    log.debug(f"Checking if module '{module_name}' is importable using {python_exe}")
-    # Command to check if the module can be found by the interpreter
-    check_cmd = [
-        python_exe,
-        "-c",
-        f"import importlib.util; import sys; sys.exit(0 if importlib.util.find_spec('{module_name}') else 1)"
-    ]
+# --- Tool Installation/Check Helpers ---
 
+# Reports, as JSON, which of the modules named in argv can be found. find_spec
+# raises for a dotted name whose parent package is missing, so that counts as
+# not found too.
+_PROBE_SCRIPT = """\
+import importlib.util, json, sys
+def found(name):
     try:
-        # Run the check command silently
-        rc, _, _ = run_cmd(check_cmd, cwd=project_dir, check=False, capture=True)
-        if rc == 0:
-            log.debug(f"Module '{module_name}' is available.")
-            return # Module exists and is importable, nothing more to do
-    except Exception as e:
-        log.warning(f"Failed during check for module '{module_name}': {e}")
-        # Proceed to install just in case the check itself failed
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+print(json.dumps({name: found(name) for name in sys.argv[1:]}))
+"""
 
-    # If check failed (rc != 0) or the check command itself errored, attempt install
-    log.info(f"Module '{module_name}' not found or check failed, installing '{pip_package}' using 'pip install'...")
+def probe_modules(
+    module_names: Iterable[str],
+    venv_path: Optional[Path],
+    project_dir: Path,
+) -> Dict[str, bool]:
+    """
+    Checks which modules are importable in the venv, from the venv profile
+    where possible and otherwise with a single interpreter launch from
+    project_dir (so the project's own modules count). If the probe itself
+    fails, every module it covered is reported missing.
+    """
+    names = list(dict.fromkeys(module_names))
+    results: Dict[str, bool] = {}
+    # Most checks are answered from the cached venv profile
+    profile = venvs.get_profile(venv_path) if venv_path else None
+    if profile:
+        for name in names:
+            available = venvs.module_available(profile, name)
+            if available is not None:
+                results[name] = available
+        names = [name for name in names if name not in results]
+    if not names:
+        return results
+    log.debug(f"Probing modules in venv: {', '.join(names)}")
     try:
-        # Use run_pip_cmd which ensures using the correct python -m pip
-        run_pip_cmd(["install", pip_package], venv_path, project_dir, check=True)
-        log.info(f"Successfully installed '{pip_package}'.")
-
-        # Optional: Verify again after install
-        try:
-            rc_verify, _, _ = run_cmd(check_cmd, cwd=project_dir, check=False, capture=True)
-            if rc_verify != 0:
-                    log.warning(f"Module '{module_name}' still not importable after installation attempt.")
-            else:
-                    log.debug(f"Module '{module_name}' confirmed importable after installation.")
-        except Exception:
-                log.warning("Could not re-verify module installation.")
-
-    except Exit as e: # Catch Exit exceptions from run_pip_cmd
-        log.error(f"Failed to install '{pip_package}'. Please install it manually in the project venv ('{python_exe} -m pip install {pip_package}').")
-        raise e # Re-raise the exception to halt the process
+        rc, stdout, _ = run_python_cmd(["-c", _PROBE_SCRIPT] + names, venv_path, project_dir, capture=True, check=False)
+        if rc == 0:
+            found = json.loads(stdout.splitlines()[-1])
+            results.update((name, bool(found.get(name))) for name in names)
+            return results
+        log.debug(f"Module probe exited with code {rc}.")
+    except (Exit, ValueError, IndexError) as e:
+        log.debug(f"Module probe failed: {e}")
+    results.update((name, False) for name in names)
+    return results
+
+def ensure_tools_installed(
+    tools: List[Dict[str, Any]],
+    venv_path: Optional[Path],
+    project_dir: Path,
+):
+    """
+    Checks several tools at once and installs the missing ones in a single
+    'pip install'. Each tool is a dict with 'tool_name', 'pip_package' and
+    optionally 'check_command' and/or 'check_import', as for
+    ensure_tool_installed. All import checks share one interpreter launch.
+    """
+    python_exe = get_venv_python(venv_path) if venv_path else sys.executable
 
-# --- Tool Installation/Check Helpers ---
+    # 1. Resolve command checks that need no interpreter; collect the rest as module probes
+    installed: Dict[str, bool] = {}
+    probes: Dict[str, str] = {} # tool_name -> module to probe
+    for tool in tools:
+        check_command = tool.get("check_command")
+        check_import = tool.get("check_import")
+        if check_command:
+            cmd_path = get_executable(venv_path, check_command[0])
+            # Check if get_executable returned a direct path or a 'python -m' string
+            if Path(cmd_path).is_file(): # Direct path
+                installed[tool["tool_name"]] = True
+            elif cmd_path.startswith(f'"{python_exe}" -m'): # python -m based
+                probes[tool["tool_name"]] = check_command[0]
+            else: # Tool might be on global PATH but not in venv
+                installed[tool["tool_name"]] = bool(shutil.which(cmd_path))
+        elif check_import:
+            probes[tool["tool_name"]] = check_import
+        else:
+            installed[tool["tool_name"]] = False
+
+    found = probe_modules(probes.values(), venv_path, project_dir)
+    for tool_name, module_name in probes.items():
+        installed[tool_name] = found[module_name]
+
+    # 2. Install everything missing in one pip invocation
+    missing = [tool for tool in tools if not installed[tool["tool_name"]]]
+    if not missing:
+        log.debug(f"Tools available: {', '.join(tool['tool_name'] for tool in tools)}")
+        return
+    names = ", ".join(tool["tool_name"] for tool in missing)
+    packages = list(dict.fromkeys(tool["pip_package"] for tool in missing))
+    log.info(f"Tool(s) not found or inaccessible: {names}. Installing {' '.join(packages)}...")
+    try:
+        run_pip_cmd(["install"] + packages, venv_path, project_dir, check=True)
+        log.info(f"Successfully installed {names}.")
+    except Exit as e:
+        log.error(f"Failed to install {names} ({' '.join(packages)}). Please install manually in the project venv ('{python_exe} -m pip install {' '.join(packages)}').")
+        raise e # Re-raise Exit
 
 def ensure_tool_installed(
     tool_name: str,
@@ -230,41 +540,152 @@ def ensure_tool_installed(
     check_import: Optional[str] = None
 ):
     """Checks if a tool is installed (via command or import) and installs it if not."""
-    installed = False
-    python_exe = get_venv_python(venv_path) if venv_path else sys.executable
+    ensure_tools_installed(
+        [{"tool_name": tool_name, "pip_package": pip_package,
+          "check_command": check_command, "check_import": check_import}],
+        venv_path, project_dir,
+    )
+
+# --- Install Fingerprint ---
+
+def _hash_requirements(req_file: Path, digest, seen: Set[Path]):
+    """Feeds a requirements file and any -r/-c files it references into digest."""
+    req_file = req_file.resolve()
+    if req_file in seen:
+        return
+    seen.add(req_file)
+    try:
+        content = req_file.read_bytes()
+    except OSError:
+        digest.update(b"<missing>" + str(req_file).encode())
+        return
+    digest.update(str(req_file).encode() + b"\0" + content + b"\0")
+    for line in content.decode("utf-8", errors="ignore").splitlines():
+        parts = line.strip().split(None, 1)
+        if len(parts) == 2 and parts[0] in ("-r", "--requirement", "-c", "--constraint"):
+            _hash_requirements(req_file.parent / parts[1].strip(), digest, seen)
+
+def install_fingerprint(venv_path: Path, req_file: Path) -> Dict[str, Any]:
+    """
+    Summarizes everything an install from req_file depends on: the
+    requirements (including nested -r/-c files), the interpreter recorded in
+    pyvenv.cfg and the set of installed distributions (name, version and
+    mtime of each *.dist-info). Computed from the filesystem only.
+    """
+    req_digest = hashlib.sha256()
+    _hash_requirements(req_file, req_digest, set())
 
-    # 1. Check if tool command exists or module can be imported
-    if check_command:
-        cmd_path = get_executable(venv_path, check_command[0])
-        # Check if get_executable returned a direct path or a 'python -m' string
-        if Path(cmd_path).is_file(): # Direct path
-             installed = True
-        elif cmd_path.startswith(f'"{python_exe}" -m'): # python -m based
-             # Check if the underlying module exists
-            try:
-                 rc, _, _ = run_python_cmd(["-c", f"import importlib.util; import sys; sys.exit(0 if importlib.util.find_spec('{check_command[0]}') else 1)"], venv_path, project_dir, check=False)
-                 installed = (rc == 0)
-            except Exception:
-                 installed = False # Error running check
-        else: # Tool might be on global PATH but not in venv
-            installed = bool(shutil.which(cmd_path))
-    elif check_import:
+    cfg = read_pyvenv_cfg(venv_path)
+    dist_digest = hashlib.sha256()
+    site_packages = get_site_packages(venv_path)
+    if site_packages:
         try:
-            rc, _, _ = run_python_cmd(["-c", f"import importlib.util; import sys; sys.exit(0 if importlib.util.find_spec('{check_import}') else 1)"], venv_path, project_dir, check=False)
-            installed = (rc == 0)
-        except Exception as e:
-            log.debug(f"Import check failed for {check_import}: {e}")
-            installed = False # Error running check
+            with os.scandir(site_packages) as entries:
+                dist_infos = sorted(
+                    (entry.name, entry.stat().st_mtime_ns) for entry in entries
+                    if entry.name.endswith(".dist-info")
+                )
+        except OSError:
+            dist_infos = []
+        for name, mtime_ns in dist_infos:
+            dist_digest.update(f"{name}:{mtime_ns}\n".encode())
+
+    return {
+        "requirements": req_digest.hexdigest(),
+        "python": cfg.get("version") or cfg.get("version_info"),
+        "pyvenv_cfg": hashlib.sha256(repr(sorted(cfg.items())).encode()).hexdigest(),
+        "site_packages": dist_digest.hexdigest(),
+    }
+
+def read_install_stamp(venv_path: Path) -> Optional[Dict[str, Any]]:
+    """Reads the fingerprint stored by the last successful install, if any."""
+    try:
+        with open(venv_path / INSTALL_STAMP_NAME, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    # 2. Install if not found
-    if not installed:
-        log.info(f"Tool '{tool_name}' not found or inaccessible, installing '{pip_package}'...")
+def write_install_stamp(venv_path: Path, fingerprint: Dict[str, Any]):
+    """Stores an install fingerprint in the venv."""
+    try:
+        with open(venv_path / INSTALL_STAMP_NAME, "w") as f:
+            json.dump(fingerprint, f, indent=2)
+    except OSError as e:
+        log.warning(f"Could not write install stamp in {venv_path}: {e}")
+
+# --- File Cloning ---
+
+_FICLONE = 0x40049409 # From linux/fs.h: share extents with another file (btrfs, XFS, ...)
+
+def clone_file(src: str, dst: str, method: str = "reflink", hardlink: bool = True) -> str:
+    """
+    Creates dst with src's content using method ('reflink', 'hardlink' or
+    'copy'), falling back to the next one when the filesystem refuses.
+    Returns the method that worked, so callers cloning many files can skip
+    methods already known to fail. Hardlinked files share an inode, so
+    callers must replace such files rather than write to them in place;
+    hardlink=False skips that method for files others may edit.
+    """
+    if method == "reflink":
+        if sys.platform.startswith("linux"):
+            import fcntl
+            try:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                shutil.copystat(src, dst)
+                return "reflink"
+            except OSError:
+                try:
+                    os.unlink(dst)
+                except OSError:
+                    pass
+        method = "hardlink" if hardlink else "copy"
+    if method == "hardlink":
         try:
-            run_pip_cmd(["install", pip_package], venv_path, project_dir, check=True)
-            log.info(f"Successfully installed {tool_name}.")
-        except Exit as e:
-            log.error(f"Failed to install {tool_name} ({pip_package}). Please install it manually.")
-            raise e # Re-raise Exit
+            os.link(src, dst)
+            return "hardlink"
+        except OSError: # EXDEV (other filesystem), EPERM, EMLINK, ...
+            method = "copy"
+    shutil.copy2(src, dst)
+    return "copy"
+
+def clone_tree(src: Path, dst: Path, method: str = "reflink", hardlink: bool = True) -> str:
+    """
+    Recreates the directory tree src at dst: directories are created,
+    symlinks copied as symlinks, and files cloned with clone_file. Returns
+    the last method that worked.
+    """
+    os.makedirs(dst, exist_ok=True)
+    stack = [(str(src), str(dst))]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        with os.scandir(src_dir) as entries:
+            for entry in entries:
+                target = os.path.join(dst_dir, entry.name)
+                if entry.is_symlink():
+                    os.symlink(os.readlink(entry.path), target)
+                elif entry.is_dir():
+                    os.mkdir(target)
+                    shutil.copymode(entry.path, target)
+                    stack.append((entry.path, target))
+                else:
+                    method = clone_file(entry.path, target, method, hardlink)
+    return method
+
+def rewrite_file(path: Path, old: bytes, new: bytes) -> bool:
+    """
+    Replaces old with new in a text file, writing a fresh file so a
+    hardlinked original is left untouched. Binary files (containing NUL
+    bytes) are skipped. Returns True if the file changed.
+    """
+    content = path.read_bytes()
+    if old not in content or b"\0" in content:
+        return False
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(content.replace(old, new))
+    shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
+    return True
 
 # --- Configuration File Helpers ---
 
@@ -304,40 +725,98 @@ def update_config_value(project_dir: Path, key: str, value: Any):
 
 # --- Other Helpers ---
 
-def find_python_files(project_dir: Path) -> List[Path]:
-    """Finds all .py files, excluding common non-project dirs."""
-    py_files = []
-    for item in project_dir.rglob('*.py'):
-        # Check if the file is within any excluded directory path
-        is_excluded = False
-        for exclude_dir in EXCLUDE_DIRS:
+def compile_excludes(exclude: Optional[Iterable[str]] = None) -> Tuple[Set[str], Set[str]]:
+    """Splits exclusions into bare directory names and multi-segment relative paths."""
+    names, rel_paths = set(), set()
+    for item in (EXCLUDE_DIRS if exclude is None else exclude):
+        item = item.replace("\\", "/").strip("/")
+        if "/" in item:
+            rel_paths.add(item)
+        elif item:
+            names.add(item)
+    return names, rel_paths
+
+def scan_dir(
+    dir_path: str,
+    rel_dir: str,
+    excludes: Tuple[Set[str], Set[str]],
+) -> Tuple[List[os.DirEntry], List[os.DirEntry]]:
+    """
+    Lists one directory with os.scandir, returning (dirs, files) with excluded
+    directories already dropped. A bare name (e.g. '.venv') matches at any
+    depth, a multi-segment entry (e.g. 'docs/_build') matches that path from
+    the project root. Symlinked directories are listed as files.
+    """
+    names, rel_paths = excludes
+    dirs: List[os.DirEntry] = []
+    files: List[os.DirEntry] = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
             try:
-                # Check if the item's path relative to project_dir starts with an excluded dir
-                relative_path = item.relative_to(project_dir)
-                if relative_path.parts[0] == exclude_dir:
-                    is_excluded = True
-                    break
-            except ValueError:
-                 # Happens if item is not relative to project_dir (shouldn't with rglob)
-                 pass
-            except IndexError:
-                 # Happens for files directly in project_dir
-                 pass
-        if not is_excluded:
-            py_files.append(item)
-    return py_files
-
-def check_for_main_block(file_path: Path) -> bool:
-    """Checks if a Python file likely contains a 'if __name__ == \"__main__\":' block."""
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            # Simple check, could be improved with regex for whitespace variations
-            content = f.read()
-            return 'if __name__ == "__main__":' in content or \
-                   "if __name__ == '__main__':" in content
-    except Exception as e:
-        log.warning(f"Could not read file {file_path} to check for main block: {e}")
-        return False
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if not is_dir:
+                files.append(entry)
+                continue
+            child_rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.name in names or child_rel in rel_paths:
+                continue
+            dirs.append(entry)
+    return dirs, files
+
+def is_excluded(rel_path: str, excludes: Tuple[Set[str], Set[str]]) -> bool:
+    """Checks whether a '/'-separated file path lies inside an excluded directory."""
+    names, rel_paths = excludes
+    parts = rel_path.split("/")[:-1]
+    for i, part in enumerate(parts):
+        if part in names or (rel_paths and "/".join(parts[:i + 1]) in rel_paths):
+            return True
+    return False
+
+def walk_project(
+    project_dir: Path,
+    exclude: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[str, List[os.DirEntry], List[os.DirEntry]]]:
+    """
+    Walks the project top-down, yielding (rel_dir, dirs, files) where rel_dir
+    is the '/'-separated path relative to project_dir ("" for the root).
+    Excluded directories (see scan_dir) are pruned before descending. Callers
+    may remove entries from 'dirs' to prune further.
+    """
+    excludes = compile_excludes(exclude)
+    stack = [(str(project_dir), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            dirs, files = scan_dir(dir_path, rel_dir, excludes)
+        except OSError as e:
+            log.debug(f"Skipping unreadable directory {dir_path}: {e}")
+            continue
+
+        yield rel_dir, dirs, files
+
+        for entry in reversed(dirs):
+            stack.append((entry.path, f"{rel_dir}/{entry.name}" if rel_dir else entry.name))
+
+# 'if __name__ == "__main__":' with any spacing, quote style, optional
+# parentheses and either operand order, anchored at the start of a line.
+MAIN_BLOCK_PATTERN = rb"""^[ \t]*if[ \t(]+(?:__name__[ \t]*==[ \t]*(['"])__main__\1|(['"])__main__\2[ \t]*==[ \t]*__name__)[ \t)]*:"""
+_MAIN_BLOCK_RE = re.compile(MAIN_BLOCK_PATTERN, re.MULTILINE)
+_MAIN_BLOCK_RE_TEXT = re.compile(MAIN_BLOCK_PATTERN.decode(), re.MULTILINE)
+
+def has_main_block(content: Union[str, bytes, mmap.mmap]) -> bool:
+    """Checks if Python source (text, bytes or an mmap) contains a 'if __name__ == \"__main__\":' block."""
+    regex = _MAIN_BLOCK_RE_TEXT if isinstance(content, str) else _MAIN_BLOCK_RE
+    return regex.search(content) is not None
+
+def format_bytes(size: float) -> str:
+    """Formats a byte count for humans (e.g. '12.3 MB')."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
 
 def prompt_yes_no(question: str, default_yes: bool = True) -> bool:
     """Asks a yes/no question and returns the boolean result."""
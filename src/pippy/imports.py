@@ -0,0 +1,141 @@
+import sys
+import sysconfig
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from . import dists, helpers, index, venvs
+from .config import log
+
+# --- Requirement Detection ---
+# Replaces the pipreqs subprocess: imports come from the project index
+# (parsed once per file content), and import names are mapped to
+# distributions using the venv's installed metadata, then a bundled table.
+# No network access is needed.
+
+# Import names whose PyPI distribution is named differently. Consulted only
+# when no installed distribution in the venv provides the import.
+IMPORT_TO_DISTRIBUTION = {
+    "Bio": "biopython",
+    "Crypto": "pycryptodome",
+    "MySQLdb": "mysqlclient",
+    "OpenSSL": "pyOpenSSL",
+    "PIL": "Pillow",
+    "attr": "attrs",
+    "bs4": "beautifulsoup4",
+    "cv2": "opencv-python",
+    "dateutil": "python-dateutil",
+    "dns": "dnspython",
+    "docx": "python-docx",
+    "dotenv": "python-dotenv",
+    "fitz": "PyMuPDF",
+    "gi": "PyGObject",
+    "git": "GitPython",
+    "google": "protobuf",
+    "jose": "python-jose",
+    "jwt": "PyJWT",
+    "magic": "python-magic",
+    "multipart": "python-multipart",
+    "nacl": "PyNaCl",
+    "pkg_resources": "setuptools",
+    "pptx": "python-pptx",
+    "ruamel": "ruamel.yaml",
+    "serial": "pyserial",
+    "skimage": "scikit-image",
+    "sklearn": "scikit-learn",
+    "slugify": "python-slugify",
+    "telegram": "python-telegram-bot",
+    "usb": "pyusb",
+    "websocket": "websocket-client",
+    "win32api": "pywin32",
+    "win32con": "pywin32",
+    "yaml": "PyYAML",
+    "zmq": "pyzmq",
+}
+
+
+def stdlib_modules(venv_path: Optional[Path] = None) -> Set[str]:
+    """
+    Top-level standard library module names for the venv's interpreter (from
+    its profile), or the running interpreter's without a venv. They differ
+    across versions: e.g. zoneinfo and dataclasses are PyPI backports on
+    Pythons that predate them.
+    """
+    profile = venvs.get_profile(venv_path) if venv_path else None
+    if profile and "stdlib_modules" in profile["interpreter"]:
+        return set(profile["interpreter"]["stdlib_modules"]) | {"__future__"}
+    names = getattr(sys, "stdlib_module_names", None) # Python 3.10+
+    if names:
+        return set(names) | {"__future__"}
+    # Older interpreters: list the stdlib directory instead
+    found = set(sys.builtin_module_names) | {"__future__"}
+    stdlib = Path(sysconfig.get_paths()["stdlib"])
+    for directory in (stdlib, stdlib / "lib-dynload"):
+        try:
+            for entry in directory.iterdir():
+                if entry.name != "site-packages":
+                    found.add(entry.name.split(".")[0])
+        except OSError:
+            pass
+    return found
+
+
+def local_modules(rel_paths: List[str]) -> Set[str]:
+    """
+    Names importable from the project itself: the top-level modules and
+    packages in its root or in src/. Deeper directories (e.g. a vendored
+    'requests/' under tests/) do not shadow real dependencies.
+    """
+    names = set()
+    for rel_path in rel_paths:
+        parts = rel_path.split("/")
+        if parts[0] == "src" and len(parts) > 1:
+            parts = parts[1:]
+        top = parts[0]
+        if len(parts) > 1 or top.endswith(".py"):
+            names.add(top[:-3] if len(parts) == 1 else top)
+    return names
+
+
+def project_imports(project_dir: Path, venv_path: Optional[Path] = None) -> Dict[str, List[str]]:
+    """Maps each third-party top-level import to the project files that use it."""
+    entries = index.refresh_index(project_dir)
+    ignore = stdlib_modules(venv_path) | local_modules(list(entries))
+    used: Dict[str, List[str]] = {}
+    for rel_path, entry in sorted(entries.items()):
+        if entry["imports"] is None:
+            log.warning(f"Could not parse {rel_path}; its imports are not included.")
+            continue
+        for name in entry["imports"]:
+            if name not in ignore:
+                used.setdefault(name, []).append(rel_path)
+    return used
+
+
+def detect_requirements(project_dir: Path, venv_path: Optional[Path]) -> List[Dict[str, Any]]:
+    """
+    Resolves the project's third-party imports to distributions. Each result
+    has 'name', 'version' (the version installed in the venv, or None) and
+    'imports' (the import names it satisfies), sorted by name.
+    """
+    site_packages = helpers.get_site_packages(venv_path) if venv_path else None
+    provided = dists.packages_distributions(site_packages) if site_packages else {}
+    installed = dists.installed_distributions(site_packages) if site_packages else {}
+
+    requirements: Dict[str, Dict[str, Any]] = {}
+    for import_name in project_imports(project_dir, venv_path):
+        names = provided.get(import_name) or [IMPORT_TO_DISTRIBUTION.get(import_name, import_name)]
+        for name in names:
+            key = dists.canonical_name(name)
+            dist = installed.get(key)
+            req = requirements.setdefault(key, {
+                "name": dist["name"] if dist else name,
+                "version": dist["version"] if dist else None,
+                "imports": [],
+            })
+            req["imports"].append(import_name)
+    return sorted(requirements.values(), key=lambda req: req["name"].lower())
+
+
+def format_requirements(requirements: List[Dict[str, Any]]) -> List[str]:
+    """Renders detected requirements as requirements.txt lines (pinned when installed)."""
+    return [f"{req['name']}=={req['version']}" if req["version"] else req["name"] for req in requirements]
@@ -0,0 +1,258 @@
+import ast
+import hashlib
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from . import helpers, vcs
+from .config import log, STATE_DIR_NAME, INDEX_FILE_NAME, EXCLUDE_DIRS
+
+# --- Project File Index ---
+# A persistent index of the project's Python files, stored in
+# .pippy/index.json. Each refresh re-lists only directories whose mtime
+# changed (entries added/removed/renamed), or asks git for the file list in a
+# checkout, and re-reads only files whose size, mtime_ns or inode changed, so
+# repeated scans of a large tree cost one stat per file instead of a full
+# read/parse of every file.
+
+INDEX_VERSION = 3
+INDEXED_SUFFIXES = (".py",)
+# Below this many files to parse, a process pool costs more than it saves
+PROCESS_POOL_MIN_FILES = 64
+
+
+def _index_path(project_dir: Path) -> Path:
+    return project_dir / STATE_DIR_NAME / INDEX_FILE_NAME
+
+
+def _empty_index() -> Dict[str, Any]:
+    return {"version": INDEX_VERSION, "exclude": sorted(EXCLUDE_DIRS), "scanned_ns": 0, "dirs": {}, "files": {}}
+
+
+def load_index(project_dir: Path) -> Dict[str, Any]:
+    """Reads the on-disk index, returning an empty one if missing or stale."""
+    try:
+        with open(_index_path(project_dir), "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return _empty_index()
+    except (OSError, ValueError) as e:
+        log.debug(f"Ignoring unreadable project index: {e}")
+        return _empty_index()
+    if data.get("version") != INDEX_VERSION or data.get("exclude") != sorted(EXCLUDE_DIRS):
+        log.debug("Project index format or exclusions changed; rebuilding.")
+        return _empty_index()
+    return data
+
+
+def save_index(project_dir: Path, data: Dict[str, Any]):
+    """Atomically writes the index under .pippy/, creating the directory if needed."""
+    state_dir = project_dir / STATE_DIR_NAME
+    try:
+        state_dir.mkdir(exist_ok=True)
+        gitignore = state_dir / ".gitignore"
+        if not gitignore.exists():
+            gitignore.write_text("# Created by pippy\n*\n")
+        tmp_path = state_dir / f"{INDEX_FILE_NAME}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, _index_path(project_dir))
+    except OSError as e:
+        log.debug(f"Could not write project index to {state_dir}: {e}")
+
+
+def scan_imports(source: Union[str, bytes]) -> Optional[List[str]]:
+    """Returns the sorted top-level absolute imports of a module, or None if it does not parse."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split(".")[0])
+    return sorted(names)
+
+
+def _scan_imports_in_file(path: str) -> Optional[List[str]]:
+    """Process-pool worker: parses one file and returns its imports."""
+    try:
+        with open(path, "rb") as f:
+            return scan_imports(f.read())
+    except OSError:
+        return None
+
+
+def _index_file(path: Path, st: os.stat_result, known: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reads one file (memory-mapped), hashes it and checks for a main block.
+    Facts are copied from 'known' (entries by sha256) when the content was
+    seen before, e.g. after a touch, checkout or file copy; otherwise
+    'imports' is left for refresh_index to fill in.
+    """
+    entry: Dict[str, Any] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            digest = hashlib.sha256(b"").hexdigest()
+            has_main = False
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = hashlib.sha256(mm).hexdigest()
+                has_main = known[digest]["has_main"] if digest in known else helpers.has_main_block(mm)
+    entry["sha256"] = digest
+    entry["has_main"] = has_main
+    if digest in known:
+        entry["imports"] = known[digest]["imports"]
+    return entry
+
+
+def _fill_imports(project_dir: Path, entries: Dict[str, Dict[str, Any]]):
+    """
+    Parses imports for entries that lack them, once per distinct content hash.
+    ast parsing holds the GIL, so large batches go to a process pool.
+    """
+    pending: Dict[str, str] = {} # sha256 -> one rel_path with that content
+    for rel_path, entry in entries.items():
+        if "imports" not in entry:
+            pending.setdefault(entry["sha256"], rel_path)
+    if not pending:
+        return
+    paths = [str(project_dir / rel_path) for rel_path in pending.values()]
+    if len(paths) >= PROCESS_POOL_MIN_FILES and (os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor() as pool:
+            results = list(pool.map(_scan_imports_in_file, paths, chunksize=32))
+    else:
+        results = [_scan_imports_in_file(path) for path in paths]
+    by_hash = dict(zip(pending, results))
+    for entry in entries.values():
+        if "imports" not in entry:
+            entry["imports"] = by_hash[entry["sha256"]]
+
+
+def _walk_dirs(
+    project_dir: Path,
+    old_dirs: Dict[str, Dict[str, Any]],
+    trusted_before: int,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Walks the tree re-listing only directories whose mtime changed. Returns the
+    new directory records and the indexable files, with .gitignore rules applied.
+    """
+    excludes = helpers.compile_excludes(EXCLUDE_DIRS)
+    new_dirs: Dict[str, Dict[str, Any]] = {}
+    rel_paths: List[str] = []
+    stack: List[Tuple[str, Tuple[vcs.IgnoreRule, ...]]] = [("", ())]
+    while stack:
+        rel_dir, rules = stack.pop()
+        abs_dir = project_dir / rel_dir if rel_dir else project_dir
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+            cached = old_dirs.get(rel_dir)
+            if cached and cached["mtime_ns"] == dir_mtime and dir_mtime < trusted_before:
+                record = cached
+            else:
+                dirs, files = helpers.scan_dir(str(abs_dir), rel_dir, excludes)
+                record = {
+                    "mtime_ns": dir_mtime,
+                    "dirs": sorted(d.name for d in dirs),
+                    "files": sorted(f.name for f in files if f.name.endswith(INDEXED_SUFFIXES)),
+                    "gitignore": any(f.name == ".gitignore" for f in files),
+                }
+        except OSError as e:
+            log.debug(f"Skipping unreadable directory {abs_dir}: {e}")
+            continue
+        new_dirs[rel_dir] = record
+
+        # Listings are cached before .gitignore filtering, so edits to a
+        # .gitignore take effect even when its directory mtime is unchanged.
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        if record["gitignore"]:
+            rules = rules + tuple(vcs.read_gitignore(abs_dir / ".gitignore", rel_dir))
+        rel_paths.extend(prefix + name for name in record["files"]
+                         if not (rules and vcs.is_ignored(rules, prefix + name, False)))
+        stack.extend((prefix + d, rules) for d in reversed(record["dirs"])
+                     if not (rules and vcs.is_ignored(rules, prefix + d, True)))
+    return new_dirs, rel_paths
+
+
+def refresh_index(project_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Brings the project index up to date and returns its file entries keyed by
+    '/'-separated path relative to project_dir. In a git checkout the file
+    list comes from 'git ls-files'; otherwise from an mtime-checked walk.
+    """
+    old = load_index(project_dir)
+    old_dirs, old_files = old["dirs"], old["files"]
+    # Anything modified at or after the previous scan started may have changed
+    # again within the same mtime tick, so only older timestamps are trusted.
+    trusted_before = old["scanned_ns"]
+    scanned_ns = time.time_ns()
+
+    git_files = vcs.git_ls_files(project_dir)
+    if git_files is not None:
+        excludes = helpers.compile_excludes(EXCLUDE_DIRS)
+        new_dirs: Dict[str, Dict[str, Any]] = {}
+        rel_paths = [p for p in git_files if p.endswith(INDEXED_SUFFIXES) and not helpers.is_excluded(p, excludes)]
+    else:
+        new_dirs, rel_paths = _walk_dirs(project_dir, old_dirs, trusted_before)
+
+    new_files: Dict[str, Dict[str, Any]] = {}
+    stale: List[Tuple[str, os.stat_result]] = []
+    for rel_path in rel_paths:
+        try:
+            st = os.stat(project_dir / rel_path)
+        except OSError as e:
+            # Includes tracked files deleted from the work tree
+            log.debug(f"Could not index {project_dir / rel_path}: {e}")
+            continue
+        entry = old_files.get(rel_path)
+        if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and entry["inode"] == st.st_ino and st.st_mtime_ns < trusted_before):
+            new_files[rel_path] = entry
+        else:
+            stale.append((rel_path, st))
+
+    # Reading and hashing release the GIL, so stale files are hashed in parallel
+    # threads. Facts are reused for any content already indexed under another
+    # path/stat; imports for new content are parsed by _fill_imports.
+    known = {entry["sha256"]: entry for entry in old_files.values()} if stale else {}
+
+    def index_one(item: Tuple[str, os.stat_result]) -> Optional[Dict[str, Any]]:
+        rel_path, st = item
+        try:
+            return _index_file(project_dir / rel_path, st, known)
+        except (OSError, ValueError) as e:
+            log.debug(f"Could not index {project_dir / rel_path}: {e}")
+            return None
+
+    reindexed: Dict[str, Dict[str, Any]] = {}
+    if stale:
+        with ThreadPoolExecutor() as pool:
+            for (rel_path, _), entry in zip(stale, pool.map(index_one, stale)):
+                if entry is not None:
+                    reindexed[rel_path] = entry
+        _fill_imports(project_dir, reindexed)
+        new_files.update(reindexed)
+
+    if reindexed or new_dirs != old_dirs or new_files.keys() != old_files.keys():
+        log.debug(f"Project index: {len(reindexed)} of {len(new_files)} files re-indexed.")
+        save_index(project_dir, {
+            "version": INDEX_VERSION,
+            "exclude": sorted(EXCLUDE_DIRS),
+            "scanned_ns": scanned_ns,
+            "dirs": new_dirs,
+            "files": new_files,
+        })
+    return new_files
+
+
+def python_files(project_dir: Path) -> List[Path]:
+    """Returns the project's indexed Python files as absolute paths."""
+    return [project_dir / rel_path for rel_path in refresh_index(project_dir)]
@@ -0,0 +1,393 @@
+import configparser
+import csv
+import hashlib
+import html
+import io
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urldefrag, urljoin, urlparse
+
+from . import dists, venvs, wheelhouse
+from .config import log
+
+# --- Parallel Install Engine ---
+# Installs fully pinned requirements without dependency resolution (the
+# '--no-deps' delta of 'pippy sync'). pip fetches and installs one package
+# at a time; here every wheel is looked up on the index (PEP 503/691 simple
+# API) and downloaded concurrently over one pooled requests.Session into the
+# wheelhouse and verified against the index and lock-file hashes; once all
+# are in, they are unpacked into site-packages by parallel worker threads.
+# Requirements this engine cannot handle (URLs, editables, markers, no
+# compatible wheel, a failed download) are returned so the caller can pass
+# them to pip. The index follows pip's own configuration; setups with
+# several sources (extra indexes, find-links) are left to pip entirely.
+
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+INSTALLER_NAME = "pippy"
+
+_HASH_OPTION_RE = re.compile(r"--hash[=\s]+(\w+):([0-9a-fA-F]+)")
+_LINK_RE = re.compile(r"<a\s[^>]*?href\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+_SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+_INDEX_SETTINGS = ("index-url", "extra-index-url", "find-links", "no-index")
+
+
+def _pip_config_files(venv_path: Path) -> List[Path]:
+    """pip's configuration files in pip's load order (site-wide, user, venv, PIP_CONFIG_FILE); later ones win."""
+    env_file = os.environ.get("PIP_CONFIG_FILE")
+    if env_file == os.devnull: # pip's way of disabling configuration files
+        return []
+    name = "pip.ini" if os.name == "nt" else "pip.conf"
+    if os.name == "nt":
+        files = [Path(os.environ.get("PROGRAMDATA", "C:\\ProgramData")) / "pip" / name, Path.home() / "pip" / name]
+        if os.environ.get("APPDATA"):
+            files.append(Path(os.environ["APPDATA"]) / "pip" / name)
+    else:
+        files = [Path(d) / "pip" / name for d in os.environ.get("XDG_CONFIG_DIRS", "/etc/xdg").split(":") if d]
+        files += [Path("/etc") / name, Path.home() / ".pip" / name]
+        if sys.platform == "darwin":
+            files.append(Path.home() / "Library" / "Application Support" / "pip" / name)
+        files.append(Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config") / "pip" / name)
+    files.append(venv_path / name)
+    if env_file:
+        files.append(Path(env_file))
+    return files
+
+
+def resolve_index_url(venv_path: Path, lock_options: List[str]) -> Optional[str]:
+    """
+    The index pip would install from, per pip's configuration files, PIP_*
+    variables and the lock file's global options (lock_options, e.g.
+    '--index-url URL'), in increasing precedence; PyPI by default. Returns
+    None when extra indexes, find-links or --no-index are configured:
+    choosing between several sources is left to pip, and fetching a
+    private package's name from PyPI instead would be a dependency
+    confusion risk.
+    """
+    settings: Dict[str, str] = {}
+    for path in _pip_config_files(venv_path):
+        parser = configparser.RawConfigParser()
+        try:
+            parser.read(path, encoding="utf-8")
+        except (configparser.Error, OSError, UnicodeDecodeError) as e:
+            log.debug(f"Could not read pip configuration {path}: {e}")
+            continue
+        for section in ("global", "install"):
+            if parser.has_section(section):
+                settings.update((key.replace("_", "-"), value.strip()) for key, value in parser.items(section))
+    for key in _INDEX_SETTINGS:
+        value = os.environ.get("PIP_" + key.upper().replace("-", "_"))
+        if value:
+            settings[key] = value
+    for option in lock_options:
+        flag, _, value = option.replace("=", " ", 1).partition(" ")
+        flag = {"-i": "--index-url", "-f": "--find-links"}.get(flag, flag)
+        if flag[2:] in _INDEX_SETTINGS:
+            settings[flag[2:]] = value.strip() or "true"
+    if settings.get("extra-index-url") or settings.get("find-links"):
+        return None
+    if settings.get("no-index", "").lower() in ("1", "true", "yes", "on"):
+        return None
+    return settings.get("index-url") or DEFAULT_INDEX_URL
+
+
+def requirement_hashes(line: str) -> Dict[str, Set[str]]:
+    """Collects '--hash=algo:hex' options from a requirement line."""
+    hashes: Dict[str, Set[str]] = {}
+    for algo, value in _HASH_OPTION_RE.findall(line):
+        hashes.setdefault(algo.lower(), set()).add(value.lower())
+    return hashes
+
+
+def can_install(entry: Dict[str, Any]) -> bool:
+    """Whether the engine handles a requirement: a plain 'name==version' pin without markers."""
+    requirement = entry["line"].split(" --hash")[0].split("\t")[0]
+    return bool(entry["key"] and entry["version"]) and ";" not in requirement and "@" not in requirement
+
+
+# --- Fetching ---
+
+def _index_files(session, index_url: str, key: str) -> List[Tuple[str, str, Dict[str, str]]]:
+    """Lists (filename, url, hashes) for a project from a simple index (JSON or HTML)."""
+    url = f"{index_url.rstrip('/')}/{key}/"
+    response = session.get(url, headers={"Accept": f"{_SIMPLE_JSON}, text/html;q=0.1"}, timeout=30)
+    response.raise_for_status()
+    files = []
+    if response.headers.get("Content-Type", "").startswith(_SIMPLE_JSON):
+        for item in response.json().get("files", []):
+            files.append((item["filename"], urljoin(response.url, item["url"]), item.get("hashes", {})))
+        return files
+    # HTML: PyPI-style simple pages, or a plain directory listing (http.server)
+    for href in _LINK_RE.findall(response.text):
+        link, fragment = urldefrag(urljoin(response.url, html.unescape(href)))
+        algo, _, value = fragment.partition("=")
+        filename = unquote(os.path.basename(urlparse(link).path))
+        files.append((filename, link, {algo: value} if value else {}))
+    return files
+
+
+def _choose_wheel(
+    candidates: List[Tuple[str, Any, Dict[str, str]]],
+    entry: Dict[str, Any],
+    tag_rank: Dict[str, int],
+) -> Optional[Tuple[str, Any, Dict[str, str]]]:
+    """Picks the wheel for entry's version whose best tag ranks highest for the venv."""
+    best, best_rank = None, None
+    for candidate in candidates:
+        wheel = wheelhouse.parse_wheel_filename(candidate[0])
+        if not wheel or dists.canonical_name(wheel["name"]) != entry["key"]:
+            continue
+        if not dists.versions_match(entry["version"], wheel["version"]):
+            continue
+        ranks = [tag_rank[tag] for tag in wheel["tags"] if tag in tag_rank]
+        if ranks and (best_rank is None or min(ranks) < best_rank):
+            best, best_rank = candidate, min(ranks)
+    return best
+
+
+def _file_hashes(path: Path, algos: Set[str]) -> Dict[str, str]:
+    digests = {algo: hashlib.new(algo) for algo in algos}
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            for digest in digests.values():
+                digest.update(chunk)
+    return {algo: digest.hexdigest() for algo, digest in digests.items()}
+
+
+def _hashes_ok(actual: Dict[str, str], expected: Dict[str, Set[str]]) -> bool:
+    """True when, for every algorithm with expected values, the actual hash is one of them."""
+    return all(actual.get(algo) in values for algo, values in expected.items() if values)
+
+
+def fetch_wheel(
+    session,
+    entry: Dict[str, Any],
+    index_url: str,
+    tag_rank: Dict[str, int],
+    offline: bool,
+) -> Path:
+    """
+    Returns a verified wheel for a pinned entry: from the wheelhouse if it has
+    one, otherwise downloaded into it. Raises LookupError when no compatible
+    wheel exists (or, offline, none is in the wheelhouse), ValueError on a
+    hash mismatch.
+    """
+    expected = requirement_hashes(entry["line"])
+    local = [(w["path"].name, w["path"], {}) for w in wheelhouse.list_wheels().get(entry["key"], [])]
+    chosen = _choose_wheel(local, entry, tag_rank)
+    if chosen and (not expected or _hashes_ok(_file_hashes(chosen[1], set(expected)), expected)):
+        return chosen[1]
+    if offline or session is None:
+        raise LookupError(f"no wheel for {entry['line']} in the wheelhouse")
+
+    chosen = _choose_wheel(_index_files(session, index_url, entry["key"]), entry, tag_rank)
+    if chosen is None:
+        raise LookupError(f"no compatible wheel for {entry['name']}=={entry['version']} on {index_url}")
+    filename, url, index_hashes = chosen
+    checks = dict(expected)
+    for algo, value in index_hashes.items():
+        if algo in hashlib.algorithms_available:
+            checks.setdefault(algo.lower(), {value.lower()})
+
+    wheelhouse.WHEELHOUSE_DIR.mkdir(parents=True, exist_ok=True)
+    target = wheelhouse.WHEELHOUSE_DIR / filename
+    tmp_path = target.with_name(f".{filename}.{os.getpid()}.{id(entry)}.tmp")
+    digests = {algo: hashlib.new(algo) for algo in checks}
+    try:
+        with session.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+                    for digest in digests.values():
+                        digest.update(chunk)
+        if not _hashes_ok({algo: d.hexdigest() for algo, d in digests.items()}, checks):
+            raise ValueError(f"hash mismatch for {filename} downloaded from {url}")
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return target
+
+
+# --- Unpacking ---
+
+def _safe_join(base: Path, rel: str) -> Path:
+    """Joins a wheel member path to base, refusing absolute paths and '..' escapes."""
+    norm = os.path.normpath(rel)
+    if os.path.isabs(norm) or norm == os.pardir or norm.startswith(os.pardir + os.sep):
+        raise ValueError(f"unsafe path in wheel: {rel}")
+    return base / norm
+
+
+def unpack_wheel(wheel_path: Path, venv_path: Path, site_packages: Path) -> str:
+    """
+    Installs a wheel into the venv (PEP 427): files go to site-packages, .data
+    subdirectories to their scheme locations, '#!python' scripts get the venv
+    interpreter, console scripts are generated, and RECORD, INSTALLER and
+    REQUESTED are written. Every file is checked against the wheel's RECORD.
+    On failure the files written so far are removed. Returns the dist-info name.
+    """
+    python = str(venvs.python_path(venv_path))
+    scripts_dir = venvs.scripts_dir(venv_path)
+    written: List[Path] = []
+    rows: List[Tuple[str, str, str]] = []
+
+    def add_generated(path: Path, content: bytes):
+        written.append(path)
+        rows.append((os.path.relpath(path, site_packages).replace(os.sep, "/"), dists.record_hash(content), str(len(content))))
+
+    try:
+        with zipfile.ZipFile(wheel_path) as zf:
+            names = zf.namelist()
+            dist_info = next(n.split("/")[0] for n in names if re.match(r"^[^/]+\.dist-info/WHEEL$", n))
+            data_dir = dist_info[: -len(".dist-info")] + ".data"
+            with zf.open(f"{dist_info}/RECORD") as f:
+                expected = {row[0]: row[1] for row in csv.reader(io.TextIOWrapper(f, "utf-8")) if len(row) > 1}
+            schemes = {
+                "purelib": site_packages,
+                "platlib": site_packages,
+                "scripts": scripts_dir,
+                "data": venv_path,
+                "headers": venv_path / "include" / "site" / site_packages.parent.name / dist_info.split("-")[0],
+            }
+            for info in zf.infolist():
+                name = info.filename
+                if name.endswith("/") or name == f"{dist_info}/RECORD":
+                    continue
+                is_script = False
+                if name.startswith(data_dir + "/"):
+                    scheme, _, rel = name[len(data_dir) + 1:].partition("/")
+                    if scheme not in schemes:
+                        raise ValueError(f"unknown .data scheme '{scheme}' in {wheel_path.name}")
+                    dest = _safe_join(schemes[scheme], rel)
+                    is_script = scheme == "scripts"
+                else:
+                    dest = _safe_join(site_packages, name)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+
+                digest = hashlib.sha256()
+                written.append(dest)
+                with zf.open(info) as src, open(dest, "wb") as out:
+                    for chunk in iter(lambda: src.read(1 << 20), b""):
+                        digest.update(chunk)
+                        if is_script and chunk.startswith(b"#!python") and out.tell() == 0:
+                            chunk = f"#!{python}".encode() + chunk[len(b"#!python"):].lstrip(b"w")
+                        out.write(chunk)
+                    size = out.tell()
+                if expected.get(name) and dists.format_record_hash(digest.digest()) != expected[name]:
+                    raise ValueError(f"{name} does not match the RECORD of {wheel_path.name}")
+                if is_script or (info.external_attr >> 16) & 0o111:
+                    os.chmod(dest, 0o755)
+                if size != info.file_size: # Rewritten shebang: record what is on disk
+                    digest = hashlib.sha256(dest.read_bytes())
+                rows.append((os.path.relpath(dest, site_packages).replace(os.sep, "/"), dists.format_record_hash(digest.digest()), str(size)))
+
+        dist_path = site_packages / dist_info
+        entry_points = dists.read_entry_points(dist_path)
+        for group in ("console_scripts", "gui_scripts"):
+            for script_name, target in entry_points.get(group, {}).items():
+                script = scripts_dir / script_name
+                add_generated(script, venvs.write_console_script(script, python, target))
+        for meta_name, content in (("INSTALLER", f"{INSTALLER_NAME}\n".encode()), ("REQUESTED", b"")):
+            meta_path = dist_path / meta_name
+            meta_path.write_bytes(content)
+            add_generated(meta_path, content)
+        rows.append((f"{dist_info}/RECORD", "", ""))
+        with open(dist_path / "RECORD", "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(rows)
+    except BaseException:
+        for path in written:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        raise
+    return dist_info
+
+
+# --- Orchestration ---
+
+def _new_session(jobs: int):
+    import requests # Only needed here; keeps CLI startup light
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=jobs, pool_maxsize=jobs, max_retries=3)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def install_pinned(
+    venv_path: Path,
+    entries: List[Dict[str, Any]],
+    index_url: str,
+    jobs: int = 8,
+    offline: bool = False,
+    before_unpack: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Downloads pinned requirements from index_url in parallel, then unpacks
+    them in parallel, without installing dependencies. before_unpack is
+    called with the entries about to be unpacked once every download has
+    been verified (e.g. to uninstall their old versions). Returns the
+    entries it did not install (not plain pins, no compatible wheel, or a
+    failed download, hash check or unpack) for the caller to hand to pip.
+    """
+    profile = venvs.get_profile(venv_path)
+    site_packages = Path(profile["site_packages"]) if profile and profile["site_packages"] else None
+    supported = profile["interpreter"].get("supported_tags") if profile else None
+    if not site_packages or not supported:
+        log.debug("Cannot inspect the venv's interpreter; leaving the install to pip.")
+        return entries
+    tag_rank = {tag: rank for rank, tag in enumerate(supported)}
+
+    pending = [entry for entry in entries if can_install(entry)]
+    leftover = [entry for entry in entries if not can_install(entry)]
+    session = None
+    if pending and not offline:
+        try:
+            session = _new_session(jobs)
+        except ImportError:
+            log.warning("The 'requests' package is not available; only wheels already in the wheelhouse can be installed in parallel.")
+
+    fetched: List[Tuple[Dict[str, Any], Path]] = []
+    with ThreadPoolExecutor(max_workers=jobs) as fetchers:
+        fetches = {fetchers.submit(fetch_wheel, session, entry, index_url, tag_rank, offline): entry for entry in pending}
+        for future in as_completed(fetches):
+            entry = fetches[future]
+            try:
+                fetched.append((entry, future.result()))
+            except LookupError as e:
+                log.debug(f"Leaving {entry['line']} to pip: {e}")
+                leftover.append(entry)
+            except Exception as e:
+                log.warning(f"Could not fetch {entry['name']}=={entry['version']} ({e}); leaving it to pip.")
+                leftover.append(entry)
+    if session is not None:
+        session.close()
+    if not fetched:
+        return leftover
+
+    # Nothing in the venv changes until every wheel is here and verified
+    if before_unpack:
+        before_unpack([entry for entry, _ in fetched])
+    installed = 0
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as unpackers:
+        unpacks = {unpackers.submit(unpack_wheel, wheel_path, venv_path, site_packages): entry for entry, wheel_path in fetched}
+        for future in as_completed(unpacks):
+            entry = unpacks[future]
+            try:
+                future.result()
+                installed += 1
+            except Exception as e:
+                log.warning(f"Could not unpack {entry['name']}=={entry['version']} ({e}); leaving it to pip.")
+                leftover.append(entry)
+    if installed:
+        log.info(f"Installed {installed} packages in parallel.")
+        wheelhouse.after_install(venv_path)
+    return leftover
@@ -1,46 +1,111 @@
+import importlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
 import typer
+from typer.core import TyperGroup
 
 from .config import VERSION, APP_NAME
-from .commands import core, qa, dev
+from .profiling import PROFILERS
+
+# --- Command Manifest ---
+# Verb -> (module under pippy.commands, attribute). Modules are only imported
+# when their verb is dispatched, so e.g. 'pippy run' never pulls in openai.
+# An attribute naming a typer.Typer is mounted as a command group.
+COMMAND_MANIFEST: Dict[str, Tuple[str, str]] = {
+    "init": ("core", "init_project"),
+    "install": ("core", "install_deps"),
+    "run": ("core", "run_script"),
+    "start": ("core", "start_project"),
+    "lock": ("core", "lock_deps"),
+    "sync": ("core", "sync_deps"),
+    "clean": ("core", "clean_pycache"),
+    "shell": ("core", "project_shell"),
+    "info": ("core", "project_info"),
+    "task": ("core", "run_tasks"),
+    "ask": ("qa", "ask_gpt"),
+    # "lint": ("quality", "lint_code"),
+    # "test": ("quality", "run_tests"),
+    # "format": ("quality", "format_code"),
+    # "check": ("quality", "check_code"),
+    "publish": ("dev", "publish"),
+    "pkg": ("dev", "build_package"),
+    "develop": ("dev", "develop"),
+    # "update": ("misc", "update_project"),
+    # "config": ("misc", "configure_project"),
+    # "status": ("misc", "check_status"),
+    # "help": ("misc", "show_help"),
+    # "version": ("misc", "show_version"),
+    # "docs": ("misc", "generate_docs"),
+    # "search": ("misc", "search_code"),
+    # "scan": ("misc", "scan_code"),
+    # Command groups (subcommands)
+    "core": ("core", "app"),
+    "qa": ("qa", "app"),
+    "dev": ("dev", "app"),
+}
+
+# Options with an optional value ('run --profile[=MODE]') -> accepted values.
+# click would take the next token ('--profile main.py') as the value, so a
+# bare option not followed by one of its values is pinned to its default.
+OPTIONAL_VALUE_OPTIONS: Dict[str, Tuple[str, ...]] = {
+    "--profile": PROFILERS,
+}
+
+
+def _pin_optional_values(args: List[str]) -> List[str]:
+    pinned = []
+    for i, arg in enumerate(args):
+        if arg == "--":
+            return pinned + args[i:]
+        values = OPTIONAL_VALUE_OPTIONS.get(arg)
+        if values and (i + 1 >= len(args) or args[i + 1] not in values):
+            arg = f"{arg}={values[0]}"
+        pinned.append(arg)
+    return pinned
+
+
+def _load_command(name: str, module_name: str, attr: str):
+    """Imports a command module and builds the click command for one verb."""
+    module = importlib.import_module(f".commands.{module_name}", __package__)
+    target = getattr(module, attr)
+    if isinstance(target, typer.Typer):
+        cmd = typer.main.get_group(target)
+    else:
+        # Completion install options belong to the top-level app only
+        single = typer.Typer(add_completion=False)
+        single.command(name)(target)
+        cmd = typer.main.get_command(single)
+    cmd.name = name
+    return cmd
+
+
+class LazyGroup(TyperGroup):
+    """Top-level group that resolves manifest verbs on first use."""
+
+    def list_commands(self, ctx):
+        names = list(super().list_commands(ctx))
+        return names + [name for name in COMMAND_MANIFEST if name not in names]
+
+    def get_command(self, ctx, cmd_name: str):
+        cmd = super().get_command(ctx, cmd_name)
+        if cmd is not None or cmd_name not in COMMAND_MANIFEST:
+            return cmd
+        cmd = _load_command(cmd_name, *COMMAND_MANIFEST[cmd_name])
+        self.add_command(cmd, cmd_name)
+        return cmd
+
+    def parse_args(self, ctx, args):
+        return super().parse_args(ctx, _pin_optional_values(args))
+
 
 app = typer.Typer(
     name=APP_NAME,
     help="pippy – lightweight project manager for Python.",
+    cls=LazyGroup,
     add_completion=False, # Disable shell completion for simplicity initially
 )
 
-# Add command groups (subcommands)
-app.add_typer(core.app, name="core", help=core.app.info.help)
-app.add_typer(qa.app, name="qa") 
-app.add_typer(dev.app, name="dev")
-
-# Add top-level commands directly if preferred over groups
-# e.g., @app.command("init") def main_init(...): core.init_project(...)
-app.command("init")(core.init_project)
-app.command("install")(core.install_deps)
-app.command("run")(core.run_script)
-app.command("start")(core.start_project)
-app.command("lock")(core.lock_deps)
-app.command("clean")(core.clean_pycache)
-app.command("shell")(core.project_shell)
-app.command("info")(core.project_info)
-app.command("ask")(qa.ask_gpt)
-# app.command("lint")(quality.lint_code)
-# app.command("test")(quality.run_tests)
-# app.command("format")(quality.format_code)
-# app.command("check")(quality.check_code)
-app.command("publish")(dev.publish)
-app.command("pkg")(dev.build_package)
-app.command("develop")(dev.develop)
-# app.command("update")(misc.update_project)
-# app.command("config")(misc.configure_project)
-# app.command("status")(misc.check_status)
-# app.command("help")(misc.show_help)
-# app.command("version")(misc.show_version)
-# app.command("docs")(misc.generate_docs)
-# app.command("search")(misc.search_code)
-# app.command("scan")(misc.scan_code)
-
 
 def version_callback(value: bool):
     if value:
@@ -49,12 +114,35 @@ def version_callback(value: bool):
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: bool = typer.Option(None, "--version", "-v", callback=version_callback, is_eager=True, help="Show version and exit."),
+    show_timings: bool = typer.Option(False, "--timings", help="Print wall/CPU time of every subprocess and phase when done."),
+    trace_file: Optional[Path] = typer.Option(None, "--trace", help="Write a Chrome/Perfetto trace JSON of the run to FILE.", dir_okay=False, resolve_path=True),
+    log_file: Optional[Path] = typer.Option(None, "--log-file", help="Stream the output of every command pippy runs into FILE (appended) as well as the terminal.", dir_okay=False, resolve_path=True),
+    timeout: Optional[float] = typer.Option(None, "--timeout", min=0.001, help="Terminate any command pippy runs (and its child processes) after SECONDS; pippy then exits with 124."),
 ):
     """
     Pippy Entry Point
     """
-    pass # Main callback can be used for global options/setup
+    if log_file or timeout:
+        from . import helpers
+        helpers.set_output_log(log_file)
+        helpers.set_command_timeout(timeout)
+    if show_timings or trace_file:
+        from . import timings
+        timings.enable()
+        command_phase = timings.phase(f"{APP_NAME} {ctx.invoked_subcommand}")
+        command_phase.__enter__()
+
+        def report():
+            command_phase.__exit__(None, None, None)
+            if show_timings:
+                typer.echo(timings.format_summary(), err=True)
+            if trace_file:
+                timings.write_trace(trace_file)
+                typer.echo(f"Trace written to {trace_file}", err=True)
+
+        ctx.call_on_close(report)
 
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    app()
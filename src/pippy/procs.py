@@ -0,0 +1,216 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from typer import colors, style
+
+from . import timings
+from .config import log
+
+# --- Async Process Engine ---
+# Runs several external commands at once on an asyncio loop. Each child
+# gets its own process group (session on POSIX), so a timeout, a failing
+# sibling (fail-fast) or Ctrl-C terminates the child *and* everything it
+# spawned: SIGTERM to the group, then SIGKILL after a grace period. Output
+# of concurrent children is multiplexed line by line with a '[name]' prefix;
+# only the last tail_bytes of each stream are kept for error reports.
+
+GRACE_SECONDS = 5.0
+TAIL_BYTES = 64 * 1024
+TIMEOUT_EXIT_CODE = 124 # As coreutils 'timeout'
+_PREFIX_COLORS = [colors.CYAN, colors.MAGENTA, colors.YELLOW, colors.GREEN, colors.BLUE]
+
+
+def prefix_color(index: int) -> str:
+    """Color for the output prefix of the index-th concurrent command."""
+    return _PREFIX_COLORS[index % len(_PREFIX_COLORS)]
+
+
+def group_options() -> Dict[str, Any]:
+    """Popen keyword arguments that start the child in a new process group."""
+    if os.name == "posix":
+        return {"start_new_session": True}
+    return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+def signal_group(process, force: bool = False):
+    """Asks a child's process group to stop (SIGTERM), or kills it (force)."""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        elif force:
+            process.kill()
+        else:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+    except (ProcessLookupError, PermissionError, OSError) as e:
+        log.debug(f"Could not signal process group {process.pid}: {e}")
+
+
+def terminate_group(process: subprocess.Popen, grace: float = GRACE_SECONDS) -> Optional[int]:
+    """Stops a (blocking) child started with group_options() and its descendants. Returns its exit code."""
+    signal_group(process)
+    try:
+        return process.wait(grace)
+    except subprocess.TimeoutExpired:
+        signal_group(process, force=True)
+        return process.wait()
+
+
+async def _terminate_async(process: asyncio.subprocess.Process, grace: float = GRACE_SECONDS) -> Optional[int]:
+    signal_group(process)
+    try:
+        return await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        signal_group(process, force=True)
+        return await process.wait()
+
+
+async def _pump(stream: asyncio.StreamReader, prefix: bytes, out, tail: deque, tail_bytes: int, log_handle) -> int:
+    """Copies a child's stream to out line by line with prefix, keeping a bounded tail. Returns bytes read."""
+    total = size = 0
+    pending = b""
+    while True:
+        chunk = await stream.read(1 << 16)
+        if not chunk:
+            break
+        total += len(chunk)
+        tail.append(chunk)
+        size += len(chunk)
+        while size - len(tail[0]) >= tail_bytes:
+            size -= len(tail.popleft())
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if lines:
+            text = b"".join(prefix + line + b"\n" for line in lines)
+            if out is not None:
+                out.write(text)
+                out.flush()
+            if log_handle:
+                log_handle.write(text)
+    if pending:
+        text = prefix + pending + b"\n"
+        if out is not None:
+            out.write(text)
+            out.flush()
+        if log_handle:
+            log_handle.write(text)
+    return total
+
+
+async def run_async(
+    name: str,
+    cmd: List[str],
+    cwd: Optional[Path] = None,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    prefix: bool = True,
+    echo: bool = True,
+    tail_bytes: int = TAIL_BYTES,
+    log_handle=None,
+    color: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Runs one command in its own process group, streaming its output. On
+    timeout or cancellation the whole group is terminated. Returns a result
+    with 'name', 'returncode', 'timed_out', 'wall' and the 'stdout'/'stderr'
+    tails; a command that cannot start has returncode 127 and an 'error'.
+    """
+    result: Dict[str, Any] = {"name": name, "cmd": cmd, "returncode": None, "timed_out": False, "cancelled": False}
+    label = f"[{name}] "
+    if prefix and color and sys.stdout.isatty():
+        label = style(f"[{name}]", fg=color) + " "
+    prefix_bytes = label.encode() if prefix else b""
+    effective_env = os.environ.copy()
+    if env:
+        effective_env.update(env)
+    start = time.perf_counter()
+    with timings.command(cmd) as timing:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, cwd=cwd, env=effective_env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **group_options())
+        except OSError as e:
+            result.update(returncode=127, error=str(e), stdout="", stderr=str(e), wall=0.0)
+            timing["exit_code"] = 127
+            return result
+        tails = (deque(), deque())
+        outputs = (getattr(sys.stdout, "buffer", None), getattr(sys.stderr, "buffer", None)) if echo else (None, None)
+        readers = [
+            asyncio.ensure_future(_pump(stream, prefix_bytes, out, tail, tail_bytes, log_handle))
+            for stream, out, tail in zip((process.stdout, process.stderr), outputs, tails)
+        ]
+        try:
+            result["returncode"] = await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            log.error(f"{name}: timed out after {timeout:g}s; terminating its process group.")
+            result["timed_out"] = True
+            await _terminate_async(process)
+            result["returncode"] = TIMEOUT_EXIT_CODE
+        except BaseException: # Cancelled (a sibling failed) or interrupted
+            result["cancelled"] = True
+            await asyncio.shield(_terminate_async(process))
+            for reader in readers:
+                reader.cancel()
+            raise
+        finally:
+            timing["exit_code"] = result["returncode"]
+        totals = await asyncio.gather(*readers)
+        timing["output_bytes"] = sum(totals)
+    result["wall"] = time.perf_counter() - start
+    result["stdout"], result["stderr"] = (b"".join(tail)[-tail_bytes:].decode(errors="replace").strip() for tail in tails)
+    return result
+
+
+def run_commands(
+    commands: List[Dict[str, Any]],
+    fail_fast: bool = True,
+    max_parallel: Optional[int] = None,
+    log_file: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Runs commands (dicts of run_async arguments: 'name', 'cmd', and optionally
+    'cwd', 'env', 'timeout') concurrently, at most max_parallel at a time.
+    With fail_fast, the first failure cancels the rest, whose results are
+    marked 'cancelled'. Output is appended to log_file as well. Returns one
+    result per command, in order.
+    """
+    async def main() -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(max_parallel or len(commands) or 1)
+        log_handle = open(log_file, "ab") if log_file else None
+
+        async def run_one(index: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await run_async(log_handle=log_handle, color=prefix_color(index), **spec)
+
+        try:
+            tasks = [asyncio.ensure_future(run_one(i, spec)) for i, spec in enumerate(commands)]
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if fail_fast and pending and any(task.result()["returncode"] != 0 for task in done):
+                    log.info(f"Cancelling {len(pending)} remaining command(s) after a failure.")
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    break
+        finally:
+            if log_handle:
+                log_handle.close()
+        results = []
+        for spec, task in zip(commands, tasks):
+            if task.cancelled():
+                results.append({"name": spec["name"], "cmd": spec["cmd"], "returncode": None, "timed_out": False,
+                                "cancelled": True, "stdout": "", "stderr": "", "wall": 0.0})
+            else:
+                results.append(task.result())
+        return results
+
+    return asyncio.run(main())
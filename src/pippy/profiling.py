@@ -0,0 +1,346 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from typer import Exit
+
+from .config import log, STATE_DIR_NAME
+
+# --- Script Profiling ---
+# 'pippy run --profile' runs the script inside a small bootstrap (below)
+# with the venv's interpreter, so the profiled program sees the same
+# interpreter, sys.path and argv as a plain run. Two profilers:
+#
+#   cprofile  deterministic (cProfile); exact call counts, noticeable overhead
+#   sample    SIGPROF stack sampler: every INTERVAL of CPU time the main
+#             thread's stack is recorded; overhead is a few percent at the
+#             default 100 Hz, so it can stay on for long runs (POSIX only)
+#
+# Both write <name>.pstats (load with pstats/snakeviz), <name>.collapsed
+# ('frame;frame;frame count' lines for flamegraph.pl, speedscope, inferno)
+# and print the top functions by self time when the script ends.
+#
+# 'pippy run --memory' uses the same approach with tracemalloc (see
+# _MEMORY_BOOTSTRAP) to show where the script's memory went.
+
+PROFILERS = ("cprofile", "sample")
+PROFILES_DIR_NAME = "profiles" # Under .pippy/
+DEFAULT_INTERVAL = 0.01 # Seconds of CPU time between samples
+DEFAULT_TOP = 20
+DEFAULT_MEMORY_INTERVAL = 10.0 # Seconds between heap snapshots
+_BOOTSTRAP_FILENAME = "<pippy>"
+
+# Shared head of the bootstraps. argv: mode, output prefix, top N, JSON
+# options, script, script args... run() runs the script as __main__ and
+# keeps its exit code, with which the bootstrap exits after reporting.
+_RUNNER = """\
+import collections, json, os, runpy, sys, traceback
+mode, prefix, top, options = sys.argv[1], sys.argv[2], int(sys.argv[3]), json.loads(sys.argv[4])
+script = os.path.abspath(sys.argv[5])
+sys.argv = [sys.argv[5]] + sys.argv[6:]
+sys.path[0] = os.path.dirname(script)
+exit_code = 0
+
+def run():
+    global exit_code
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except KeyboardInterrupt:
+        exit_code = 130
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+
+def is_root(func):
+    return func[0] == script and func[2] == "<module>"
+
+def where(filename, line):
+    rel = os.path.relpath(filename)
+    if rel.startswith(".."):
+        rel = "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+    return "%s:%d" % (rel, line)
+
+def label(func):
+    filename, line, name = func
+    if filename.startswith("~") or filename.startswith("<"):
+        return name
+    return "%s (%s)" % (name, where(filename, line))
+"""
+
+_PROFILE_BOOTSTRAP = _RUNNER + """\
+import pstats
+interval = options["interval"]
+if mode == "sample":
+    import signal
+    samples = collections.Counter()
+    def on_sample(signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        for i, func in enumerate(stack):
+            if is_root(func):
+                samples[tuple(stack[i:])] += 1
+                return
+        # Still in the bootstrap (runpy compiling the script): not the program's time
+    signal.signal(signal.SIGPROF, on_sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        run()
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    # Sample counts as pstats entries: self time = samples at the top of the
+    # stack, cumulative = samples anywhere in it, "calls" = samples.
+    table = {}
+    for stack, count in samples.items():
+        seconds = count * interval
+        seen = set()
+        for i, func in enumerate(stack):
+            entry = table.setdefault(func, [0, 0, 0.0, 0.0, {}])
+            if func not in seen:
+                seen.add(func)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            if i:
+                edge = entry[4].setdefault(stack[i - 1], [0, 0, 0.0, 0.0])
+                edge[0] += count
+                edge[1] += count
+                edge[3] += seconds
+                if i == len(stack) - 1:
+                    edge[2] += seconds
+        table[stack[-1]][2] += seconds
+    if not table:
+        # SIGPROF counts CPU time: short or mostly waiting scripts may get no sample
+        sys.stderr.write("\\nNo samples collected (the script used less than %gs of CPU time); "
+                         "try --profile-interval with a smaller value or --profile=cprofile.\\n" % interval)
+        sys.stderr.flush()
+        sys.exit(exit_code)
+    class Sampled:
+        def create_stats(self):
+            self.stats = {f: (e[0], e[1], e[2], e[3], {c: tuple(v) for c, v in e[4].items()}) for f, e in table.items()}
+    stats = pstats.Stats(Sampled())
+    stats.dump_stats(prefix + ".pstats")
+    collapsed = [(";".join(label(f) for f in stack), count) for stack, count in samples.items()]
+    unit = "samples"
+else:
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run()
+    finally:
+        profiler.disable()
+    profiler.dump_stats(prefix + ".pstats")
+    stats = pstats.Stats(profiler)
+    # cProfile keeps caller->callee edges, not stacks: walk the call graph
+    # from the script, splitting each function's time over its callers.
+    callees = collections.defaultdict(list)
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    roots = [f for f in stats.stats if is_root(f)] or [f for f, s in stats.stats.items() if not s[4]]
+    totals = collections.Counter()
+    def walk(func, path, inclusive, depth):
+        tt, ct = stats.stats[func][2], stats.stats[func][3]
+        if ct <= 0 or inclusive < 1e-6:
+            return
+        frames = path + (func,)
+        totals[frames] += inclusive * min(tt / ct, 1.0)
+        if depth >= 128:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if callee not in frames:
+                walk(callee, frames, inclusive * edge_ct / ct, depth + 1)
+    for root in roots:
+        walk(root, (), stats.stats[root][3], 0)
+    collapsed = [(";".join(label(f) for f in frames), int(seconds * 1e6)) for frames, seconds in totals.items()]
+    unit = "microseconds"
+
+with open(prefix + ".collapsed", "w") as f:
+    for frames, value in sorted(collapsed):
+        if value > 0:
+            f.write("%s %d\\n" % (frames, value))
+
+def is_bootstrap(func):
+    return func == (run.__code__.co_filename, run.__code__.co_firstlineno, run.__name__) or "runpy" in func[0]
+
+rows = [item for item in stats.stats.items() if not is_bootstrap(item[0])]
+rows = sorted(rows, key=lambda item: item[1][2], reverse=True)[:top]
+out = sys.stderr
+out.write("\\n%10s %10s %10s  %s\\n" % ("SELF", "TOTAL", "SAMPLES" if mode == "sample" else "CALLS", "FUNCTION"))
+for func, (cc, nc, tt, ct, callers) in rows:
+    out.write("%9.3fs %9.3fs %10d  %s\\n" % (tt, ct, nc, label(func)))
+out.write("\\nProfile: %s.pstats\\nCollapsed stacks (%s): %s.collapsed\\n" % (prefix, unit, prefix))
+out.flush()
+sys.exit(exit_code)
+"""
+
+
+# 'pippy run --memory': the script runs with tracemalloc tracing; a thread
+# snapshots the heap every options["interval"] seconds and once more when
+# the script ends. Reports traced memory over time (with the site that grew
+# most per interval), the peak, and the top allocation sites by size and by
+# block count in the largest snapshot. With options["dump"], snapshots are
+# written to <prefix>.<n>.tracemalloc for offline comparison; a baseline
+# snapshot from an earlier run (options["baseline"]) is diffed at exit.
+_MEMORY_BOOTSTRAP = _RUNNER + """\
+import pkgutil, threading, time, tracemalloc
+# Allocations by the tracer and the bootstrap itself are not the script's
+excluded = {"<pippy>", tracemalloc.__file__, threading.__file__, runpy.__file__, pkgutil.__file__, "<frozen runpy>",
+            "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>"}
+lock = threading.Lock()
+stop = threading.Event()
+timeline, dumps = [], []
+state = {"sites": None, "largest": {}, "largest_size": -1, "largest_at": 0.0}
+
+def fmt(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return "%.0f %s" % (size, unit) if unit == "B" else "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f TB" % size
+
+def site(traceback):
+    frame = traceback[0]
+    return where(frame.filename, frame.lineno)
+
+def by_site(stats):
+    return {stat.traceback: stat for stat in stats if stat.traceback[0].filename not in excluded}
+
+def take():
+    # One grouping pass per snapshot; growth is diffed on the (small) per-site totals
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    sites = by_site(snapshot.statistics("lineno"))
+    current = sum(stat.size for stat in sites.values())
+    elapsed = time.perf_counter() - start
+    with lock:
+        if options["dump"]:
+            path = "%s.%d.tracemalloc" % (prefix, len(timeline) + 1)
+            snapshot.dump(path)
+            dumps.append(path)
+        grew = None
+        previous = state["sites"]
+        if previous is not None:
+            growth = max(((stat.size - (previous[key].size if key in previous else 0), key) for key, stat in sites.items()),
+                         key=lambda item: item[0], default=(0, None))
+            if growth[0] > 0:
+                grew = (site(growth[1]), growth[0])
+        timeline.append((elapsed, current, peak, grew))
+        state["sites"] = sites
+        if current >= state["largest_size"]:
+            state["largest"], state["largest_size"], state["largest_at"] = sites, current, elapsed
+    return snapshot
+
+def ticker():
+    while not stop.wait(options["interval"]):
+        take()
+
+tracemalloc.start(options["frames"])
+start = time.perf_counter()
+thread = threading.Thread(target=ticker, name="pippy-tracemalloc", daemon=True)
+thread.start()
+try:
+    run()
+finally:
+    stop.set()
+    thread.join()
+final = take()
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+out = sys.stderr
+out.write("\\nMemory: peak %s traced, %s still allocated at exit\\n" % (fmt(peak), fmt(timeline[-1][1])))
+if len(timeline) > 1 and top:
+    step = -(-len(timeline) // top)
+    rows = timeline[::step]
+    if rows[-1] is not timeline[-1]:
+        rows.append(timeline[-1])
+    out.write("\\n%9s %11s %11s  %s\\n" % ("TIME", "TRACED", "PEAK", "GREW MOST"))
+    for elapsed, current, high, grew in rows:
+        out.write("%8.1fs %11s %11s  %s\\n" % (elapsed, fmt(current), fmt(high), "+%s %s" % (fmt(grew[1]), grew[0]) if grew else "-"))
+
+when = "at exit" if state["largest"] is state["sites"] else "at %.1fs (largest snapshot)" % state["largest_at"]
+for title, key in (("size", lambda stat: stat.size), ("count", lambda stat: stat.count)):
+    if not top:
+        break
+    out.write("\\nTop allocation sites by %s %s:\\n%11s %10s  %s\\n" % (title, when, "SIZE", "BLOCKS", "SITE"))
+    for stat in sorted(state["largest"].values(), key=key, reverse=True)[:top]:
+        out.write("%11s %10d  %s\\n" % (fmt(stat.size), stat.count, site(stat.traceback)))
+
+if options["baseline"]:
+    try:
+        baseline = tracemalloc.Snapshot.load(options["baseline"])
+    except Exception as e:
+        out.write("\\nCould not load baseline %s: %s\\n" % (options["baseline"], e))
+    else:
+        diffs = [d for d in final.compare_to(baseline, "lineno") if d.traceback[0].filename not in excluded]
+        total = sum(d.size_diff for d in diffs)
+        out.write("\\nAt exit vs baseline %s (%s%s):\\n%11s %11s  %s\\n" % (
+            options["baseline"], "+" if total >= 0 else "-", fmt(abs(total)), "DIFF", "SIZE", "SITE"))
+        for d in diffs[:top]:
+            out.write("%11s %11s  %s\\n" % (("+" if d.size_diff >= 0 else "-") + fmt(abs(d.size_diff)), fmt(d.size), site(d.traceback)))
+if dumps:
+    out.write("\\nSnapshots: %s ... %s\\n" % (dumps[0], dumps[-1]) if len(dumps) > 1 else "\\nSnapshot: %s\\n" % dumps[0])
+out.flush()
+sys.exit(exit_code)
+"""
+
+def output_prefix(project_dir: Path, script: Path) -> Path:
+    """Where a profile of script goes: .pippy/profiles/<script>-<timestamp> (without extension)."""
+    profiles_dir = project_dir / STATE_DIR_NAME / PROFILES_DIR_NAME
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    gitignore = profiles_dir.parent / ".gitignore"
+    if not gitignore.exists():
+        gitignore.write_text("# Created by pippy\n*\n")
+    return profiles_dir / f"{script.stem}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+
+def profile_args(
+    mode: str,
+    script: Path,
+    script_args: List[str],
+    prefix: Path,
+    top: int = DEFAULT_TOP,
+    interval: float = DEFAULT_INTERVAL,
+) -> List[str]:
+    """Interpreter arguments that run script under the chosen profiler. Raises Exit for unusable modes."""
+    if mode not in PROFILERS:
+        log.error(f"Unknown profiler '{mode}'; use --profile (cprofile) or --profile=sample.")
+        raise Exit(1)
+    if mode == "sample" and os.name != "posix":
+        log.error("The sampling profiler needs POSIX signals (setitimer); use --profile=cprofile on Windows.")
+        raise Exit(1)
+    return _bootstrap_args(_PROFILE_BOOTSTRAP, mode, prefix, top, {"interval": interval}, script, script_args)
+
+
+def memory_args(
+    script: Path,
+    script_args: List[str],
+    prefix: Path,
+    top: int = DEFAULT_TOP,
+    interval: float = DEFAULT_MEMORY_INTERVAL,
+    frames: int = 1,
+    dump: bool = False,
+    baseline: Optional[Path] = None,
+) -> List[str]:
+    """Interpreter arguments that run script under tracemalloc (keeping frames frames per allocation)."""
+    options = {"interval": interval, "frames": frames, "dump": dump, "baseline": str(baseline) if baseline else None}
+    return _bootstrap_args(_MEMORY_BOOTSTRAP, "memory", prefix, top, options, script, script_args)
+
+
+def _bootstrap_args(code: str, mode: str, prefix: Path, top: int, options: Dict[str, Any], script: Path, script_args: List[str]) -> List[str]:
+    # The stub compiles the bootstrap as '<pippy>', so its frames are told apart from the script's
+    stub = f"import sys; exec(compile(sys.argv.pop(1), {_BOOTSTRAP_FILENAME!r}, 'exec'))"
+    return ["-c", stub, code, mode, str(prefix), str(top), json.dumps(options), str(script)] + script_args
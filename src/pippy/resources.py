@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from . import helpers
+
+# --- Resource Accounting ---
+# 'pippy run --resources' keeps pippy as the script's parent and samples
+# /proc for every descendant of pippy (the script and anything it spawns)
+# on a background thread: resident memory, CPU time and I/O of the live
+# process tree. Totals come from the kernel once the script has exited and
+# been reaped, from getrusage(RUSAGE_CHILDREN): CPU time, context switches,
+# the largest process's peak RSS and storage I/O. The I/O is children-only,
+# unlike a /proc/self/io delta, which would include pippy's own reads and
+# writes; Linux counts it in 512-byte blocks (macOS counts block operations,
+# so there it is approximate). Without /proc (macOS) only these totals are
+# reported.
+
+SAMPLE_INTERVAL = 0.5 # Seconds
+SERIES_FIELDS = ["t", "processes", "rss_bytes", "cpu_user", "cpu_system", "read_bytes", "write_bytes"]
+
+_PROC = Path("/proc")
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = resource.getpagesize() if resource else 4096
+
+
+def is_supported() -> bool:
+    """Whether resource accounting works here (POSIX getrusage)."""
+    return resource is not None
+
+
+def _has_proc() -> bool:
+    return (_PROC / "self" / "stat").exists()
+
+
+def _read_stat(pid: int) -> Optional[Tuple[int, float, float, int]]:
+    """(ppid, user seconds, system seconds, rss bytes) of pid; CPU includes its reaped children."""
+    try:
+        with open(_PROC / str(pid) / "stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    fields = data[data.rfind(b")") + 2:].split() # comm may contain spaces and ')'
+    try:
+        user = (int(fields[11]) + int(fields[13])) / _CLOCK_TICKS # utime + cutime
+        system = (int(fields[12]) + int(fields[14])) / _CLOCK_TICKS # stime + cstime
+        return int(fields[1]), user, system, int(fields[21]) * _PAGE_SIZE
+    except (IndexError, ValueError):
+        return None
+
+
+def _read_io(pid: Any) -> Tuple[int, int]:
+    """Storage read/write bytes of pid; zeros if unreadable."""
+    counters = {}
+    try:
+        with open(_PROC / str(pid) / "io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return counters.get("read_bytes", 0), counters.get("write_bytes", 0)
+
+
+def descendants(root: int) -> Dict[int, Tuple[int, float, float, int]]:
+    """_read_stat() of every live descendant of root, from one pass over /proc."""
+    stats: Dict[int, Tuple[int, float, float, int]] = {}
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir(_PROC)
+    except OSError:
+        return {}
+    for entry in entries:
+        if entry.isdigit():
+            stat = _read_stat(int(entry))
+            if stat:
+                stats[int(entry)] = stat
+                children.setdefault(stat[0], []).append(int(entry))
+    found = {}
+    pending = [root]
+    while pending:
+        for child in children.get(pending.pop(), ()):
+            found[child] = stats[child]
+            pending.append(child)
+    return found
+
+
+def sample(root: int, elapsed: float) -> Dict[str, Any]:
+    """One time-series point for root's process tree (SERIES_FIELDS)."""
+    point = dict.fromkeys(SERIES_FIELDS, 0)
+    point["t"] = round(elapsed, 3)
+    # A reaped process's CPU and I/O move into its parent's counters, so
+    # summing over the live tree stays cumulative without double counting.
+    for pid, (_, user, system, rss) in descendants(root).items():
+        read_bytes, write_bytes = _read_io(pid)
+        point["processes"] += 1
+        point["cpu_user"] += user
+        point["cpu_system"] += system
+        point["rss_bytes"] += rss
+        point["read_bytes"] += read_bytes
+        point["write_bytes"] += write_bytes
+    point["cpu_user"] = round(point["cpu_user"], 3)
+    point["cpu_system"] = round(point["cpu_system"], 3)
+    return point
+
+
+@contextmanager
+def monitor(interval: float = SAMPLE_INTERVAL):
+    """
+    Accounts for the child processes pippy runs inside the block. Yields a
+    dict that is filled in on exit with 'wall', 'cpu_user', 'cpu_system',
+    'max_rss' (largest single process), 'peak_tree_rss' (sampled sum over
+    the tree, None without /proc), 'voluntary_switches',
+    'involuntary_switches', 'read_bytes', 'write_bytes' and 'samples'.
+    """
+    usage: Dict[str, Any] = {"samples": []}
+    root = os.getpid()
+    sampling = _has_proc()
+    stop = threading.Event()
+
+    def sampler():
+        while not stop.wait(interval):
+            usage["samples"].append(sample(root, time.perf_counter() - start))
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    thread = threading.Thread(target=sampler, name="pippy-resources", daemon=True)
+    if sampling:
+        thread.start()
+    try:
+        yield usage
+    finally:
+        usage["wall"] = time.perf_counter() - start
+        stop.set()
+        if sampling:
+            thread.join()
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        usage["cpu_user"] = after.ru_utime - before.ru_utime
+        usage["cpu_system"] = after.ru_stime - before.ru_stime
+        usage["voluntary_switches"] = after.ru_nvcsw - before.ru_nvcsw
+        usage["involuntary_switches"] = after.ru_nivcsw - before.ru_nivcsw
+        # ru_maxrss is a high-water mark over all reaped children (KB on Linux, bytes on macOS)
+        usage["max_rss"] = after.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        usage["peak_tree_rss"] = max((s["rss_bytes"] for s in usage["samples"]), default=0) if sampling else None
+        usage["read_bytes"] = (after.ru_inblock - before.ru_inblock) * 512
+        usage["write_bytes"] = (after.ru_oublock - before.ru_oublock) * 512
+
+
+def format_summary(usage: Dict[str, Any]) -> str:
+    """Renders a monitor() result as a few plain-text lines."""
+    peak = f"{helpers.format_bytes(usage['max_rss'])} largest process"
+    if usage["peak_tree_rss"]:
+        peak += f", {helpers.format_bytes(usage['peak_tree_rss'])} process tree (sampled)"
+    lines = [
+        "Resources:",
+        f"  wall time         {usage['wall']:.3f}s",
+        f"  CPU time          {usage['cpu_user']:.3f}s user, {usage['cpu_system']:.3f}s system",
+        f"  peak RSS          {peak}",
+        f"  context switches  {usage['voluntary_switches']} voluntary, {usage['involuntary_switches']} involuntary",
+        f"  storage I/O       {helpers.format_bytes(usage['read_bytes'])} read, {helpers.format_bytes(usage['write_bytes'])} written",
+    ]
+    return "\n".join(lines)
+
+
+def write_series(usage: Dict[str, Any], path: Path):
+    """Writes the samples to path: JSON (with the summary) for .json, CSV otherwise."""
+    if path.suffix.lower() == ".json":
+        summary = {key: value for key, value in usage.items() if key != "samples"}
+        with open(path, "w") as f:
+            json.dump({"summary": summary, "samples": usage["samples"]}, f, indent=2)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SERIES_FIELDS)
+        writer.writeheader()
+        writer.writerows(usage["samples"])
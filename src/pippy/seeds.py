@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from typer import Exit
+
+from . import dists, helpers, venvs, wheelhouse
+from .config import log, USER_CACHE_DIR, VENV_DIR_NAME
+
+# --- Seed Venvs ---
+# 'python -m venv' runs ensurepip, which reinstalls pip from its bundled
+# wheel for every project. Instead, one seed venv per interpreter (and set of
+# seed packages) is created once under the user cache, and project venvs are
+# cloned from it: files are reflinked or hardlinked where the filesystem
+# allows, and the few files that embed the venv's path (pyvenv.cfg, activate
+# scripts, script shebangs) are rewritten for the new location.
+
+SEEDS_DIR = USER_CACHE_DIR / "seeds"
+SEED_INFO_NAME = "seed.json" # Written last, so its presence marks a complete seed
+SEED_FORMAT = 1
+
+
+def _seed_key(seed_packages: List[str]) -> str:
+    """Identifies a seed by the interpreter (path, build and mtime) and the seed packages."""
+    executable = os.path.realpath(sys.executable)
+    try:
+        mtime_ns = os.stat(executable).st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    identity = json.dumps([SEED_FORMAT, executable, mtime_ns, sys.version, sorted(seed_packages)])
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+def _read_seed_info(seed_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(seed_dir / SEED_INFO_NAME, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_seed(seed_packages: List[str], offline: bool = False) -> Optional[Path]:
+    """
+    Returns the directory of the seed venv for the running interpreter and
+    seed_packages, creating it first if needed (seed packages come through
+    the wheelhouse). Returns None if it cannot be created.
+    """
+    seed_dir = SEEDS_DIR / _seed_key(seed_packages)
+    info = _read_seed_info(seed_dir)
+    if info and venvs.python_path(seed_dir / VENV_DIR_NAME).exists():
+        return seed_dir
+
+    # Built in a private directory and renamed into place, so concurrent
+    # 'pippy init' runs never see (or clone) a half-built seed.
+    build_dir = SEEDS_DIR / f".build-{seed_dir.name}-{os.getpid()}"
+    build_venv = build_dir / VENV_DIR_NAME
+    log.info(f"Creating seed virtual environment for {sys.executable} (first use only)...")
+    try:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        build_dir.mkdir(parents=True)
+        helpers.run_cmd([sys.executable, "-m", "venv", str(build_venv)], cwd=build_dir, check=True)
+        if seed_packages:
+            entries = [dists.parse_requirement(p) for p in seed_packages]
+            wheelhouse.install(build_venv, build_dir, seed_packages, [e for e in entries if e], offline=offline)
+        with open(build_dir / SEED_INFO_NAME, "w") as f:
+            json.dump({"prefix": str(build_venv), "python": sys.executable, "packages": seed_packages}, f, indent=2)
+        if seed_dir.exists():
+            shutil.rmtree(seed_dir, ignore_errors=True) # Incomplete or broken seed
+        os.replace(build_dir, seed_dir)
+    except (Exit, OSError) as e:
+        log.warning(f"Could not create seed virtual environment: {e}")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        # Another process may have won the race to create the same seed
+        return seed_dir if _read_seed_info(seed_dir) else None
+    return seed_dir
+
+
+def _relocate(venv_path: Path, old_prefix: str):
+    """Rewrites the files that embed the venv's location from old_prefix to venv_path."""
+    old, new = os.fsencode(old_prefix), os.fsencode(str(venv_path))
+    candidates = [venv_path / "pyvenv.cfg"]
+    with os.scandir(venvs.scripts_dir(venv_path)) as entries:
+        candidates.extend(Path(e.path) for e in entries if e.is_file(follow_symlinks=False))
+    changed = {str(path) for path in candidates if helpers.rewrite_file(path, old, new)}
+    # Keep the RECORD hashes of rewritten scripts (pip's bin/pip, ...) valid
+    site_packages = venvs.site_packages_dir(venv_path)
+    if changed and site_packages:
+        for dist in dists.installed_distributions(site_packages).values():
+            if dist["path"].suffix == ".dist-info":
+                dists.refresh_record(dist["path"], changed)
+
+
+def clone_seed(target: Path, seed_packages: Optional[List[str]] = None, offline: bool = False) -> bool:
+    """
+    Creates a venv at target by cloning the seed venv. Returns False, leaving
+    target as it was, when cloning is not possible, so the caller can fall
+    back to 'python -m venv'.
+    """
+    if sys.platform == "win32":
+        return False # Script launchers (.exe) embed the venv path in binary form
+    if target.exists() and any(target.iterdir()):
+        log.debug(f"{target} exists and is not empty; not cloning a seed venv into it.")
+        return False
+    seed_dir = ensure_seed(sorted(set(seed_packages or [])), offline)
+    if seed_dir is None:
+        return False
+    info = _read_seed_info(seed_dir)
+    created = not target.exists()
+    try:
+        method = helpers.clone_tree(seed_dir / VENV_DIR_NAME, target)
+        _relocate(target, info["prefix"])
+    except (OSError, KeyError, TypeError) as e:
+        log.warning(f"Could not clone seed virtual environment: {e}")
+        if created:
+            shutil.rmtree(target, ignore_errors=True)
+        else:
+            for child in target.iterdir():
+                if child.is_dir() and not child.is_symlink():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink()
+        return False
+    log.debug(f"Cloned seed venv {seed_dir.name} into {target} ({method}).")
+    return True
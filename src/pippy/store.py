@@ -0,0 +1,324 @@
+import csv
+import hashlib
+import json
+import os
+import stat
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import dists, helpers, venvs
+from .config import log, USER_CACHE_DIR
+
+# --- Package Store ---
+# Opt-in global store shared by every project venv ('"store": true' in
+# pippy.json, or --store). After pip installs into a venv, each file a
+# distribution's RECORD lists under site-packages is moved into a
+# content-addressed store (keyed by its sha256) and hardlinked back, so N
+# projects using the same numpy keep one copy on disk. A manifest per
+# distribution build (name, version, interpreter tag) records which store
+# files make it up; later installs of the same pin into any venv link those
+# files instead of downloading and unpacking again, then regenerate the
+# console scripts and a RECORD valid for that venv.
+#
+# Store files are made read-only because every venv sharing them sees an
+# in-place edit. pip upgrades/uninstalls unlink files, which is safe.
+# Entries are unreferenced once no venv links them (link count 1), which is
+# what 'pippy clean --store' collects.
+
+STORE_DIR = USER_CACHE_DIR / "store"
+FILES_DIR = STORE_DIR / "files" # files/<sha256[:2]>/<sha256>
+DISTS_DIR = STORE_DIR / "dists" # <name>-<version>-<tag>.json manifests
+MANIFEST_VERSION = 1
+TMP_GRACE_SECONDS = 3600 # Younger *.tmp files may belong to a share in progress
+
+def is_supported() -> bool:
+    """Hardlink sharing and generated POSIX scripts; Windows venvs use .exe launchers."""
+    return os.name == "posix"
+
+
+def _store_path(digest: str) -> Path:
+    return FILES_DIR / digest[:2] / digest
+
+
+def _manifest_path(name: str, version: str, tag: List[str]) -> Path:
+    safe_tag = "-".join(part.replace("/", "_") for part in tag)
+    return DISTS_DIR / f"{dists.canonical_name(name)}-{version}-{safe_tag}.json"
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _record_hash(digest: str) -> str:
+    """Formats a hex sha256 the way RECORD files store it."""
+    return dists.format_record_hash(bytes.fromhex(digest))
+
+
+def _read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _replace_with_link(src: Path, dst: Path):
+    """Atomically makes dst a hardlink to src (a copy if linking is impossible)."""
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    helpers.clone_file(str(src), str(tmp_path), method="hardlink")
+    os.replace(tmp_path, dst)
+
+
+def _share_file(path: Path, st: os.stat_result, digest: str):
+    """Puts path's content in the store and links path to it."""
+    store_path = _store_path(digest)
+    try:
+        store_st = os.stat(store_path)
+    except FileNotFoundError:
+        store_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = store_path.with_name(f".{digest}.{os.getpid()}.tmp")
+        os.link(path, tmp_path) # EXDEV when the store is on another filesystem
+        os.chmod(tmp_path, stat.S_IMODE(st.st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+        os.replace(tmp_path, store_path)
+        return
+    if (store_st.st_dev, store_st.st_ino) != (st.st_dev, st.st_ino):
+        _replace_with_link(store_path, path)
+
+
+def _read_record(dist_path: Path) -> List[List[str]]:
+    with open(dist_path / "RECORD", "r", encoding="utf-8", newline="") as f:
+        return [row for row in csv.reader(f) if row]
+
+
+def add_distribution(site_packages: Path, scripts_dir: Path, dist: Dict[str, Any], tag: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Moves an installed distribution's site-packages files into the store
+    (linking them back) and writes its manifest. Files whose inode already
+    matches the store are not re-hashed. Returns the manifest, or None for
+    distributions without a RECORD.
+    """
+    dist_path = dist["path"]
+    if dist_path.suffix != ".dist-info" or not (dist_path / "RECORD").is_file():
+        return None
+    manifest_path = _manifest_path(dist["name"], dist["version"], tag)
+    previous = (_read_manifest(manifest_path) or {}).get("files", {})
+    entry_points = dists.read_entry_points(dist_path)
+    entry_scripts = set(entry_points.get("console_scripts", {})) | set(entry_points.get("gui_scripts", {}))
+    scripts_rel = os.path.relpath(scripts_dir, site_packages)
+    direct_url = dists.read_direct_url(dist_path) or {}
+
+    files: Dict[str, str] = {}
+    scripts: List[str] = []
+    # Editable installs point into a project tree, and data/header files
+    # outside site-packages are not tracked, so neither can be linked later.
+    linkable = not direct_url.get("dir_info", {}).get("editable")
+    record_rel = os.path.join(dist_path.name, "RECORD")
+    for row in _read_record(dist_path):
+        rel = os.path.normpath(row[0])
+        if rel == record_rel:
+            continue
+        if rel.startswith(os.pardir) or os.path.isabs(rel):
+            if os.path.dirname(rel) == scripts_rel and os.path.basename(rel) in entry_scripts:
+                scripts.append(os.path.basename(rel))
+            else:
+                linkable = False
+            continue
+        path = site_packages / rel
+        try:
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            key = rel.replace(os.sep, "/")
+            digest = previous.get(key)
+            if digest:
+                try:
+                    store_st = os.stat(_store_path(digest))
+                    if (store_st.st_dev, store_st.st_ino) != (st.st_dev, st.st_ino):
+                        digest = None
+                except OSError:
+                    digest = None
+            if digest is None:
+                digest = _hash_file(path)
+            _share_file(path, st, digest)
+            files[key] = digest
+        except OSError as e:
+            log.debug(f"Not sharing {path}: {e}")
+            linkable = False
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "name": dist["name"],
+        "dist_version": dist["version"],
+        "tag": tag,
+        "dist_info": dist_path.name,
+        "linkable": linkable,
+        "files": files,
+        "scripts": sorted(scripts),
+    }
+    if files != previous or not manifest_path.exists():
+        _write_json(manifest_path, manifest)
+    return manifest
+
+
+def link_distribution(venv_path: Path, site_packages: Path, manifest: Dict[str, Any]) -> bool:
+    """
+    Installs a distribution into a venv from the store: hardlinks its files,
+    writes its console scripts and a RECORD matching them. Returns False,
+    with nothing left behind, if any store file is missing or linking fails.
+    """
+    if not manifest.get("linkable") or not all(_store_path(d).exists() for d in manifest["files"].values()):
+        return False
+    scripts_dir = venvs.scripts_dir(venv_path)
+    python = str(venvs.python_path(venv_path))
+    created: List[Path] = []
+    rows: List[Tuple[str, str, str]] = []
+    try:
+        for rel, digest in manifest["files"].items():
+            dst = site_packages / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            _replace_with_link(_store_path(digest), dst)
+            created.append(dst)
+            rows.append((rel, _record_hash(digest), str(dst.stat().st_size)))
+        dist_path = site_packages / manifest["dist_info"]
+        entry_points = dists.read_entry_points(dist_path)
+        targets = {**entry_points.get("gui_scripts", {}), **entry_points.get("console_scripts", {})}
+        for name in manifest["scripts"]:
+            script = scripts_dir / name
+            content = venvs.write_console_script(script, python, targets[name])
+            created.append(script)
+            rel = os.path.relpath(script, site_packages).replace(os.sep, "/")
+            rows.append((rel, dists.record_hash(content), str(len(content))))
+        rows.append((f"{manifest['dist_info']}/RECORD", "", ""))
+        record = dist_path / "RECORD"
+        with open(record, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(rows)
+        created.append(record)
+    except (OSError, KeyError) as e:
+        log.debug(f"Could not link {manifest['name']} from the store: {e}")
+        for path in created:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        return False
+    return True
+
+
+# --- Venv-Level Operations ---
+
+def _venv_context(venv_path: Path) -> Optional[Tuple[Path, List[str]]]:
+    """site-packages and interpreter tag for a venv, or None if it cannot use the store."""
+    if not is_supported():
+        log.warning("The package store is not supported on this platform; installing normally.")
+        return None
+    profile = venvs.get_profile(venv_path)
+    site_packages = helpers.get_site_packages(venv_path)
+    if not profile or not site_packages:
+        log.debug(f"Cannot inspect {venv_path}; not using the package store.")
+        return None
+    try:
+        FILES_DIR.mkdir(parents=True, exist_ok=True)
+        same_device = os.stat(FILES_DIR).st_dev == os.stat(site_packages).st_dev
+    except OSError as e:
+        log.warning(f"Package store at {STORE_DIR} is not usable ({e}); installing normally.")
+        return None
+    if not same_device:
+        log.warning(f"Package store at {STORE_DIR} is on a different filesystem than {venv_path}, so files cannot be hardlinked; installing normally. Set PIPPY_CACHE_DIR to a directory on the same filesystem.")
+        return None
+    return site_packages, profile["interpreter"]["tag"]
+
+
+def link_requirements(venv_path: Path, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Links pinned requirements (entries as from dists.parse_lock_file) that
+    are not installed yet and have a compatible build in the store. Returns
+    the entries that were linked; the rest are left for pip.
+    """
+    context = _venv_context(venv_path)
+    if context is None:
+        return []
+    site_packages, tag = context
+    installed = dists.installed_distributions(site_packages)
+    linked = []
+    for entry in entries:
+        if not entry["key"] or not entry["version"] or entry["key"] in installed:
+            continue
+        manifest = _read_manifest(_manifest_path(entry["key"], entry["version"], tag))
+        if manifest and link_distribution(venv_path, site_packages, manifest):
+            log.debug(f"Linked {manifest['name']}=={manifest['dist_version']} from the package store.")
+            linked.append(entry)
+    return linked
+
+
+def add_venv(venv_path: Path) -> int:
+    """Shares every distribution installed in the venv through the store. Returns how many."""
+    context = _venv_context(venv_path)
+    if context is None:
+        return 0
+    site_packages, tag = context
+    scripts_dir = venvs.scripts_dir(venv_path)
+    count = 0
+    for dist in dists.installed_distributions(site_packages).values():
+        if dist["version"] and add_distribution(site_packages, scripts_dir, dist, tag) is not None:
+            count += 1
+    return count
+
+
+def collect_garbage(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Removes store files no venv links any more (link count 1), temporary
+    files left behind by interrupted shares, and manifests that refer to
+    removed files. Returns counts of 'files', 'bytes' and 'manifests'
+    removed (or that would be, with dry_run).
+    """
+    result = {"files": 0, "bytes": 0, "manifests": 0}
+    removed = set()
+    # ctime, not mtime: a hardlink keeps the mtime of the venv file it links
+    stale_before = time.time() - TMP_GRACE_SECONDS
+    for _, _, files in helpers.walk_project(FILES_DIR, exclude=()):
+        for entry in files:
+            try:
+                st = entry.stat(follow_symlinks=False)
+                if entry.name.endswith(".tmp"):
+                    if st.st_ctime > stale_before:
+                        continue
+                elif st.st_nlink > 1:
+                    continue
+                if not dry_run:
+                    os.unlink(entry.path)
+                removed.add(entry.name)
+                result["files"] += 1
+                result["bytes"] += st.st_size
+            except OSError as e:
+                log.debug(f"Could not remove store file {entry.path}: {e}")
+    try:
+        manifests = sorted(DISTS_DIR.glob("*.json"))
+    except OSError:
+        manifests = []
+    for path in manifests:
+        manifest = _read_manifest(path)
+        digests = manifest["files"].values() if manifest else []
+        if manifest and not any(d in removed or not _store_path(d).exists() for d in digests):
+            continue
+        if not dry_run:
+            try:
+                path.unlink()
+            except OSError as e:
+                log.debug(f"Could not remove manifest {path}: {e}")
+                continue
+        result["manifests"] += 1
+    return result
@@ -0,0 +1,414 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from typer import Exit
+
+from . import helpers, procs, vcs, venvs
+from .config import log, EXCLUDE_DIRS, STATE_DIR_NAME
+
+# --- Task Runner ---
+# 'tasks' in pippy.json declares project commands as a graph:
+#
+#   "tasks": {
+#     "codegen": {"cmd": "python gen.py", "inputs": ["gen.py", "schema/*.json"], "outputs": ["src/gen"]},
+#     "test": {"cmd": "pytest -q", "deps": ["codegen"], "inputs": ["src/**/*.py", "tests/**/*.py"]}
+#   }
+#
+# 'pippy task test' runs a task after its dependencies, starting independent
+# tasks in parallel (up to --jobs) through the procs engine. A task's key
+# hashes its command, env, the venv's interpreter and packages, the contents
+# of its input files and its dependencies' results. When the key matches
+# the last successful run, the task is skipped; if its outputs were changed
+# or deleted since, they are restored from a per-key cache under
+# .pippy/tasks/. Tasks without inputs always run.
+
+TASKS_DIR_NAME = "tasks" # Under .pippy/
+STATE_FILE_NAME = "state.json"
+STATE_VERSION = 1
+CACHE_KEEP = 3 # Cached output sets kept per task
+SUCCESS = ("ran", "up to date", "restored")
+
+_TASK_KEYS = {"cmd", "deps", "inputs", "outputs", "env", "timeout", "cache"}
+_WILDCARDS = set("*?[")
+
+
+def _tasks_dir(project_dir: Path) -> Path:
+    return project_dir / STATE_DIR_NAME / TASKS_DIR_NAME
+
+
+# --- Definitions ---
+
+def load_tasks(project_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads 'tasks' from pippy.json, normalizing each to 'cmd', 'deps',
+    'inputs', 'outputs', 'env', 'timeout' and 'cache'. A task may be given
+    as just its command. Raises Exit on invalid definitions.
+    """
+    raw = helpers.read_config(project_dir).get("tasks", {})
+    if not isinstance(raw, dict):
+        log.error("'tasks' in pippy.json must be an object mapping task names to definitions.")
+        raise Exit(1)
+    tasks: Dict[str, Dict[str, Any]] = {}
+    for name, spec in raw.items():
+        if isinstance(spec, (str, list)):
+            spec = {"cmd": spec}
+        cmd = spec.get("cmd") if isinstance(spec, dict) else None
+        if not (isinstance(cmd, str) and cmd.strip()) and not (isinstance(cmd, list) and cmd and all(isinstance(a, str) for a in cmd)):
+            log.error(f"Task '{name}' needs a 'cmd': a command string or a list of arguments.")
+            raise Exit(1)
+        unknown = set(spec) - _TASK_KEYS
+        if unknown:
+            log.warning(f"Task '{name}': ignoring unknown keys {', '.join(sorted(unknown))}.")
+        tasks[name] = {
+            "cmd": cmd,
+            "deps": [str(dep) for dep in spec.get("deps", [])],
+            "inputs": [str(pattern) for pattern in spec.get("inputs", [])],
+            "outputs": [str(pattern).strip("/") for pattern in spec.get("outputs", [])],
+            "env": {str(k): str(v) for k, v in spec.get("env", {}).items()},
+            "timeout": spec.get("timeout"),
+            "cache": bool(spec.get("cache", True)),
+        }
+    for name, task in tasks.items():
+        for dep in task["deps"]:
+            if dep not in tasks:
+                log.error(f"Task '{name}' depends on unknown task '{dep}'.")
+                raise Exit(1)
+    return tasks
+
+
+def plan(tasks: Dict[str, Dict[str, Any]], targets: List[str]) -> List[str]:
+    """Returns targets and their transitive dependencies, dependencies first. Raises Exit on unknown names or cycles."""
+    order: List[str] = []
+    state: Dict[str, str] = {}
+
+    def visit(name: str, path: List[str]):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            log.error(f"Task dependency cycle: {' -> '.join(path)}")
+            raise Exit(1)
+        state[name] = "visiting"
+        for dep in tasks[name]["deps"]:
+            visit(dep, path + [dep])
+        state[name] = "done"
+        order.append(name)
+
+    for target in targets:
+        if target not in tasks:
+            log.error(f"Unknown task '{target}'. Available: {', '.join(sorted(tasks)) or 'none'}.")
+            raise Exit(1)
+        visit(target, [target])
+    return order
+
+
+def command_args(cmd) -> List[str]:
+    """argv for a task command; strings run through the platform shell."""
+    if isinstance(cmd, list):
+        return cmd
+    if os.name == "nt":
+        return [os.environ.get("COMSPEC", "cmd.exe"), "/d", "/c", cmd]
+    return ["/bin/sh", "-c", cmd]
+
+
+# --- Hashing ---
+
+def _split_pattern(pattern: str) -> Tuple[str, str]:
+    """Splits a glob into its literal leading directories and the wildcard rest."""
+    parts = pattern.strip("/").split("/")
+    for i, part in enumerate(parts):
+        if part == "**" or _WILDCARDS & set(part):
+            return "/".join(parts[:i]), "/".join(parts[i:])
+    return "/".join(parts), ""
+
+
+def expand_paths(project_dir: Path, patterns: List[str]) -> List[str]:
+    """
+    Lists files matched by patterns (globs, files, or directories taken
+    recursively) as sorted '/'-separated project-relative paths. Only the
+    literal part of a pattern is walked, and excluded directories (.venv,
+    .git, __pycache__, ...) are skipped below it.
+    """
+    found = set()
+    for pattern in patterns:
+        base, rest = _split_pattern(pattern)
+        base_path = project_dir / base if base else project_dir
+        regex = vcs.compile_glob(rest) if rest else None
+        if regex is None and base_path.is_file():
+            found.add(base)
+            continue
+        if not base_path.is_dir():
+            continue
+        for rel_dir, _, files in helpers.walk_project(base_path, EXCLUDE_DIRS):
+            for entry in files:
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if regex is None or regex.match(rel):
+                    found.add(f"{base}/{rel}" if base else rel)
+    return sorted(found)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(project_dir: Path, rel_paths: List[str], memo: Dict[str, List[Any]]) -> Dict[str, str]:
+    """
+    sha256 of each file, reusing memo entries (rel -> [size, mtime_ns, inode,
+    digest]) whose stat still matches, so unchanged inputs are not re-read.
+    """
+    hashes = {}
+    for rel in rel_paths:
+        path = project_dir / rel
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        signature = [st.st_size, st.st_mtime_ns, st.st_ino]
+        known = memo.get(rel)
+        if known and known[:3] == signature:
+            hashes[rel] = known[3]
+            continue
+        digest = _hash_file(path)
+        memo[rel] = signature + [digest]
+        hashes[rel] = digest
+    return hashes
+
+
+def environment_fingerprint(venv_path: Optional[Path]) -> Dict[str, Any]:
+    """What a task's environment contributes to its key: the interpreter and installed packages."""
+    profile = venvs.get_profile(venv_path) if venv_path else None
+    if not profile:
+        return {"python": sys.version, "platform": sys.platform}
+    return {
+        "python": profile["interpreter"]["version"],
+        "implementation": profile["interpreter"]["implementation"],
+        "prefix": profile["interpreter"]["prefix"],
+        "packages": sorted(f"{d['name']}=={d['version']}" for d in profile["distributions"].values()),
+    }
+
+
+def _digest(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+# --- Output Cache ---
+
+def _cache_dir(project_dir: Path, name: str, key: str) -> Path:
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return _tasks_dir(project_dir) / "cache" / safe_name / key[:32]
+
+
+def save_outputs(project_dir: Path, name: str, key: str, outputs: Dict[str, str]):
+    """Copies a task's output files into the cache for key, keeping the CACHE_KEEP newest keys."""
+    cache_dir = _cache_dir(project_dir, name, key)
+    tmp_dir = cache_dir.with_name(f".{cache_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        for rel in outputs:
+            target = tmp_dir / "files" / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Copies (or reflinks), never hardlinks: the task may rewrite its outputs in place
+            helpers.clone_file(str(project_dir / rel), str(target), hardlink=False)
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp_dir / "manifest.json", "w") as f:
+            json.dump({"key": key, "outputs": outputs}, f)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, cache_dir)
+    except OSError as e:
+        log.warning(f"Could not cache the outputs of task '{name}': {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    entries = sorted(cache_dir.parent.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in entries[CACHE_KEEP:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def restore_outputs(project_dir: Path, task: Dict[str, Any], name: str, key: str) -> Optional[Dict[str, str]]:
+    """Replaces a task's current outputs with the cached ones for key. Returns their hashes, or None if not cached."""
+    cache_dir = _cache_dir(project_dir, name, key)
+    try:
+        with open(cache_dir / "manifest.json", "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("key") != key:
+        return None
+    try:
+        for rel in expand_paths(project_dir, task["outputs"]):
+            (project_dir / rel).unlink()
+        for rel in manifest["outputs"]:
+            target = project_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            helpers.clone_file(str(cache_dir / "files" / rel), str(target), hardlink=False)
+        os.utime(cache_dir) # Most recently used
+    except OSError as e:
+        log.warning(f"Could not restore the cached outputs of task '{name}': {e}")
+        return None
+    return manifest["outputs"]
+
+
+# --- State ---
+
+def _load_state(project_dir: Path) -> Dict[str, Any]:
+    try:
+        with open(_tasks_dir(project_dir) / STATE_FILE_NAME, "r") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": STATE_VERSION, "tasks": {}, "hashes": {}}
+
+
+def _save_state(project_dir: Path, state: Dict[str, Any]):
+    tasks_dir = _tasks_dir(project_dir)
+    try:
+        tasks_dir.mkdir(parents=True, exist_ok=True)
+        gitignore = tasks_dir.parent / ".gitignore"
+        if not gitignore.exists():
+            gitignore.write_text("# Created by pippy\n*\n")
+        tmp_path = tasks_dir / f"{STATE_FILE_NAME}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, tasks_dir / STATE_FILE_NAME)
+    except OSError as e:
+        log.debug(f"Could not write task state to {tasks_dir}: {e}")
+
+
+# --- Scheduling ---
+
+async def _run_graph(
+    project_dir: Path,
+    tasks: Dict[str, Dict[str, Any]],
+    order: List[str],
+    jobs: int,
+    force: bool,
+    keep_going: bool,
+    env: Dict[str, str],
+    fingerprint: Dict[str, Any],
+    state: Dict[str, Any],
+    timeout: Optional[float],
+    log_handle,
+) -> Dict[str, Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(jobs)
+    memo = state["hashes"]
+    results: Dict[str, Dict[str, Any]] = {}
+    fingerprints: Dict[str, str] = {} # What dependents see of a finished task
+
+    def prepare(name: str) -> Tuple[str, bool]:
+        task = tasks[name]
+        cacheable = task["cache"] and bool(task["inputs"])
+        inputs = hash_files(project_dir, expand_paths(project_dir, task["inputs"]), memo)
+        key = _digest({
+            "cmd": task["cmd"], "env": task["env"], "environment": fingerprint, "inputs": inputs,
+            "outputs": task["outputs"], "deps": {dep: fingerprints[dep] for dep in task["deps"]},
+        })
+        return key, cacheable
+
+    def reuse(name: str, key: str) -> Optional[str]:
+        task = tasks[name]
+        previous = state["tasks"].get(name)
+        if previous and previous["key"] == key:
+            current = hash_files(project_dir, expand_paths(project_dir, task["outputs"]), memo)
+            if current == previous["outputs"]:
+                return "up to date"
+        outputs = restore_outputs(project_dir, task, name, key)
+        if outputs is None:
+            return None
+        state["tasks"][name] = {"key": key, "outputs": outputs}
+        return "restored"
+
+    def record(name: str, key: str, cacheable: bool) -> Dict[str, str]:
+        task = tasks[name]
+        outputs = hash_files(project_dir, expand_paths(project_dir, task["outputs"]), memo)
+        if cacheable:
+            state["tasks"][name] = {"key": key, "outputs": outputs}
+            save_outputs(project_dir, name, key, outputs)
+        return outputs
+
+    async def run_one(index: int, name: str):
+        task = tasks[name]
+        await asyncio.gather(*(futures[dep] for dep in task["deps"]), return_exceptions=True)
+        blocked = [dep for dep in task["deps"] if results.get(dep, {}).get("status") not in SUCCESS]
+        if blocked:
+            results[name] = {"status": "skipped", "wall": 0.0, "reason": f"'{blocked[0]}' did not succeed"}
+            return
+        async with semaphore:
+            start = time.perf_counter()
+            key, cacheable = await loop.run_in_executor(None, prepare, name)
+            status = await loop.run_in_executor(None, reuse, name, key) if cacheable and not force else None
+            if status:
+                fingerprints[name] = key
+                results[name] = {"status": status, "wall": time.perf_counter() - start}
+                return
+            log.info(f"Running task '{name}'...")
+            result = await procs.run_async(
+                name, command_args(task["cmd"]), cwd=project_dir, env=dict(env, **task["env"]),
+                timeout=task["timeout"] or timeout, log_handle=log_handle, color=procs.prefix_color(index),
+            )
+            if result["returncode"] != 0:
+                results[name] = {"status": "failed", "returncode": result["returncode"], "wall": time.perf_counter() - start}
+                return
+            outputs = await loop.run_in_executor(None, record, name, key, cacheable)
+            # Uncached tasks are identified to dependents by what they produced
+            fingerprints[name] = key if cacheable else _digest(outputs)
+            results[name] = {"status": "ran", "wall": time.perf_counter() - start}
+
+    futures = {name: asyncio.ensure_future(run_one(i, name)) for i, name in enumerate(order)}
+    pending = set(futures.values())
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        failed = any(r["status"] == "failed" for r in results.values())
+        if failed and not keep_going and pending:
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            break
+    for name in order:
+        results.setdefault(name, {"status": "cancelled", "wall": 0.0})
+    return results
+
+
+def run(
+    project_dir: Path,
+    targets: List[str],
+    jobs: Optional[int] = None,
+    force: bool = False,
+    keep_going: bool = False,
+    timeout: Optional[float] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs targets and their dependencies, skipping tasks whose key matches
+    their last successful run. Returns per-task results ('status': ran,
+    up to date, restored, failed, skipped or cancelled; 'wall'), in order.
+    """
+    tasks = load_tasks(project_dir)
+    order = plan(tasks, targets)
+    venv_path = helpers.find_venv(project_dir)
+    env: Dict[str, str] = {}
+    if venv_path:
+        env = {"VIRTUAL_ENV": str(venv_path), "PATH": f"{venvs.scripts_dir(venv_path)}{os.pathsep}{os.environ.get('PATH', '')}"}
+    state = _load_state(project_dir)
+    log_file = helpers.output_log()
+    log_handle = open(log_file, "ab") if log_file else None
+    try:
+        results = asyncio.run(_run_graph(
+            project_dir, tasks, order, jobs or os.cpu_count() or 1, force, keep_going,
+            env, environment_fingerprint(venv_path), state, timeout, log_handle,
+        ))
+    finally:
+        if log_handle:
+            log_handle.close()
+        _save_state(project_dir, state)
+    return {name: results[name] for name in order}
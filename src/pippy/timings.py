@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+
+# --- Timing Recorder ---
+# Collects one event per run_cmd call and per named phase while enabled via
+# the global --timings / --trace options. Disabled by default, so the hooks
+# in helpers.run_cmd and the commands cost a single flag check.
+
+_enabled = False
+_events: List[Dict[str, Any]] = []
+_lock = threading.Lock()
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def enable():
+    """Starts recording timing events for this process."""
+    global _enabled
+    _enabled = True
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _cpu_seconds() -> float:
+    """CPU time of this process plus all waited-for child processes."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _stack() -> List[str]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def _span(kind: str, name: str):
+    if not _enabled:
+        yield {}
+        return
+    stack = _stack()
+    args: Dict[str, Any] = {}
+    depth = len(stack)
+    stack.append(name)
+    start_wall = time.perf_counter()
+    start_cpu = _cpu_seconds()
+    try:
+        yield args
+    finally:
+        wall = time.perf_counter() - start_wall
+        cpu = _cpu_seconds() - start_cpu
+        stack.pop()
+        with _lock:
+            _events.append({
+                "kind": kind,
+                "name": name,
+                "start": start_wall - _origin,
+                "wall": wall,
+                "cpu": cpu,
+                "depth": depth,
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+
+def phase(name: str):
+    """Context manager timing a named phase of a command."""
+    return _span("phase", name)
+
+
+def command(cmd_list):
+    """
+    Context manager timing one external command. Yields a dict the caller
+    fills with 'exit_code' and 'output_bytes' once they are known.
+    """
+    label = cmd_list if isinstance(cmd_list, str) else " ".join(str(c) for c in cmd_list)
+    return _span("cmd", " ".join(label.split())) # Inline scripts (python -c) span lines
+
+
+# --- Reporting ---
+
+def _fmt_seconds(value: float) -> str:
+    return f"{value:.3f}s" if value >= 0.001 else f"{value * 1000:.2f}ms"
+
+
+def format_summary() -> str:
+    """Renders recorded events as a plain-text table, in start order."""
+    events = sorted(_events, key=lambda e: e["start"])
+    header = f"{'WALL':>10} {'CPU':>10} {'EXIT':>5} {'OUT':>10}  NAME"
+    lines = [header, "-" * len(header)]
+    for event in events:
+        exit_code = event["args"].get("exit_code")
+        out_bytes = event["args"].get("output_bytes")
+        name = ("  " * event["depth"]) + ("$ " if event["kind"] == "cmd" else "") + event["name"]
+        if len(name) > 100:
+            name = name[:97] + "..."
+        lines.append(
+            f"{_fmt_seconds(event['wall']):>10} {_fmt_seconds(event['cpu']):>10} "
+            f"{'-' if exit_code is None else exit_code:>5} "
+            f"{'-' if out_bytes is None else out_bytes:>10}  {name}"
+        )
+    commands = [e for e in events if e["kind"] == "cmd"]
+    lines.append("-" * len(header))
+    lines.append(
+        f"{len(commands)} commands, {_fmt_seconds(sum(e['wall'] for e in commands))} "
+        f"wall in subprocesses"
+    )
+    return "\n".join(lines)
+
+
+def write_trace(path: Path):
+    """Writes recorded events as Chrome trace JSON (chrome://tracing, Perfetto)."""
+    pid = os.getpid()
+    trace_events = []
+    for event in _events:
+        trace_events.append({
+            "name": event["name"],
+            "cat": event["kind"],
+            "ph": "X",
+            "ts": round(event["start"] * 1e6),
+            "dur": round(event["wall"] * 1e6),
+            "pid": pid,
+            "tid": event["tid"],
+            "args": dict(event["args"], cpu_ms=round(event["cpu"] * 1000, 3)),
+        })
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, indent=1)
+
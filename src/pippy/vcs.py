@@ -0,0 +1,165 @@
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Pattern, Tuple
+
+from . import timings
+from .config import log
+
+# (base_dir, regex, negate, dir_only); base_dir is the '/'-separated directory
+# holding the .gitignore, relative to the project root ("" for the root).
+IgnoreRule = Tuple[str, Pattern, bool, bool]
+
+# --- Git Fast Path ---
+
+def find_git_root(project_dir: Path) -> Optional[Path]:
+    """Returns the enclosing git work tree root, or None if not in a checkout."""
+    for candidate in (project_dir, *project_dir.parents):
+        if (candidate / ".git").exists(): # Directory, or file for worktrees/submodules
+            return candidate
+    return None
+
+def git_ls_files(project_dir: Path) -> Optional[List[str]]:
+    """
+    Lists tracked plus untracked-but-not-ignored files below project_dir as
+    '/'-separated paths relative to it, with .gitignore, .git/info/exclude and
+    the user's global excludes applied by git itself. Tracked files deleted
+    from the work tree are still listed. Returns None when project_dir is not
+    in a git checkout or git is unavailable, so callers can fall back to a
+    filesystem walk.
+    """
+    if find_git_root(project_dir) is None or not shutil.which("git"):
+        return None
+    cmd = ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"]
+    with timings.command(cmd) as timing:
+        try:
+            process = subprocess.run(cmd, cwd=project_dir, capture_output=True, check=False)
+        except OSError as e:
+            log.debug(f"git ls-files failed to start: {e}")
+            return None
+        timing["exit_code"] = process.returncode
+        timing["output_bytes"] = len(process.stdout) + len(process.stderr)
+    if process.returncode != 0:
+        log.debug(f"git ls-files failed (exit code {process.returncode}); falling back to a directory walk.")
+        return None
+    # --cached lists one entry per stage for unmerged paths, and a path may be
+    # both cached and 'other' during an intent-to-add; keep the first of each.
+    paths = os.fsdecode(process.stdout).split("\0")
+    return list(dict.fromkeys(p for p in paths if p))
+
+
+# --- Gitignore Matching (non-git trees) ---
+
+def _translate_segment(segment: str) -> str:
+    """Translates one glob path segment to a regex ('*' and '?' never match '/')."""
+    out = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "\\" and i < n:
+            out.append(re.escape(segment[i]))
+            i += 1
+        elif c == "[":
+            j = i
+            if j < n and segment[j] in "!^":
+                j += 1
+            if j < n and segment[j] == "]":
+                j += 1
+            while j < n and segment[j] != "]":
+                j += 1
+            if j >= n:
+                out.append("\\[")
+            else:
+                body = segment[i:j].replace("\\", "\\\\")
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+def compile_gitignore_pattern(line: str) -> Optional[Tuple[Pattern, bool, bool]]:
+    """
+    Compiles one .gitignore line to (regex, negate, dir_only), or None for
+    blanks and comments. The regex matches paths relative to the directory
+    holding the .gitignore.
+    """
+    line = line.rstrip("\n").rstrip("\r")
+    # Trailing spaces are ignored unless escaped with a backslash
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:] if line[1:2] in ("#", "!") else line
+    dir_only = line.endswith("/")
+    line = line.strip("/") if dir_only else line
+    if not line:
+        return None
+    # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+    anchored = "/" in line
+    line = line.lstrip("/")
+
+    segments = line.split("/")
+    regex = "" if anchored else "(?:.*/)?"
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            regex += ".*" if last else "(?:.*/)?"
+        else:
+            regex += _translate_segment(segment) + ("" if last else "/")
+    return re.compile(f"^{regex}$", re.DOTALL), negate, dir_only
+
+def compile_glob(pattern: str) -> Pattern:
+    """
+    Compiles a '/'-separated glob anchored at the project root, where '**'
+    spans any number of directories (e.g. 'src/**/*.py', 'schema/*.json').
+    """
+    segments = pattern.strip("/").split("/")
+    regex = ""
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            regex += ".*" if last else "(?:.*/)?"
+        else:
+            regex += _translate_segment(segment) + ("" if last else "/")
+    return re.compile(f"^{regex}$", re.DOTALL)
+
+def read_gitignore(path: Path, base_dir: str) -> List[IgnoreRule]:
+    """Parses a .gitignore file into rules scoped to base_dir."""
+    rules: List[IgnoreRule] = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                compiled = compile_gitignore_pattern(line)
+                if compiled:
+                    rules.append((base_dir, *compiled))
+    except OSError as e:
+        log.debug(f"Could not read {path}: {e}")
+    return rules
+
+def is_ignored(rules: Tuple[IgnoreRule, ...], rel_path: str, is_dir: bool) -> bool:
+    """Applies gitignore rules to a '/'-separated project-relative path; the last match wins."""
+    for base_dir, regex, negate, dir_only in reversed(rules):
+        if dir_only and not is_dir:
+            continue
+        if base_dir:
+            if not rel_path.startswith(base_dir + "/"):
+                continue
+            candidate = rel_path[len(base_dir) + 1:]
+        else:
+            candidate = rel_path
+        if regex.match(candidate):
+            return not negate
+    return False
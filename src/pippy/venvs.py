@@ -0,0 +1,274 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from . import dists, timings
+from .config import log, VENV_PROFILE_NAME
+
+# --- Venv Profile ---
+# Everything pippy needs to know about a venv, gathered by one launch of its
+# interpreter plus a scan of its bin/ and site-packages, and cached inside
+# the venv. The cache is keyed on the mtimes of pyvenv.cfg, site-packages
+# and bin/ (any install, uninstall or upgrade changes at least one), so
+# later commands answer from it without stats of every candidate path or
+# interpreter launches.
+
+PROFILE_VERSION = 3
+
+# Per-process copy of profiles already loaded, with the key they were valid for
+_loaded: Dict[Path, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+# Runs inside the venv's interpreter. Prints facts that cannot be read from
+# the filesystem: version, wheel tags, sys.path, importable top-level modules
+# and the standard library's module names.
+_PROBE_SCRIPT = """\
+import json, pkgutil, sys, sysconfig
+def tags():
+    for module in ("packaging.tags", "pip._vendor.packaging.tags"):
+        try:
+            return [[t.interpreter, t.abi, t.platform] for t in __import__(module, fromlist=["sys_tags"]).sys_tags()]
+        except Exception:
+            pass
+    impl = {"cpython": "cp", "pypy": "pp"}.get(sys.implementation.name, sys.implementation.name)
+    interpreter = "%s%d%d" % (impl, sys.version_info[0], sys.version_info[1])
+    platform = sysconfig.get_platform().replace("-", "_").replace(".", "_")
+    return [[interpreter, interpreter + getattr(sys, "abiflags", ""), platform], ["py3", "none", "any"]]
+supported = tags()
+path = [p for p in sys.path if p]
+modules = set(sys.builtin_module_names)
+modules.update(m.name for m in pkgutil.iter_modules(path))
+stdlib = set(getattr(sys, "stdlib_module_names", ())) # Python 3.10+
+if not stdlib:
+    stdlib = set(sys.builtin_module_names)
+    stdlib_dir = sysconfig.get_paths()["stdlib"]
+    stdlib.update(m.name for m in pkgutil.iter_modules([stdlib_dir, stdlib_dir + "/lib-dynload"]))
+print(json.dumps({
+    "version": "%d.%d.%d" % sys.version_info[:3],
+    "implementation": sys.implementation.name,
+    "cache_tag": sys.implementation.cache_tag,
+    "soabi": sysconfig.get_config_var("SOABI"),
+    "tag": supported[0],
+    "supported_tags": ["-".join(t) for t in supported],
+    "executable": sys.executable,
+    "prefix": sys.prefix,
+    "base_prefix": sys.base_prefix,
+    "sys_path": path,
+    "purelib": sysconfig.get_paths()["purelib"],
+    "modules": sorted(modules),
+    "stdlib_modules": sorted(stdlib),
+}))
+"""
+
+
+def scripts_dir(venv_path: Path) -> Path:
+    """The venv's bin/ (Scripts\\ on Windows) directory."""
+    return venv_path / ("Scripts" if sys.platform == "win32" else "bin")
+
+
+def python_path(venv_path: Path) -> Path:
+    """Where the venv's python executable lives (it may not exist)."""
+    return scripts_dir(venv_path) / ("python.exe" if sys.platform == "win32" else "python")
+
+
+def site_packages_dir(venv_path: Path) -> Optional[Path]:
+    """Locates the venv's site-packages directory without starting its interpreter."""
+    if sys.platform == "win32":
+        site_packages = venv_path / "Lib" / "site-packages"
+        return site_packages if site_packages.is_dir() else None
+    candidates = sorted((venv_path / "lib").glob("python*/site-packages"))
+    return candidates[-1] if candidates else None
+
+
+def python_version(venv_path: Path) -> Optional[Tuple[int, int]]:
+    """The venv's (major, minor) Python version, from pyvenv.cfg or else its profile."""
+    try:
+        with open(venv_path / "pyvenv.cfg", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info"):
+                    major, minor = value.strip().split(".")[:2]
+                    return int(major), int(minor)
+    except (OSError, ValueError):
+        pass
+    profile = get_profile(venv_path)
+    if profile is None:
+        return None
+    major, minor = profile["interpreter"]["version"].split(".")[:2]
+    return int(major), int(minor)
+
+
+def _profile_key(venv_path: Path) -> Optional[Dict[str, Any]]:
+    """The stats a profile is valid for, or None if venv_path is not a venv."""
+    try:
+        key: Dict[str, Any] = {"pyvenv_cfg": os.stat(venv_path / "pyvenv.cfg").st_mtime_ns}
+    except OSError:
+        return None
+    site_packages = site_packages_dir(venv_path)
+    for name, path in (("site_packages", site_packages), ("scripts", scripts_dir(venv_path))):
+        try:
+            key[name] = [str(path), os.stat(path).st_mtime_ns] if path else None
+        except OSError:
+            key[name] = None
+    key["pythonpath"] = os.environ.get("PYTHONPATH", "") # Changes sys.path without touching the venv
+    return key
+
+
+def console_scripts(site_packages: Path) -> Dict[str, str]:
+    """Maps console/GUI script names to their 'module:function' entry points."""
+    scripts: Dict[str, str] = {}
+    for dist in dists.installed_distributions(site_packages).values():
+        entry_points = dists.read_entry_points(dist["path"])
+        for group in ("console_scripts", "gui_scripts"):
+            for name, target in entry_points.get(group, {}).items():
+                scripts.setdefault(name, target)
+    return scripts
+
+
+def executables(venv_path: Path) -> Dict[str, str]:
+    """Maps command names to executables in the venv's bin/ (.exe stripped on Windows)."""
+    table: Dict[str, str] = {}
+    try:
+        with os.scandir(scripts_dir(venv_path)) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                name = entry.name
+                if sys.platform == "win32" and name.lower().endswith(".exe"):
+                    name = name[:-4]
+                table.setdefault(name, entry.path)
+    except OSError as e:
+        log.debug(f"Could not list {scripts_dir(venv_path)}: {e}")
+    return table
+
+
+def _probe_interpreter(python: Path, venv_path: Path) -> Optional[Dict[str, Any]]:
+    cmd = [str(python), "-c", _PROBE_SCRIPT]
+    with timings.command(cmd) as timing:
+        try:
+            process = subprocess.run(cmd, cwd=venv_path, capture_output=True, text=True, check=False)
+        except OSError as e:
+            log.debug(f"Could not start {python}: {e}")
+            return None
+        timing["exit_code"] = process.returncode
+        timing["output_bytes"] = len(process.stdout) + len(process.stderr)
+    if process.returncode != 0:
+        log.debug(f"Venv probe failed (exit code {process.returncode}): {process.stderr.strip()}")
+        return None
+    try:
+        return json.loads(process.stdout.splitlines()[-1])
+    except (ValueError, IndexError) as e:
+        log.debug(f"Unreadable venv probe output: {e}")
+        return None
+
+
+def build_profile(venv_path: Path, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Probes the venv and returns a fresh profile for key, or None if its python cannot run."""
+    python = python_path(venv_path)
+    interpreter = _probe_interpreter(python, venv_path) if python.exists() else None
+    if interpreter is None:
+        return None
+    site_packages = site_packages_dir(venv_path)
+    installed = dists.installed_distributions(site_packages) if site_packages else {}
+    return {
+        "version": PROFILE_VERSION,
+        "key": key,
+        "python": str(python),
+        "site_packages": str(site_packages) if site_packages else None,
+        "interpreter": interpreter,
+        "distributions": {
+            name: {"name": dist["name"], "version": dist["version"], "metadata": dist["path"].name}
+            for name, dist in installed.items()
+        },
+        "console_scripts": console_scripts(site_packages) if site_packages else {},
+        "executables": executables(venv_path),
+    }
+
+
+def _read_profile(venv_path: Path, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        with open(venv_path / VENV_PROFILE_NAME, "r") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("version") != PROFILE_VERSION or profile.get("key") != key:
+        log.debug(f"Venv profile in {venv_path} is out of date.")
+        return None
+    return profile
+
+
+def _write_profile(venv_path: Path, profile: Dict[str, Any]):
+    tmp_path = venv_path / f"{VENV_PROFILE_NAME}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, indent=1)
+        os.replace(tmp_path, venv_path / VENV_PROFILE_NAME)
+    except OSError as e:
+        log.debug(f"Could not write venv profile in {venv_path}: {e}")
+
+
+def get_profile(venv_path: Path, probe: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Returns the venv's profile, from memory or the on-disk cache when still
+    valid. Otherwise, when probe is True, launches the venv's interpreter once
+    and caches the result; when False, returns None instead of probing.
+    """
+    key = _profile_key(venv_path)
+    if key is None:
+        return None
+    loaded = _loaded.get(venv_path)
+    if loaded and loaded[0] == key:
+        return loaded[1]
+    profile = _read_profile(venv_path, key)
+    if profile is None and probe:
+        profile = build_profile(venv_path, key)
+        if profile is not None:
+            _write_profile(venv_path, profile)
+    if profile is not None:
+        _loaded[venv_path] = (key, profile)
+    return profile
+
+
+def module_available(profile: Dict[str, Any], module_name: str) -> Optional[bool]:
+    """
+    Answers a find_spec check from a profile: True for top-level modules it
+    lists, None (unknown) otherwise. The list comes from pkgutil over
+    sys.path, so it misses namespace packages, modules served by meta-path
+    finders (editable installs, .pth import hooks) and the project's own
+    modules; those, and submodules, need a real import system lookup.
+    """
+    top, _, rest = module_name.partition(".")
+    if rest or top not in set(profile["interpreter"]["modules"]):
+        return None
+    return True
+
+
+# --- Console Scripts ---
+
+# Same wrapper pip (distlib) writes for console_scripts entry points
+_SCRIPT_TEMPLATE = """\
+#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({call}())
+"""
+
+
+def write_console_script(path: Path, python: str, target: str) -> bytes:
+    """Writes a console script wrapper for 'module:attr[.attr]' and returns its content."""
+    module, _, attrs = target.split("[")[0].strip().partition(":")
+    import_name = attrs.split(".")[0].strip() or module.rpartition(".")[2]
+    call = attrs.strip() or import_name
+    content = _SCRIPT_TEMPLATE.format(python=python, module=module.strip(), import_name=import_name, call=call).encode()
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.chmod(tmp_path, 0o755)
+    os.replace(tmp_path, path)
+    return content
@@ -0,0 +1,217 @@
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from typer import Exit
+
+from . import dists, helpers, venvs
+from .config import log, USER_CACHE_DIR
+
+# --- Wheelhouse ---
+# A directory of wheels under the user cache, shared by every project. Online
+# installs first run 'pip wheel' into it (downloading wheels, and building
+# sdists for the venv's interpreter/ABI), then install from it with
+# '--no-index --find-links'. When every pinned requirement already has a
+# compatible wheel there, pip is pointed only at the wheelhouse, so
+# reinstalls need no network and air-gapped machines can install from a
+# copied wheelhouse. Editable, local-path and URL requirements skip the
+# wheelhouse and go straight to pip, as does any install the wheelhouse
+# cannot satisfy. A wheel's mtime records when a venv last installed it;
+# the least recently used wheels are evicted to keep the directory under
+# PIPPY_WHEELHOUSE_MAX_MB.
+
+WHEELHOUSE_DIR = Path(os.environ.get("PIPPY_WHEELHOUSE") or USER_CACHE_DIR / "wheels")
+DEFAULT_MAX_MB = 5120
+
+# name-version(-build)?-python-abi-platform.whl (PEP 427)
+_WHEEL_RE = re.compile(
+    r"^(?P<name>[^-]+)-(?P<version>[^-]+)(?:-(?P<build>\d[^-]*))?"
+    r"-(?P<python>[^-]+)-(?P<abi>[^-]+)-(?P<platform>[^-]+)\.whl$"
+)
+
+
+def max_bytes() -> int:
+    """Size cap from PIPPY_WHEELHOUSE_MAX_MB (default 5 GB)."""
+    try:
+        return int(os.environ.get("PIPPY_WHEELHOUSE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+    except ValueError:
+        log.warning("Ignoring invalid PIPPY_WHEELHOUSE_MAX_MB; using the default.")
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def parse_wheel_filename(filename: str) -> Optional[Dict[str, Any]]:
+    """
+    Splits a wheel filename into 'name', 'version' and 'tags' (the set of
+    single 'python-abi-platform' tags its compressed tag set expands to, e.g.
+    'py2.py3-none-any' -> {'py2-none-any', 'py3-none-any'}). None if invalid.
+    """
+    match = _WHEEL_RE.match(filename)
+    if not match:
+        return None
+    return {
+        "name": match.group("name"),
+        "version": match.group("version"),
+        "tags": {
+            f"{python}-{abi}-{platform}"
+            for python in match.group("python").split(".")
+            for abi in match.group("abi").split(".")
+            for platform in match.group("platform").split(".")
+        },
+    }
+
+
+def list_wheels(supported_tags: Optional[Set[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Indexes the wheelhouse by canonical project name. Each wheel has 'name',
+    'version', 'tags' and 'path'. With supported_tags, wheels the venv cannot
+    install are left out.
+    """
+    wheels: Dict[str, List[Dict[str, Any]]] = {}
+    try:
+        with os.scandir(WHEELHOUSE_DIR) as entries:
+            names = [entry.name for entry in entries if entry.name.endswith(".whl")]
+    except OSError:
+        return wheels
+    for filename in names:
+        wheel = parse_wheel_filename(filename)
+        if not wheel:
+            continue
+        if supported_tags is not None and not (wheel["tags"] & supported_tags):
+            continue
+        wheel["path"] = WHEELHOUSE_DIR / filename
+        wheels.setdefault(dists.canonical_name(wheel["name"]), []).append(wheel)
+    return wheels
+
+
+def covers(entries: List[Dict[str, Any]], supported_tags: Set[str]) -> bool:
+    """
+    Whether every requirement (as from dists.parse_lock_file) is pinned and
+    has a compatible wheel in the wheelhouse. Dependencies are not checked;
+    pip reports those when the offline install runs.
+    """
+    wheels = list_wheels(supported_tags)
+    for entry in entries:
+        if not entry["key"] or not entry["version"]:
+            return False
+        if not any(dists.versions_match(entry["version"], wheel["version"]) for wheel in wheels.get(entry["key"], [])):
+            return False
+    return True
+
+
+def builds_from_source(entry: Dict[str, Any]) -> bool:
+    """
+    Whether a requirement is editable, a local path or a direct URL/VCS
+    reference. pip builds those from source, with build dependencies from
+    the index, so they bypass the wheelhouse.
+    """
+    line = entry["line"].split(" --hash")[0]
+    if line.startswith(("-e ", "--editable", ".", "/", "~", "file:")):
+        return True
+    return "://" in line or " @ " in line or entry["key"] is None
+
+
+def mark_used(site_packages: Path):
+    """Sets the mtime of wheels matching distributions installed in site_packages (LRU order)."""
+    installed = dists.installed_distributions(site_packages)
+    for key, wheels in list_wheels().items():
+        dist = installed.get(key)
+        if dist is None:
+            continue
+        for wheel in wheels:
+            if dists.versions_match(wheel["version"], dist["version"]):
+                try:
+                    os.utime(wheel["path"])
+                except OSError:
+                    pass
+
+
+def evict(limit: Optional[int] = None) -> int:
+    """Deletes least recently used wheels until the wheelhouse fits limit bytes. Returns bytes freed."""
+    limit = max_bytes() if limit is None else limit
+    try:
+        with os.scandir(WHEELHOUSE_DIR) as entries:
+            wheels = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                      for entry in entries if entry.name.endswith(".whl") and entry.is_file()]
+    except OSError:
+        return 0
+    total = sum(size for _, size, _ in wheels)
+    freed = 0
+    for _, size, path in sorted(wheels):
+        if total - freed <= limit:
+            break
+        try:
+            os.unlink(path)
+            freed += size
+            log.debug(f"Evicted {os.path.basename(path)} from the wheelhouse.")
+        except OSError as e:
+            log.debug(f"Could not evict {path}: {e}")
+    return freed
+
+
+def install(
+    venv_path: Path,
+    project_dir: Path,
+    requirement_args: List[str],
+    entries: List[Dict[str, Any]],
+    options: Optional[List[str]] = None,
+    offline: bool = False,
+):
+    """
+    Installs requirement_args (e.g. ['-r', 'requirements.txt'] or package
+    names) into the venv through the wheelhouse. entries are the parsed
+    requirements, used to decide whether the wheelhouse alone suffices.
+    options (e.g. ['--upgrade'], ['--no-deps']) are passed to 'pip install';
+    '--no-deps' is passed to 'pip wheel' too. With
+    offline=True, the package index is never contacted and a missing wheel
+    is an error. Raises Exit on failure.
+    """
+    options = options or []
+    wheel_options = [option for option in options if option == "--no-deps"]
+    local = ["--no-index", "--find-links", str(WHEELHOUSE_DIR)]
+    profile = venvs.get_profile(venv_path)
+    supported = set(profile["interpreter"].get("supported_tags", [])) if profile else set()
+
+    if offline or (supported and covers(entries, supported)):
+        log.info(f"Installing from the local wheelhouse ({WHEELHOUSE_DIR})...")
+        rc, _, _ = helpers.run_pip_cmd(["install"] + local + options + requirement_args, venv_path, project_dir, check=False)
+        if rc == 0:
+            after_install(venv_path)
+            return
+        if offline:
+            log.error("Offline install failed: not every requirement (or dependency) has a wheel in the wheelhouse.")
+            log.info("Run the same command once without --offline on a machine with network access to fill it.")
+            raise Exit(rc)
+        log.info("The wheelhouse is missing some dependencies; fetching them from the package index.")
+
+    if any(builds_from_source(entry) for entry in entries):
+        log.info("Editable, local or URL requirements present; installing with pip directly instead of via the wheelhouse.")
+        helpers.run_pip_cmd(["install"] + options + requirement_args, venv_path, project_dir, check=True)
+        after_install(venv_path)
+        return
+
+    WHEELHOUSE_DIR.mkdir(parents=True, exist_ok=True)
+    # --find-links lets 'pip wheel' reuse wheels already in the house
+    rc, _, _ = helpers.run_pip_cmd(
+        ["wheel", "--wheel-dir", str(WHEELHOUSE_DIR), "--find-links", str(WHEELHOUSE_DIR)] + wheel_options + requirement_args,
+        venv_path, project_dir, check=False,
+    )
+    if rc == 0:
+        rc, _, _ = helpers.run_pip_cmd(["install"] + local + options + requirement_args, venv_path, project_dir, check=False)
+        if rc != 0:
+            log.warning("Installing from the wheelhouse failed; installing directly from the package index.")
+    else:
+        log.warning("Could not build wheels for every requirement; installing directly from the package index.")
+    if rc != 0:
+        helpers.run_pip_cmd(["install"] + options + requirement_args, venv_path, project_dir, check=True)
+    after_install(venv_path)
+
+
+def after_install(venv_path: Path):
+    """Marks the wheels installed in venv_path as used and evicts down to the size cap."""
+    site_packages = helpers.get_site_packages(venv_path)
+    if site_packages:
+        mark_used(site_packages)
+    freed = evict()
+    if freed:
+        log.info(f"Evicted {helpers.format_bytes(freed)} of least recently used wheels from the wheelhouse.")
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from pippy import dists
+
+
+def _dist(site_packages, name, version, direct_url=None):
+    dist_info = site_packages / f"{name}-{version}.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+    (dist_info / "RECORD").write_text("")
+    if direct_url:
+        (dist_info / "direct_url.json").write_text(json.dumps(direct_url))
+
+
+@pytest.mark.parametrize("python_version, expected", [
+    ((3, 11), ["six==1.16.0"]),
+    ((3, 12), ["setuptools==69.0.0", "six==1.16.0", "wheel==0.42.0"]),
+])
+def test_freeze_hides_what_pip_hides(tmp_path, python_version, expected):
+    for name, version in [("pip", "24.0"), ("setuptools", "69.0.0"), ("wheel", "0.42.0"), ("six", "1.16.0")]:
+        _dist(tmp_path, name, version)
+
+    assert dists.freeze(tmp_path, python_version) == expected
+
+
+def test_freeze_renders_direct_urls(tmp_path):
+    _dist(tmp_path, "tool", "1.0", {"url": "https://github.com/o/tool", "vcs_info": {"vcs": "git", "commit_id": "abc123"}})
+    _dist(tmp_path, "lib", "2.0", {"url": "https://example.com/lib-2.0.tar.gz", "archive_info": {"hashes": {"sha256": "ff"}}})
+    _dist(tmp_path, "local", "0.1", {"url": "file:///src/local", "dir_info": {"editable": True}})
+
+    assert dists.freeze(tmp_path, (3, 12)) == [
+        "lib @ https://example.com/lib-2.0.tar.gz#sha256=ff",
+        "# Editable install with no version control (local==0.1)",
+        "-e /src/local",
+        "tool @ git+https://github.com/o/tool@abc123",
+    ]
+    installed = dists.installed_distributions(tmp_path)
+    assert [key for key, dist in sorted(installed.items()) if dists.is_editable(dist)] == ["local"]
@@ -0,0 +1,15 @@
+from pippy import imports, venvs
+
+
+def test_local_modules_are_top_level_only():
+    rel_paths = ["main.py", "app/__init__.py", "app/yaml/loader.py", "src/mylib/core.py", "src/tool.py",
+                 "tests/requests/fake.py"]
+
+    assert imports.local_modules(rel_paths) == {"main", "app", "mylib", "tool", "tests"}
+
+
+def test_stdlib_modules_come_from_the_venv(tmp_path, monkeypatch):
+    profile = {"interpreter": {"stdlib_modules": ["json", "os"]}}
+    monkeypatch.setattr(venvs, "get_profile", lambda venv_path: profile)
+
+    assert imports.stdlib_modules(tmp_path) == {"json", "os", "__future__"}
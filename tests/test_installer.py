@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from pippy import dists, installer
+
+
+@pytest.fixture
+def no_pip_config(monkeypatch):
+    for key in list(os.environ):
+        if key.startswith("PIP_"):
+            monkeypatch.delenv(key)
+    monkeypatch.setenv("PIP_CONFIG_FILE", os.devnull)
+
+
+def test_defaults_to_pypi(tmp_path, no_pip_config):
+    assert installer.resolve_index_url(tmp_path, []) == installer.DEFAULT_INDEX_URL
+
+
+def test_lock_file_index_url_wins(tmp_path, no_pip_config, monkeypatch):
+    monkeypatch.setenv("PIP_INDEX_URL", "https://env.example/simple")
+    lock = tmp_path / "requirements.lock"
+    lock.write_text("--index-url https://private.example/simple\nsix==1.16.0\n")
+
+    options = dists.lock_file_options(lock)
+
+    assert options == ["--index-url https://private.example/simple"]
+    assert installer.resolve_index_url(tmp_path, options) == "https://private.example/simple"
+
+
+@pytest.mark.parametrize("options", [
+    ["--extra-index-url https://private.example/simple"],
+    ["-f ./wheels"],
+    ["--no-index"],
+])
+def test_several_sources_are_left_to_pip(tmp_path, no_pip_config, options):
+    assert installer.resolve_index_url(tmp_path, options) is None
+
+
+def test_pip_conf_in_venv_is_honored(tmp_path, no_pip_config, monkeypatch):
+    monkeypatch.delenv("PIP_CONFIG_FILE")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "xdg"))
+    monkeypatch.setenv("XDG_CONFIG_DIRS", str(tmp_path / "etc-xdg"))
+    (tmp_path / "pip.conf").write_text("[global]\nextra-index-url = https://private.example/simple\n")
+
+    assert installer.resolve_index_url(tmp_path, []) is None
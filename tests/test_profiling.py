@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from pippy import profiling
+
+
+def _run(args, cwd):
+    return subprocess.run([sys.executable] + args, cwd=cwd, capture_output=True, text=True, timeout=60)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="the sampler needs SIGPROF")
+def test_sample_without_samples_keeps_exit_code(tmp_path):
+    script = tmp_path / "quick.py"
+    script.write_text("import sys\nsys.exit(3)\n")
+    prefix = tmp_path / "quick"
+
+    result = _run(profiling.profile_args("sample", script, [], prefix, interval=10.0), tmp_path)
+
+    assert result.returncode == 3, result.stderr
+    assert "No samples collected" in result.stderr
+    assert "Traceback" not in result.stderr
+    assert not (tmp_path / "quick.pstats").exists()
+
+
+def test_cprofile_writes_reports(tmp_path):
+    script = tmp_path / "work.py"
+    script.write_text("import sys\ndef work():\n    return sum(range(100000))\nwork()\nprint(sys.argv[1:])\n")
+    prefix = tmp_path / "work"
+
+    result = _run(profiling.profile_args("cprofile", script, ["a"], prefix, top=100), tmp_path)
+
+    assert result.returncode == 0, result.stderr
+    assert "['a']" in result.stdout
+    assert "work (work.py:2)" in result.stderr
+    assert (tmp_path / "work.pstats").exists()
+    assert "work (work.py:2)" in (tmp_path / "work.collapsed").read_text()
@@ -0,0 +1,64 @@
+import csv
+import json
+import subprocess
+import sys
+
+import pytest
+
+from pippy import resources
+
+USAGE = {
+    "wall": 1.5, "cpu_user": 1.25, "cpu_system": 0.125, "max_rss": 50 * 1024 * 1024,
+    "peak_tree_rss": 80 * 1024 * 1024, "voluntary_switches": 12, "involuntary_switches": 3,
+    "read_bytes": 4096, "write_bytes": 2 * 1024 * 1024,
+    "samples": [
+        {"t": 0.5, "processes": 1, "rss_bytes": 1000, "cpu_user": 0.4, "cpu_system": 0.1, "read_bytes": 0, "write_bytes": 0},
+        {"t": 1.0, "processes": 2, "rss_bytes": 3000, "cpu_user": 0.9, "cpu_system": 0.1, "read_bytes": 4096, "write_bytes": 512},
+    ],
+}
+
+
+def test_format_summary():
+    summary = resources.format_summary(USAGE)
+
+    assert summary.startswith("Resources:")
+    assert "1.500s" in summary
+    assert "1.250s user, 0.125s system" in summary
+    assert "12 voluntary, 3 involuntary" in summary
+    assert "process tree (sampled)" in summary
+
+
+def test_format_summary_without_tree_samples():
+    assert "process tree" not in resources.format_summary(dict(USAGE, peak_tree_rss=None))
+
+
+def test_write_series_csv(tmp_path):
+    path = tmp_path / "usage.csv"
+
+    resources.write_series(USAGE, path)
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == resources.SERIES_FIELDS
+    assert [row["processes"] for row in rows] == ["1", "2"]
+
+
+def test_write_series_json(tmp_path):
+    path = tmp_path / "usage.json"
+
+    resources.write_series(USAGE, path)
+
+    data = json.loads(path.read_text())
+    assert data["samples"] == USAGE["samples"]
+    assert data["summary"]["write_bytes"] == USAGE["write_bytes"]
+    assert "samples" not in data["summary"]
+
+
+@pytest.mark.skipif(not resources.is_supported(), reason="needs getrusage")
+def test_monitor_accounts_for_children(tmp_path):
+    with resources.monitor(interval=0.05) as usage:
+        subprocess.run([sys.executable, "-c", "import time\nend = time.process_time() + 0.3\nwhile time.process_time() < end: pass"])
+
+    assert usage["cpu_user"] + usage["cpu_system"] >= 0.2
+    assert usage["max_rss"] > 0
+    assert usage["wall"] >= 0.2
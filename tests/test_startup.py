@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Runs pippy in a fresh interpreter and reports the modules it imported. The
+# exec that 'pippy run' ends with is replaced by the report.
+_PROBE = """
+import json, os, sys
+from pippy import helpers
+from pippy.main import app
+
+def report(*args, **kwargs):
+    print(json.dumps(sorted(sys.modules)))
+    sys.stdout.flush()
+    os._exit(0)
+
+helpers.exec_python = report
+try:
+    app(sys.argv[1:])
+finally:
+    report()
+"""
+
+_ENV = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent / "src"))
+
+HEAVY_MODULES = ["openai", "requests", "httpx", "pippy.commands.qa", "pippy.commands.dev"]
+INSTALL_MODULES = ["asyncio", "pippy.bytecode", "pippy.imports", "pippy.index", "pippy.installer",
+                   "pippy.seeds", "pippy.store", "pippy.tasks", "pippy.wheelhouse"]
+
+
+def _imported_modules(args, cwd):
+    result = subprocess.run([sys.executable, "-c", _PROBE] + args, cwd=cwd, env=_ENV, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def test_version_imports_no_commands(tmp_path):
+    modules = _imported_modules(["--version"], tmp_path)
+
+    assert not [name for name in modules if name.startswith("pippy.commands")]
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+
+def test_run_imports_only_core(tmp_path):
+    script = tmp_path / "hello.py"
+    script.write_text("print('hello')\n")
+
+    modules = _imported_modules(["run", str(script)], tmp_path)
+
+    assert "pippy.commands.core" in modules
+    assert not [name for name in HEAVY_MODULES + INSTALL_MODULES if name in modules]
+
+
+def test_lazy_verb_has_no_completion_options(tmp_path):
+    result = subprocess.run([sys.executable, "-m", "pippy.main", "run", "--help"],
+                            cwd=tmp_path, env=_ENV, capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert "--install-completion" not in result.stdout
@@ -0,0 +1,43 @@
+import os
+import time
+
+import pytest
+
+from pippy import store
+
+
+@pytest.fixture
+def store_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "FILES_DIR", tmp_path / "files")
+    monkeypatch.setattr(store, "DISTS_DIR", tmp_path / "dists")
+    (tmp_path / "files" / "ab").mkdir(parents=True)
+    (tmp_path / "dists").mkdir()
+    return tmp_path / "files" / "ab"
+
+
+def test_collect_garbage_keeps_linked_files_and_fresh_temporaries(store_dirs, tmp_path):
+    linked = store_dirs / "ab01"
+    linked.write_bytes(b"linked")
+    os.link(linked, tmp_path / "venv-copy")
+    unreferenced = store_dirs / "ab02"
+    unreferenced.write_bytes(b"unused")
+    sharing = store_dirs / ".ab03.123.tmp"
+    sharing.write_bytes(b"in progress")
+
+    result = store.collect_garbage()
+
+    assert result["files"] == 1
+    assert linked.exists() and sharing.exists()
+    assert not unreferenced.exists()
+
+
+def test_collect_garbage_removes_stale_temporaries(store_dirs, monkeypatch):
+    leftover = store_dirs / ".ab03.123.tmp"
+    leftover.write_bytes(b"interrupted")
+    now = time.time()
+    monkeypatch.setattr(store.time, "time", lambda: now + store.TMP_GRACE_SECONDS + 60)
+
+    assert store.collect_garbage(dry_run=True)["files"] == 1
+    assert leftover.exists()
+    store.collect_garbage()
+    assert not leftover.exists()
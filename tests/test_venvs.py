@@ -0,0 +1,23 @@
+from pippy import venvs
+
+PROFILE = {"interpreter": {"modules": ["json", "requests"]}}
+
+
+def test_listed_module_is_available():
+    assert venvs.module_available(PROFILE, "requests") is True
+
+
+def test_unlisted_module_is_unknown():
+    # Could be a namespace package, an editable install or a project module
+    assert venvs.module_available(PROFILE, "mynamespace") is None
+    assert venvs.module_available(PROFILE, "mynamespace.tool") is None
+
+
+def test_submodule_needs_a_lookup():
+    assert venvs.module_available(PROFILE, "json.decoder") is None
+
+
+def test_python_version_from_pyvenv_cfg(tmp_path):
+    (tmp_path / "pyvenv.cfg").write_text("home = /usr/bin\nversion_info = 3.12.1.final.0\n")
+
+    assert venvs.python_version(tmp_path) == (3, 12)
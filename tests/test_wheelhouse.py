@@ -0,0 +1,20 @@
+import pytest
+
+from pippy import dists, wheelhouse
+
+
+@pytest.mark.parametrize("line", [
+    "-e .",
+    "--editable=git+https://example.com/repo.git#egg=pkg",
+    "./libs/pkg",
+    "/abs/path/pkg-1.0.tar.gz",
+    "pkg @ https://example.com/pkg-1.0-py3-none-any.whl",
+    "git+https://example.com/repo.git",
+])
+def test_source_requirements_bypass_the_wheelhouse(line):
+    assert wheelhouse.builds_from_source(dists.parse_requirement(line))
+
+
+@pytest.mark.parametrize("line", ["requests==2.31.0", "numpy>=1.26", "black[jupyter]==24.1.0"])
+def test_index_requirements_use_the_wheelhouse(line):
+    assert not wheelhouse.builds_from_source(dists.parse_requirement(line))